@@ -0,0 +1,198 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from queue import Queue
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+DEFAULT_KEEP_VERSIONS = 3
+COMPRESSION_SUFFIXES = {"zstd": ".zst", "gzip": ".gz"}
+
+
+def _compress(body, compression):
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(body)
+    return gzip.compress(body, compresslevel=6)
+
+
+def _decompress(blob, compression):
+    if compression == "zstd":
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
+def read_object(path, compression):
+    """Read and decompress one archived body; safe to call from any process."""
+    with open(path, "rb") as f:
+        return _decompress(f.read(), compression)
+
+
+class PageArchive:
+    """On-disk archive of raw page bodies.
+
+    Bodies are compressed (zstd when installed, gzip otherwise) and stored
+    once under the SHA-256 of their content, so an unchanged page fetched
+    again costs only an index row. The SQLite index in ``index.db`` maps
+    each version to the person ID, URL, last fetch time and body hash; a
+    refetch whose body matches the newest version updates its fetch time. Writes go
+    through a background thread so crawl workers never wait on the disk.
+    Only the newest ``keep`` versions per person are kept; a body is
+    deleted once no remaining version refers to it.
+    """
+
+    def __init__(self, root, keep=DEFAULT_KEEP_VERSIONS, compression=None):
+        if compression is None:
+            compression = "zstd" if zstandard is not None else "gzip"
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        self.root = root
+        self.keep = keep
+        self.compression = compression
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        self._create_tables()
+        self._queue = Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="page-archive", daemon=True)
+        self._writer.start()
+
+    def _create_tables(self):
+        with self.lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    person_id TEXT,
+                    url TEXT,
+                    fetched_at REAL,
+                    sha256 TEXT,
+                    size INTEGER,
+                    compression TEXT
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_person ON pages (person_id, fetched_at)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_sha ON pages (sha256)")
+            self.conn.commit()
+
+    def store(self, person_id, url, body, fetched_at=None):
+        """Queue a fetched body for archiving; never blocks on disk I/O."""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self._queue.put((person_id, url, body, fetched_at if fetched_at is not None else time.time()))
+
+    def flush(self):
+        """Block until every queued body has been written."""
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+        self.conn.close()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                print(f"Error archiving {item[1]}: {type(e).__name__}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def object_path(self, sha256, compression):
+        return os.path.join(self.root, "objects", sha256[:2], sha256[2:] + COMPRESSION_SUFFIXES[compression])
+
+    def _write(self, person_id, url, body, fetched_at):
+        sha256 = hashlib.sha256(body).hexdigest()
+        with self.lock:
+            # An unchanged refetch only moves the newest version's fetch time,
+            # so retention counts distinct versions rather than fetches
+            cursor = self.conn.execute("""
+                UPDATE pages SET url = ?, fetched_at = MAX(fetched_at, ?)
+                WHERE rowid = (SELECT rowid FROM pages WHERE person_id = ?
+                               ORDER BY fetched_at DESC, rowid DESC LIMIT 1)
+                  AND sha256 = ?
+            """, (url, fetched_at, person_id, sha256))
+            if cursor.rowcount:
+                self.conn.commit()
+                return
+            row = self.conn.execute("SELECT compression FROM pages WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone()
+        compression = row["compression"] if row else self.compression
+        path = self.object_path(sha256, compression)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(_compress(body, compression))
+            os.replace(tmp_path, path)
+
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO pages (person_id, url, fetched_at, sha256, size, compression) VALUES (?, ?, ?, ?, ?, ?)",
+                (person_id, url, fetched_at, sha256, len(body), compression),
+            )
+            expired = self.conn.execute("""
+                SELECT rowid, sha256, compression FROM pages WHERE person_id = ?
+                ORDER BY fetched_at DESC, rowid DESC LIMIT -1 OFFSET ?
+            """, (person_id, self.keep)).fetchall()
+            orphans = []
+            for old in expired:
+                self.conn.execute("DELETE FROM pages WHERE rowid = ?", (old["rowid"],))
+                still_used = self.conn.execute("SELECT 1 FROM pages WHERE sha256 = ? LIMIT 1", (old["sha256"],)).fetchone()
+                if not still_used:
+                    orphans.append(self.object_path(old["sha256"], old["compression"]))
+            self.conn.commit()
+        for orphan in orphans:
+            try:
+                os.remove(orphan)
+            except FileNotFoundError:
+                pass
+
+    def versions(self, person_id):
+        """Archived fetches for a person, newest first."""
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT person_id, url, fetched_at, sha256, size, compression FROM pages
+                WHERE person_id = ? ORDER BY fetched_at DESC, rowid DESC
+            """, (person_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def load(self, sha256):
+        """Return the decompressed body stored under ``sha256``."""
+        with self.lock:
+            row = self.conn.execute("SELECT compression FROM pages WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone()
+        if not row:
+            raise KeyError(sha256)
+        return read_object(self.object_path(sha256, row["compression"]), row["compression"])
+
+    def latest_versions(self):
+        """The newest archived fetch of every person, with its object path."""
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT person_id, url, fetched_at, sha256, size, compression FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY person_id ORDER BY fetched_at DESC, rowid DESC
+                    ) AS position
+                    FROM pages
+                ) WHERE position = 1
+                ORDER BY person_id
+            """).fetchall()
+        versions = [dict(row) for row in rows]
+        for version in versions:
+            version["path"] = self.object_path(version["sha256"], version["compression"])
+        return versions
+
+    def latest(self, person_id):
+        """Return the newest archived body for a person, or None."""
+        versions = self.versions(person_id)
+        return self.load(versions[0]["sha256"]) if versions else None
@@ -0,0 +1,196 @@
+import asyncio
+import random
+import time
+from queue import Empty
+
+import aiohttp
+
+from src.engine import ScraperEngine, NOT_MODIFIED
+from src.rate_limiter import parse_retry_after
+from src.writer import DEFAULT_WRITE_BATCH
+
+
+class AsyncScraperEngine(ScraperEngine):
+    """Crawl engine that multiplexes the queue on a single asyncio event loop.
+
+    Persistence, visited/pending bookkeeping and ``limit`` accounting are
+    inherited from ``ScraperEngine``; only the queue processing is replaced,
+    so hundreds of requests can be in flight without one thread each.
+    Requests draw from the same engine-wide token bucket and circuit breaker
+    as the threaded engine, so the politeness budget does not depend on how
+    many requests are in flight. Parsing and anything that may wait on
+    SQLite run in worker threads so the event loop keeps serving the
+    other requests.
+    """
+
+    def __init__(self, db_helper, max_workers=2, delay=1.0, rate=None, burst=1, concurrency=100, archive=None,
+                 shared_limits=False, write_batch=DEFAULT_WRITE_BATCH):
+        super().__init__(db_helper, max_workers=max_workers, delay=delay, rate=rate, burst=burst, archive=archive,
+                         shared_limits=shared_limits, write_batch=write_batch)
+        # The base engine's ``concurrency`` controller is never adaptive here
+        # and only sees the synchronous requests (crawl's start page,
+        # scrape_person); this caps the requests in flight on the event loop
+        self.max_in_flight = concurrency
+        # Shared limits live in the database, so checking them can block
+        self.shared_limits = shared_limits
+        self._aio_session = None
+
+    def _process_queue(self, limit=100, follow_links=True):
+        return asyncio.run(self._process_queue_async(limit=limit, follow_links=follow_links))
+
+    async def _process_queue_async(self, limit=100, follow_links=True):
+        count = 0
+        in_flight = {}
+        timeout = aiohttp.ClientTimeout(total=30)
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+        async with aiohttp.ClientSession(
+            headers=dict(self.session.headers), timeout=timeout, connector=connector
+        ) as session:
+            self._aio_session = session
+            try:
+                while count < limit:
+                    # Fill up the in-flight tasks
+                    while len(in_flight) < self.max_in_flight and count + len(in_flight) < limit:
+                        if not self.budget.can_start(len(in_flight)):
+                            break
+                        try:
+                            # Refilling the buffer reads the database
+                            person_id, url = await asyncio.to_thread(self._next_url, durable=follow_links)
+                        except Empty:
+                            break
+                        with self.lock:
+                            refreshing = person_id in self.refreshing
+                            if person_id in self.visited_ids and not refreshing:
+                                continue
+                        task = asyncio.ensure_future(self._scrape_one_async(url, force=refreshing))
+                        in_flight[task] = url
+
+                    if not in_flight:
+                        break
+
+                    done, _ = await asyncio.wait(set(in_flight), return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        url = in_flight.pop(task)
+                        try:
+                            result = task.result()
+                            if result:
+                                count += 1
+                                self.budget.record_page()
+                                data, rels = result
+                                print(f"Crawled {data['id']}: {url} ({count}/{limit if limit < 1000000 else 'all'})")
+                        except Exception as e:
+                            print(f"Task for {url} raised exception: {e}")
+            finally:
+                for task in in_flight:
+                    task.cancel()
+                self._aio_session = None
+                self.writer.flush()
+                self.frontier.release()
+                if not self.budget.can_start():
+                    print(f"{self.budget.summary()}; {self.frontier.qsize()} URLs stay queued for the next run.")
+        return count
+
+    async def _scrape_one_async(self, url, force=False):
+        url = url.replace('//?', '/?')
+        person_id = self._person_id_from_url(url)
+
+        if person_id and not force:
+            with self.lock:
+                if person_id in self.visited_ids:
+                    return None
+            if self.negative_cache.skip(person_id):
+                print(f"Skipping {person_id}: known missing or dead")
+                return None
+
+        headers = await asyncio.to_thread(self._conditional_headers, person_id) if force else None
+        started = time.monotonic()
+        html_content = await self._request_with_retry_async(url, headers=headers)
+        self.budget.record_fetch(time.monotonic() - started)
+        if html_content is None:
+            if person_id:
+                await asyncio.to_thread(self._record_failure, person_id, url)
+            return None
+        if html_content is NOT_MODIFIED:
+            self._record_unchanged(person_id, url)
+            return None
+
+        return await asyncio.to_thread(self._store_page, url, person_id, html_content, force)
+
+    def _store_page(self, url, person_id, html_content, force):
+        """Archive, parse and persist a fetched page; runs off the event loop."""
+        if html_content:
+            self._archive_page(url, html_content)
+        return self._handle_page(url, person_id, html_content, force=force)
+
+    async def _throttle_async(self):
+        """Wait for the circuit breaker and the shared rate limiter."""
+        pause = await self._run_limiter(self.breaker.remaining)
+        if pause > 0:
+            await asyncio.sleep(pause)
+        wait = await self._run_limiter(self.rate_limiter.reserve)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _run_limiter(self, call):
+        if self.shared_limits:
+            return await asyncio.to_thread(call)
+        return call()
+
+    async def _fetch(self, url, headers=None):
+        """Return ``(status, headers, text)`` for a single GET request."""
+        async with self._aio_session.get(url, headers=headers) as response:
+            return response.status, response.headers, await response.text()
+
+    async def _request_with_retry_async(self, url, max_retries=3, backoff_factor=5, headers=None):
+        for attempt in range(max_retries + 1):
+            try:
+                await self._throttle_async()
+                if headers:
+                    status, response_headers, text = await self._fetch(url, headers=headers)
+                else:
+                    status, response_headers, text = await self._fetch(url)
+
+                if status == 304:
+                    return NOT_MODIFIED
+
+                if status == 429:
+                    reason = "Rate limited (429)"
+                elif status in [500, 502, 503, 504]:
+                    reason = f"Server error ({status})"
+                elif status >= 400:
+                    print(f"HTTP error for {url}: {status}")
+                    if status in (404, 410):
+                        self._note_failure(url, "not_found")
+                    return None
+                else:
+                    self._remember_validators(url, response_headers)
+                    return text
+
+                sleep_time = backoff_factor * (2 ** attempt) + random.uniform(0, 1)
+                pause = max(sleep_time, parse_retry_after(response_headers.get('Retry-After')) or 0)
+                self.breaker.trip(pause)
+                if attempt < max_retries:
+                    print(f"{reason} for {url} (Attempt {attempt+1}/{max_retries+1}). Pausing all requests for {pause:.2f}s...")
+                    continue
+                else:
+                    print(f"{reason} for {url}. Max retries reached.")
+                    if status != 429:
+                        self._note_failure(url, "server_error")
+                    return None
+
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt < max_retries:
+                    sleep_time = backoff_factor * (2 ** attempt) + random.uniform(0, 1)
+                    print(f"Connection error/Timeout ({type(e).__name__}) for {url} (Attempt {attempt+1}/{max_retries+1}). Retrying in {sleep_time:.2f}s...")
+                    await asyncio.sleep(sleep_time)
+                    continue
+                else:
+                    print(f"Failed to connect to {url} after {max_retries+1} attempts: {type(e).__name__}")
+                    return None
+            except aiohttp.ClientError as e:
+                print(f"HTTP error for {url}: {e}")
+                return None
+            except Exception as e:
+                print(f"Unexpected error requesting {url}: {e}")
+                return None
+        return None
@@ -0,0 +1,94 @@
+import threading
+import time
+
+
+class TimeBudget:
+    """Wall-clock budget for a run, planned from measured page times.
+
+    ``can_start`` tells the engine whether a new page is still expected to
+    finish before the deadline. The estimate is the larger of the average
+    time of one fetch and the time the pages already in flight need at the
+    measured throughput, so the run stops taking work early enough to drain
+    what it started. ``request_stop`` (called by the SIGTERM handler) stops
+    new work immediately until ``clear_stop``; the deadline is unaffected.
+    Without ``seconds`` only ``request_stop`` applies.
+    """
+
+    # Weight of the newest sample in the moving average of fetch times
+    SMOOTHING = 0.2
+
+    def __init__(self, seconds=None):
+        self.started = time.monotonic()
+        self.deadline = None if seconds is None else self.started + seconds
+        self._stop = threading.Event()
+        self.fetch_seconds = None
+        self.pages = 0
+        self.lock = threading.Lock()
+
+    @property
+    def stop_requested(self):
+        return self._stop.is_set()
+
+    def request_stop(self):
+        self._stop.set()
+
+    def clear_stop(self):
+        self._stop.clear()
+
+    def remaining(self):
+        """Seconds left before the deadline, or None without one."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def record_fetch(self, seconds):
+        """Record how long one fetch took, including throttling."""
+        with self.lock:
+            if self.fetch_seconds is None:
+                self.fetch_seconds = seconds
+            else:
+                self.fetch_seconds += self.SMOOTHING * (seconds - self.fetch_seconds)
+
+    def record_page(self):
+        """Count a finished page for the throughput estimate."""
+        with self.lock:
+            self.pages += 1
+
+    def throughput(self):
+        """Finished pages per second since the run started."""
+        elapsed = time.monotonic() - self.started
+        return self.pages / elapsed if self.pages and elapsed > 0 else None
+
+    def estimate(self, in_progress=0):
+        """Expected seconds until a page admitted now is finished."""
+        estimates = [self.fetch_seconds or 0.0]
+        rate = self.throughput()
+        if rate:
+            estimates.append((in_progress + 1) / rate)
+        return max(estimates)
+
+    def can_start(self, in_progress=0, delay=0.0):
+        """Whether a page started after ``delay`` seconds should finish in time."""
+        if self.stop_requested:
+            return False
+        if self.deadline is None:
+            return True
+        return self.remaining() > delay + self.estimate(in_progress)
+
+    def planned_pages(self):
+        """Pages that still fit in the remaining time at the measured throughput."""
+        remaining, rate = self.remaining(), self.throughput()
+        if remaining is None or rate is None:
+            return None
+        return int(remaining * rate)
+
+    def summary(self):
+        if self.stop_requested:
+            return "Stopped on request"
+        remaining = self.remaining()
+        if remaining is None:
+            return None
+        rate = self.throughput()
+        if not rate:
+            return f"Time budget: {remaining:.0f}s left"
+        return f"Time budget: {remaining:.0f}s left, {rate * 60:.1f} pages/min, about {self.planned_pages()} more pages fit"
@@ -1,65 +1,354 @@
 import click
+import functools
+import json
 import sys
 import os
+import signal
+import time
 
 # Add the project root to sys.path to allow running this script directly
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.database import DatabaseHelper
-from src.engine import ScraperEngine
+from src.database import DatabaseHelper, DEFAULT_SNAPSHOT_INTERVAL
+from src.engine import ScraperEngine, DEFAULT_MAX_BODY_BYTES
+from src.async_engine import AsyncScraperEngine
 from src.gedcom_exporter import GedcomExporter
+from src.archive import PageArchive, DEFAULT_KEEP_VERSIONS
+from src.writer import DEFAULT_WRITE_BATCH
+from src.reextract import Reextractor, DEFAULT_BATCH_SIZE
+from src.negative_cache import NEGATIVE_TTLS
+from src.seeds import read_seeds
+from src.daemon import CrawlerDaemon, send_command, DEFAULT_SOCKET, DEFAULT_BATCH_PAGES
 
 DEFAULT_URL = "https://baalhatanya.org.il/%d7%90%d7%99%d7%92%d7%95%d7%93-%d7%94%d7%a6%d7%90%d7%a6%d7%90%d7%99%d7%9d-%d7%a9%d7%9c-%d7%91%d7%a2%d7%9c-%d7%94%d7%aa%d7%a0%d7%99%d7%90-%d7%94%d7%90%d7%93%d7%9e%d7%95%d7%a8-%d7%94%d7%96%d7%a7%d7%9f/%d7%90%d7%99%d7%9c%d7%9f-%d7%94%d7%99%d7%97%d7%a1/?i=111815"
 
+ENGINE_CHOICES = click.Choice(['threads', 'async'])
+
+
+def engine_options(func):
+    """Options shared by every command that drives the crawl engine."""
+    options = [
+        click.option('--workers', default=2, help='Number of concurrent workers (upper bound when adaptive).'),
+        click.option('--min-workers', type=int, default=None, help='Enable adaptive concurrency between this and --workers (threads engine).'),
+        click.option('--delay', default=1.0, help='Delay between requests in seconds.'),
+        click.option('--engine', 'engine_name', type=ENGINE_CHOICES, default='threads', help='Crawl engine implementation.'),
+        click.option('--concurrency', default=100, help='Maximum in-flight requests for the async engine.'),
+        click.option('--rate', type=float, default=None, help='Engine-wide requests per second (default: 1/delay).'),
+        click.option('--burst', default=1, help='Requests allowed back to back after an idle period.'),
+        click.option('--parse-workers', default=0, help='Parser processes (0 parses on the fetch threads; threads engine).'),
+        click.option('--stream', is_flag=True, help='Parse pages while they download and stop once the family sections are read (threads engine).'),
+        click.option('--max-body-bytes', default=DEFAULT_MAX_BODY_BYTES, help='Largest page accepted in --stream mode.'),
+        click.option('--archive', 'archive_dir', default=None, help='Directory for a compressed archive of fetched pages.'),
+        click.option('--archive-keep', default=DEFAULT_KEEP_VERSIONS, help='Archived versions to keep per person.'),
+        click.option('--shared-limits', is_flag=True, help='Share --rate and back-off pauses with other processes using the same database.'),
+        click.option('--time-budget', type=float, default=None, help='Seconds after which the run winds down, keeping unfinished work queued.'),
+        click.option('--wal/--no-wal', default=True, help='Write-ahead logging, so exports and queries do not wait for the crawl (turn off for hosts sharing the database over a network file system).'),
+        click.option('--write-batch', default=DEFAULT_WRITE_BATCH, help='Page results written per database transaction (1 writes each page at once).'),
+        click.option('--db-mode', type=click.Choice(['disk', 'memory']), default='disk', help='Work on the database file, or on a copy in memory that is saved back periodically and on exit.'),
+        click.option('--snapshot-interval', default=DEFAULT_SNAPSHOT_INTERVAL, help='Seconds between saves of the in-memory database (--db-mode memory).'),
+    ]
+    @functools.wraps(func)
+    def command(**kwargs):
+        # Checked before the command opens the database
+        check_engine_options(**kwargs)
+        return func(**kwargs)
+
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+def check_engine_options(engine_name='threads', min_workers=None, parse_workers=0, stream=False, **_):
+    """Reject options the selected engine does not implement."""
+    if engine_name == 'async':
+        unsupported = [option for option, value in (('--min-workers', min_workers is not None),
+                                                     ('--parse-workers', parse_workers),
+                                                     ('--stream', stream)) if value]
+        if unsupported:
+            raise click.UsageError(f"{', '.join(unsupported)} only apply to --engine threads.")
+
+
+def open_database(db, engine_opts):
+    """Open ``db`` as the database options in ``engine_opts`` ask, consuming them."""
+    memory = engine_opts.pop('db_mode') == 'memory'
+    if memory and engine_opts.get('shared_limits'):
+        raise click.UsageError("--db-mode memory cannot share a database with other processes (--shared-limits).")
+    return DatabaseHelper(db, wal=engine_opts.pop('wal'), memory=memory,
+                          snapshot_interval=engine_opts.pop('snapshot_interval'))
+
+
+def build_engine(db_helper, engine_name='threads', workers=2, min_workers=None, delay=1.0, concurrency=100,
+                 rate=None, burst=1, parse_workers=0, stream=False, max_body_bytes=DEFAULT_MAX_BODY_BYTES,
+                 archive_dir=None, archive_keep=DEFAULT_KEEP_VERSIONS, shared_limits=False, time_budget=None,
+                 write_batch=DEFAULT_WRITE_BATCH):
+    """Instantiate the crawl engine selected with --engine."""
+    archive = PageArchive(archive_dir, keep=archive_keep) if archive_dir else None
+    if engine_name == 'async':
+        engine = AsyncScraperEngine(db_helper, max_workers=workers, delay=delay, rate=rate, burst=burst,
+                                    concurrency=concurrency, archive=archive, shared_limits=shared_limits,
+                                    write_batch=write_batch)
+    else:
+        engine = ScraperEngine(db_helper, max_workers=workers, delay=delay, rate=rate, burst=burst,
+                               min_workers=min_workers, parse_workers=parse_workers, stream=stream,
+                               max_body_bytes=max_body_bytes, archive=archive, shared_limits=shared_limits,
+                               write_batch=write_batch)
+    if time_budget is not None:
+        engine.set_time_budget(time_budget)
+    install_stop_handler(engine, db_helper)
+    return engine
+
+
+def install_stop_handler(engine, db_helper=None):
+    """Let SIGTERM wind the engine down cleanly; a second SIGTERM exits at once.
+
+    With the database in memory the second SIGTERM raises SystemExit
+    instead, so the final snapshot is still written on the way out.
+    """
+    def handle(signum, frame):
+        click.echo("Received SIGTERM: finishing in-flight pages, unfinished work stays queued...")
+        if getattr(db_helper, "snapshot_path", None):
+            signal.signal(signal.SIGTERM, exit_now)
+        else:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        engine.request_stop()
+
+    def exit_now(signum, frame):
+        raise SystemExit(128 + signum)
+
+    signal.signal(signal.SIGTERM, handle)
+
+
+def close_engine(engine, db_helper):
+    """Flush queued writes and the page archive, if any, and close the database.
+
+    Closing a database held in memory saves its final snapshot.
+    """
+    engine.close()
+    if engine.archive is not None:
+        engine.archive.close()
+    db_helper.close()
+
 @click.group()
 def main():
     """Gen genealogical data scraper and GEDCOM exporter."""
     pass
 
+def load_seeds(seeds_file, base_url):
+    """Read, canonicalize and deduplicate the person URLs or IDs in ``seeds_file``."""
+    seeds, invalid = read_seeds(seeds_file, base_url=base_url)
+    if invalid:
+        click.echo(f"Ignored {invalid} lines without a person ID.", err=True)
+    return seeds
+
 @main.command()
 @click.option('--url', default=DEFAULT_URL, help='URL of the person to scrape.')
+@click.option('--from-file', 'from_file', type=click.File('r'), default=None, help="File of person URLs or IDs, one per line ('-' for stdin).")
 @click.option('--db', default='genealogy.db', help='Database file path.')
-@click.option('--delay', default=1.0, help='Delay between requests in seconds.')
 @click.option('--force', is_flag=True, help='Overwrite existing data.')
-def scrape(url, db, delay, force):
-    """Scrape genealogical data from a URL."""
-    db_helper = DatabaseHelper(db)
-    engine = ScraperEngine(db_helper, delay=delay)
-    if force:
-        click.echo(f"Scraping {url} (forced update)...")
-    else:
-        click.echo(f"Scraping {url}...")
-    engine.scrape_person(url, force=force)
-    click.echo("Scrape complete.")
-    db_helper.close()
+@engine_options
+def scrape(url, from_file, db, force, **engine_opts):
+    """Scrape genealogical data from a URL or a list of URLs."""
+    db_helper = open_database(db, engine_opts)
+    engine = build_engine(db_helper, **engine_opts)
+    try:
+        if from_file is not None:
+            seeds = load_seeds(from_file, base_url=url)
+            count = engine.scrape_many(seeds, force=force)
+            click.echo(f"Scrape complete: {count} of {len(seeds)} people scraped.")
+            return
+        if force:
+            click.echo(f"Scraping {url} (forced update)...")
+        else:
+            click.echo(f"Scraping {url}...")
+        engine.scrape_person(url, force=force)
+        click.echo("Scrape complete.")
+    finally:
+        close_engine(engine, db_helper)
 
 @main.command()
 @click.option('--url', default=DEFAULT_URL, help='URL to start crawling from.')
 @click.option('--limit', default=100, help='Maximum number of people to scrape.')
 @click.option('--db', default='genealogy.db', help='Database file path.')
-@click.option('--workers', default=2, help='Number of concurrent workers.')
-@click.option('--delay', default=1.0, help='Delay between requests in seconds.')
-def crawl(url, limit, db, workers, delay):
+@click.option('--probe', type=click.Choice(['sequential', 'gallop']), default='sequential', help='How to look for unlinked IDs once the frontier is empty.')
+@click.option('--seeds-file', type=click.File('r'), default=None, help="Start from the person URLs or IDs in this file ('-' for stdin) instead of --url.")
+@engine_options
+def crawl(url, limit, db, probe, seeds_file, **engine_opts):
     """Crawl genealogical data starting from a URL."""
-    db_helper = DatabaseHelper(db)
-    engine = ScraperEngine(db_helper, max_workers=workers, delay=delay)
-    click.echo(f"Crawling starting from {url} with limit {limit} (workers: {workers}, delay: {delay}s)...")
-    engine.crawl(url, limit=limit)
-    click.echo("Crawl complete.")
-    db_helper.close()
+    db_helper = open_database(db, engine_opts)
+    engine = build_engine(db_helper, **engine_opts)
+    try:
+        if seeds_file is not None:
+            seeds = load_seeds(seeds_file, base_url=url)
+            click.echo(f"Crawling from {len(seeds)} seeds with limit {limit} (workers: {engine_opts['workers']}, delay: {engine_opts['delay']}s)...")
+            engine.crawl_seeds(seeds, limit=limit, probe=probe)
+        else:
+            click.echo(f"Crawling starting from {url} with limit {limit} (workers: {engine_opts['workers']}, delay: {engine_opts['delay']}s)...")
+            engine.crawl(url, limit=limit, probe=probe)
+        click.echo("Crawl complete.")
+    finally:
+        close_engine(engine, db_helper)
 
 @main.command()
 @click.option('--limit', default=100, help='Maximum number of people to retry.')
 @click.option('--db', default='genealogy.db', help='Database file path.')
-@click.option('--workers', default=2, help='Number of concurrent workers.')
-@click.option('--delay', default=1.0, help='Delay between requests in seconds.')
-def retry(limit, db, workers, delay):
+@engine_options
+def retry(limit, db, **engine_opts):
     """Retry failed or pending scrapings."""
+    db_helper = open_database(db, engine_opts)
+    engine = build_engine(db_helper, **engine_opts)
+    try:
+        click.echo(f"Retrying up to {limit} pending items...")
+        engine.retry_failed(limit=limit)
+        click.echo("Retry complete.")
+    finally:
+        close_engine(engine, db_helper)
+
+@main.command()
+@click.option('--budget', default=100, help='Maximum number of people to re-fetch.')
+@click.option('--db', default='genealogy.db', help='Database file path.')
+@engine_options
+def refresh(budget, db, **engine_opts):
+    """Re-fetch the stored people most likely to have changed."""
+    db_helper = open_database(db, engine_opts)
+    engine = build_engine(db_helper, **engine_opts)
+    try:
+        click.echo(f"Refreshing up to {budget} people...")
+        engine.refresh(budget=budget)
+        click.echo("Refresh complete.")
+    finally:
+        close_engine(engine, db_helper)
+
+@main.command()
+@click.option('--archive', 'archive_dir', required=True, type=click.Path(exists=True, file_okay=False), help='Page archive written by crawl --archive.')
+@click.option('--db', default='genealogy.db', help='Database file path.')
+@click.option('--workers', type=int, default=None, help='Parser processes (default: one per CPU).')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, help='Records written per transaction.')
+@click.option('--dry-run', is_flag=True, help='Report changes without writing them.')
+@click.option('--show', default=20, help='Number of changed records to list.')
+def reextract(archive_dir, db, workers, batch_size, dry_run, show):
+    """Re-run extraction over archived pages without any HTTP requests."""
+    db_helper = DatabaseHelper(db)
+    archive = PageArchive(archive_dir)
+    click.echo(f"Re-extracting archived pages from {archive_dir}{' (dry run)' if dry_run else ''}...")
+    report = Reextractor(db_helper, archive, workers=workers, batch_size=batch_size).run(dry_run=dry_run)
+    for person_id, fields in list(report.changed.items())[:show]:
+        click.echo(f"  {person_id}: {', '.join(fields)}")
+    if len(report.changed) > show:
+        click.echo(f"  ... and {len(report.changed) - show} more")
+    click.echo(report.summary())
+    archive.close()
+    db_helper.close()
+
+@main.command(name='serve-crawler')
+@click.option('--db', default='genealogy.db', help='Database file path.')
+@click.option('--socket', 'socket_path', default=DEFAULT_SOCKET, help='Unix socket to listen on for commands.')
+@click.option('--batch-size', default=DEFAULT_BATCH_PAGES, help='Pages crawled per batch before the frontier is checked again.')
+@engine_options
+def serve_crawler(db, socket_path, batch_size, **engine_opts):
+    """Keep a crawl engine running and take commands over a Unix socket."""
+    db_helper = open_database(db, engine_opts)
+    engine = build_engine(db_helper, **engine_opts)
+    daemon = CrawlerDaemon(engine, socket_path=socket_path, batch_size=batch_size)
+    # SIGTERM shuts the whole daemon down, not just the current batch
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        daemon.serve()
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    finally:
+        close_engine(engine, db_helper)
+
+@main.group(name='crawler-ctl')
+@click.option('--socket', 'socket_path', default=DEFAULT_SOCKET, help='Socket of the running serve-crawler.')
+@click.pass_context
+def crawler_ctl(ctx, socket_path):
+    """Send a command to a running serve-crawler."""
+    ctx.obj = socket_path
+
+def _send(socket_path, command, **params):
+    try:
+        reply = send_command(socket_path, command, **params)
+    except OSError as e:
+        raise click.ClickException(f"Cannot reach the crawler on {socket_path}: {e}")
+    if not reply.pop("ok", False):
+        raise click.ClickException(reply.get("error", "Command failed"))
+    return reply
+
+@crawler_ctl.command()
+@click.argument('urls', nargs=-1, required=True)
+@click.pass_obj
+def enqueue(socket_path, urls):
+    """Queue person URLs on the crawler's frontier."""
+    reply = _send(socket_path, "enqueue", urls=list(urls))
+    click.echo(f"Queued {reply['added']} of {len(urls)} URLs.")
+
+@crawler_ctl.command()
+@click.pass_obj
+def pause(socket_path):
+    """Finish the pages in flight and stop taking new work."""
+    _send(socket_path, "pause")
+    click.echo("Crawler paused.")
+
+@crawler_ctl.command()
+@click.pass_obj
+def resume(socket_path):
+    """Resume a paused crawler."""
+    _send(socket_path, "resume")
+    click.echo("Crawler resumed.")
+
+@crawler_ctl.command(name='rate')
+@click.argument('rate', type=float)
+@click.option('--burst', type=int, default=None, help='New burst size.')
+@click.pass_obj
+def set_rate(socket_path, rate, burst):
+    """Change the crawler's requests per second."""
+    reply = _send(socket_path, "rate", rate=rate, burst=burst)
+    click.echo(f"Rate set to {reply['rate']} requests/s (burst {reply['burst']}).")
+
+@crawler_ctl.command()
+@click.pass_obj
+def stats(socket_path):
+    """Show the crawler's progress and settings."""
+    click.echo(json.dumps(_send(socket_path, "stats"), indent=2))
+
+@crawler_ctl.command()
+@click.pass_obj
+def stop(socket_path):
+    """Finish the pages in flight and shut the crawler down."""
+    _send(socket_path, "stop")
+    click.echo("Crawler stopping.")
+
+@main.group(name='negative-cache')
+def negative_cache():
+    """Inspect and purge IDs known to be missing or dead."""
+
+@negative_cache.command(name='list')
+@click.option('--db', default='genealogy.db', help='Database file path.')
+@click.option('--class', 'failure_class', type=click.Choice(sorted(NEGATIVE_TTLS)), help='Only show this failure class.')
+@click.option('--limit', default=20, help='Number of entries to list.')
+def negative_cache_list(db, failure_class, limit):
+    """Show counts per failure class and the newest entries."""
+    db_helper = DatabaseHelper(db)
+    counts = db_helper.count_negative()
+    if not counts:
+        click.echo("Negative cache is empty.")
+    for name, (active, expired) in counts.items():
+        click.echo(f"{name}: {active} active, {expired} expired")
+    for entry in db_helper.get_negative_entries(failure_class=failure_class, limit=limit):
+        expires = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['expires_at']))
+        click.echo(f"  {entry['id']} {entry['failure_class']} (hits: {entry['hits']}, expires {expires}) {entry['url'] or ''}")
+    db_helper.close()
+
+@negative_cache.command(name='purge')
+@click.option('--db', default='genealogy.db', help='Database file path.')
+@click.option('--class', 'failure_class', type=click.Choice(sorted(NEGATIVE_TTLS)), help='Only purge this failure class.')
+@click.option('--id', 'person_id', help='Only purge this person ID.')
+@click.option('--expired', is_flag=True, help='Only purge entries whose TTL has passed.')
+def negative_cache_purge(db, failure_class, person_id, expired):
+    """Delete entries so their IDs are fetched again."""
     db_helper = DatabaseHelper(db)
-    engine = ScraperEngine(db_helper, max_workers=workers, delay=delay)
-    click.echo(f"Retrying up to {limit} pending items...")
-    engine.retry_failed(limit=limit)
-    click.echo("Retry complete.")
+    removed = db_helper.purge_negative(failure_class=failure_class, person_id=person_id, expired_only=expired)
+    click.echo(f"Purged {removed} entries.")
     db_helper.close()
 
 @main.command()
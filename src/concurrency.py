@@ -0,0 +1,75 @@
+import threading
+
+
+class AdaptiveConcurrency:
+    """AIMD controller for the number of requests an engine keeps in flight.
+
+    Every ``window`` completed requests the controller looks at what the site
+    told us. Any 429, an error rate above ``error_threshold`` or an average
+    latency more than ``latency_factor`` times the best window seen so far is
+    treated as congestion and the limit is multiplied by ``decrease_factor``.
+    A healthy window adds one slot. The limit always stays within
+    ``[min_limit, max_limit]``; when both bounds are equal it never moves.
+    """
+
+    def __init__(self, min_limit, max_limit, window=10, latency_factor=2.0,
+                 error_threshold=0.1, decrease_factor=0.5):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = self.min_limit
+        self.window = window
+        self.latency_factor = latency_factor
+        self.error_threshold = error_threshold
+        self.decrease_factor = decrease_factor
+        self.baseline_latency = None
+        self.decisions = []
+        self._samples = []
+        self.lock = threading.Lock()
+
+    @property
+    def adaptive(self):
+        return self.min_limit < self.max_limit
+
+    def record(self, latency, outcome="ok"):
+        """Record one request; ``outcome`` is ``ok``, ``error`` or ``throttled``."""
+        if not self.adaptive:
+            return
+        with self.lock:
+            self._samples.append((latency, outcome))
+            if len(self._samples) >= self.window:
+                self._adjust()
+
+    def _adjust(self):
+        samples, self._samples = self._samples, []
+        total = len(samples)
+        throttled = sum(1 for _, outcome in samples if outcome == "throttled")
+        errors = sum(1 for _, outcome in samples if outcome == "error")
+        ok_latencies = [latency for latency, outcome in samples if outcome == "ok"]
+        avg_latency = sum(ok_latencies) / len(ok_latencies) if ok_latencies else None
+
+        old = self.limit
+        if throttled:
+            reason = f"{throttled} rate-limited responses"
+            new = self._decrease(old)
+        elif errors / total > self.error_threshold:
+            reason = f"error rate {errors}/{total}"
+            new = self._decrease(old)
+        elif (avg_latency is not None and self.baseline_latency
+              and avg_latency > self.baseline_latency * self.latency_factor):
+            reason = f"latency {avg_latency:.2f}s vs baseline {self.baseline_latency:.2f}s"
+            new = self._decrease(old)
+        else:
+            reason = "healthy window"
+            new = min(self.max_limit, old + 1)
+
+        if avg_latency is not None and (self.baseline_latency is None or avg_latency < self.baseline_latency):
+            self.baseline_latency = avg_latency
+
+        if new != old:
+            self.limit = new
+            self.decisions.append((old, new, reason))
+            latency_text = f"{avg_latency:.2f}s" if avg_latency is not None else "n/a"
+            print(f"Adaptive concurrency: {old} -> {new} workers ({reason}; avg latency {latency_text}, errors {errors}/{total}, 429s {throttled})")
+
+    def _decrease(self, limit):
+        return max(self.min_limit, int(limit * self.decrease_factor))
@@ -0,0 +1,186 @@
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+DEFAULT_SOCKET = "crawler.sock"
+DEFAULT_BATCH_PAGES = 100
+# How often an idle daemon looks for URLs queued by other processes
+IDLE_INTERVAL = 30.0
+
+
+class CrawlerDaemon:
+    """Long-running crawl engine controlled over a local Unix socket.
+
+    The engine, its HTTP session and the in-memory indexes (visited IDs,
+    negative cache) stay loaded between jobs, so feeding it work costs a
+    socket round trip instead of a process start. The worker thread runs
+    the frontier in batches of ``batch_size`` pages and sleeps while it is
+    empty or paused. Requests and replies are single JSON lines; see
+    ``send_command``. Commands: ``enqueue``, ``pause``, ``resume``,
+    ``rate``, ``stats`` and ``stop``.
+    """
+
+    def __init__(self, engine, socket_path=DEFAULT_SOCKET, batch_size=DEFAULT_BATCH_PAGES, idle_interval=IDLE_INTERVAL):
+        self.engine = engine
+        self.socket_path = socket_path
+        self.batch_size = batch_size
+        self.idle_interval = idle_interval
+        self.paused = False
+        self.crawled = 0
+        self.started = time.monotonic()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._server = None
+
+    def serve(self):
+        """Run until a ``stop`` command or ``stop()``; blocks the caller."""
+        if os.path.exists(self.socket_path):
+            # A socket left behind by a crashed daemon; refuse a live one
+            if _is_listening(self.socket_path):
+                raise RuntimeError(f"A crawler is already listening on {self.socket_path}")
+            os.remove(self.socket_path)
+        self._server = _Server(self.socket_path, _Handler)
+        self._server.crawler = self
+        listener = threading.Thread(target=self._server.serve_forever, name="crawler-control", daemon=True)
+        listener.start()
+        print(f"Crawler listening on {self.socket_path}")
+        try:
+            self._work_loop()
+        finally:
+            self._server.shutdown()
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+        print(f"Crawler stopped after {self.crawled} pages.")
+
+    def _work_loop(self):
+        while not self._stopped.is_set():
+            if self.paused or self.engine.frontier.qsize() == 0:
+                self._idle()
+                continue
+            crawled = self.engine._process_queue(limit=self.batch_size)
+            self.crawled += crawled
+            budget = self.engine.budget
+            if budget.deadline is not None and not budget.stop_requested and not budget.can_start():
+                print("Time budget spent; stopping the crawler.")
+                self._stopped.set()
+            elif not crawled:
+                # Queued URLs that cannot be claimed yet (leased by another
+                # process, or backing off); look again later
+                self._idle()
+
+    def _idle(self):
+        self._wake.wait(self.idle_interval)
+        self._wake.clear()
+
+    def stop(self):
+        self._stopped.set()
+        self.engine.request_stop()
+        self._wake.set()
+
+    def handle(self, request):
+        """Execute one control request and return the reply."""
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "Request must be a JSON object"}
+        command = request.get("command")
+        handler = getattr(self, f"_cmd_{command}", None)
+        if handler is None:
+            return {"ok": False, "error": f"Unknown command: {command}"}
+        try:
+            return dict({"ok": True}, **handler(request))
+        except (KeyError, TypeError, ValueError) as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    def _cmd_enqueue(self, request):
+        urls = request.get("urls") or [request["url"]]
+        added = 0
+        for url in urls:
+            person_id = self.engine._person_id_from_url(url)
+            if not person_id:
+                raise ValueError(f"No person ID in {url}")
+            if self.engine._enqueue(person_id, url):
+                added += 1
+        self._wake.set()
+        return {"added": added}
+
+    def _cmd_pause(self, request):
+        # Pages in flight finish; the rest of the batch stays queued
+        self.paused = True
+        self.engine.request_stop()
+        return {}
+
+    def _cmd_resume(self, request):
+        self.paused = False
+        self.engine.resume()
+        self._wake.set()
+        return {}
+
+    def _cmd_rate(self, request):
+        rate = float(request["rate"])
+        burst = request.get("burst")
+        self.engine.rate_limiter.set_rate(rate, int(burst) if burst is not None else None)
+        return {"rate": self.engine.rate_limiter.rate, "burst": self.engine.rate_limiter.burst}
+
+    def _cmd_stats(self, request):
+        engine = self.engine
+        with engine.lock:
+            visited = len(engine.visited_ids)
+        return {
+            "paused": self.paused,
+            "uptime": round(time.monotonic() - self.started, 1),
+            "crawled": self.crawled,
+            "visited": visited,
+            "stages": engine.stage_depths(),
+            "workers": engine.concurrency.limit,
+            "rate": engine.rate_limiter.rate,
+            "burst": engine.rate_limiter.burst,
+            "negative_skipped": engine.negative_cache.skipped,
+        }
+
+    def _cmd_stop(self, request):
+        self.stop()
+        return {}
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                reply = {"ok": False, "error": f"Invalid JSON: {e}"}
+            else:
+                reply = self.server.crawler.handle(request)
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+def _is_listening(socket_path):
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+def send_command(socket_path, command, **params):
+    """Send one command to a running daemon and return its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(30)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(dict(params, command=command)).encode("utf-8") + b"\n")
+        reply = b""
+        while not reply.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            reply += chunk
+    return json.loads(reply)
@@ -1,103 +1,582 @@
+import atexit
+import os
+import re
 import sqlite3
 import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import groupby
+from queue import Empty, Queue
+from urllib.request import pathname2url
 
+from src.freshness import change_rate, staleness
+
+INDIVIDUAL_COLUMNS = (
+    "id", "name", "first_name", "last_name", "prefix", "suffix", "birth_date", "birth_date_civil",
+    "birth_place", "death_date", "death_date_civil", "death_place", "gender", "url",
+)
+# Stored as they are; the URL is split into a template and the ID
+_RECORD_COLUMNS = INDIVIDUAL_COLUMNS[:-1]
+
+# Columns declared PERSON_ID have numeric affinity: the site's plain decimal
+# IDs are stored as integers and anything else as text. They read back as
+# strings, so callers only ever see string IDs. A decimal ID written with a
+# leading zero is stored as the same integer as the one without, which is
+# why IDs are canonicalized (``canonical_person_id``) where they are read
+# from URLs.
+sqlite3.register_converter("PERSON_ID", bytes.decode)
+
+# Relationship types the scraper produces, stored as ids into
+# ``relationship_types``; any other type is added there on first use
+RELATIONSHIP_TYPES = ("father", "mother", "spouse", "child")
+
+# Person page URLs differ only in the ``i`` parameter, so they are stored as
+# an id into ``url_templates`` and expanded with the row's own ID
+_ID_PARAM = re.compile(r"[?&]i=([^&#]*)")
+_CANONICAL_ID = re.compile(r"0|[1-9][0-9]{0,17}")
+_TEMPLATE_ID = "(SELECT id FROM url_templates WHERE template = ?)"
+_TYPE_ID = "(SELECT id FROM relationship_types WHERE name = ?)"
+_INSERT_INDIVIDUAL = f"""
+    INTO individuals ({", ".join(_RECORD_COLUMNS)}, url_template, url)
+    VALUES ({", ".join("?" for _ in _RECORD_COLUMNS)}, {_TEMPLATE_ID}, ?)
+"""
+_INSERT_RELATIONSHIP = f"INSERT OR IGNORE INTO relationships (person_id, related_id, type_id) VALUES (?, ?, {_TYPE_ID})"
+_QUEUE_URL = f"INSERT OR IGNORE INTO discovered_urls (id, url_template, url, state) VALUES (?, {_TEMPLATE_ID}, ?, 'queued')"
+_FRONTIER_URL = "COALESCE(url, replace((SELECT template FROM url_templates t WHERE t.id = url_template), '{id}', id))"
+
+# Frontier rows a worker may lease: queued, or in flight under an expired
+# lease, and not known to be missing. Parameters: now, max_failures, now.
+_CLAIMABLE = """
+    d.state IN ('queued', 'in_flight')
+    AND (d.state = 'queued' OR d.lease_expires IS NULL OR d.lease_expires < ?)
+    AND d.failure_count < ?
+    AND NOT EXISTS (SELECT 1 FROM individuals i WHERE i.id = d.id)
+    AND NOT EXISTS (SELECT 1 FROM negative_cache n WHERE n.id = d.id AND n.expires_at > ?)
+"""
+
+# Person IDs that are plain decimal numbers
+_NUMERIC_ID = "id GLOB '[0-9]*' AND id NOT GLOB '*[^0-9]*'"
+
+# Read-only connections kept open next to the single writing connection
+DEFAULT_READERS = 4
+# Seconds between on-disk snapshots of a database held in memory
+DEFAULT_SNAPSHOT_INTERVAL = 60.0
+
+# Items accepted by ``DatabaseHelper.write_batch``. A page result carries
+# everything one scraped page writes; ``validators`` is ``(etag,
+# last_modified)`` or None. A check is a 304 answer and a failure a failed
+# attempt, which with ``final`` also parks the URL as failed.
+PageResult = namedtuple(
+    "PageResult", "data rels content_hash record_hash relationships_hash validators checked_at"
+)
+PageCheck = namedtuple("PageCheck", "person_id checked_at")
+PageFailure = namedtuple("PageFailure", "person_id final")
+
+_UPSERT_VALIDATORS = """
+    INSERT INTO http_validators (id, etag, last_modified) VALUES (?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified
+    WHERE etag IS NOT excluded.etag OR last_modified IS NOT excluded.last_modified
+"""
+
+
+def _is_memory(db_path):
+    return db_path in ("", ":memory:") or db_path.startswith("file::memory:")
+
+
+def _url_parts(person_id, url):
+    """``(template, url)`` to store for a person's URL; one of them is None.
+
+    Only URLs naming a plain decimal ``person_id`` once in ``i`` become a
+    template, because only those expand back to exactly the same URL.
+    """
+    if url is None or not isinstance(person_id, str) or not _CANONICAL_ID.fullmatch(person_id) or "{id}" in url:
+        return None, url
+    matches = list(_ID_PARAM.finditer(url))
+    if len(matches) != 1 or matches[0].group(1) != person_id:
+        return None, url
+    return url[:matches[0].start(1)] + "{id}" + url[matches[0].end(1):], None
+
+
+def _individual_row(data):
+    """Parameters of ``_INSERT_INDIVIDUAL`` for a scraped record."""
+    return tuple(data.get(col) for col in _RECORD_COLUMNS) + _url_parts(data.get("id"), data.get("url"))
+
+
+def _store_types(cursor, names):
+    cursor.executemany(
+        "INSERT OR IGNORE INTO relationship_types (name) VALUES (?)",
+        [(name,) for name in set(names) if name not in RELATIONSHIP_TYPES],
+    )
 
-class DatabaseHelper:
-    def __init__(self, db_path):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
-        self.lock = threading.Lock()
-        self._create_tables()
 
-    def _create_tables(self):
-        cursor = self.conn.cursor()
+def _store_templates(cursor, templates):
+    cursor.executemany(
+        "INSERT OR IGNORE INTO url_templates (template) VALUES (?)",
+        [(template,) for template in set(templates) if template is not None],
+    )
+
+
+def _baseline_schema(cursor):
+    """Version 1: the layout of databases created before versions were recorded.
+
+    Such files may predate any of its columns, so it adds what is missing.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS individuals (
+            id TEXT PRIMARY KEY,
+            name TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            prefix TEXT,
+            suffix TEXT,
+            birth_date TEXT,
+            birth_date_civil TEXT,
+            birth_place TEXT,
+            death_date TEXT,
+            death_date_civil TEXT,
+            death_place TEXT,
+            gender TEXT,
+            url TEXT
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS discovered_urls (
+            id TEXT PRIMARY KEY,
+            url TEXT,
+            failure_count INTEGER DEFAULT 0,
+            state TEXT DEFAULT 'queued',
+            depth INTEGER,
+            priority INTEGER DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires REAL
+        )
+    """)
+
+    # Ensure all columns exist (simple migration)
+    cursor.execute("PRAGMA table_info(discovered_urls)")
+    existing_discovered_columns = [row[1] for row in cursor.fetchall()]
+    if "failure_count" not in existing_discovered_columns:
+        cursor.execute("ALTER TABLE discovered_urls ADD COLUMN failure_count INTEGER DEFAULT 0")
+
+    cursor.execute("PRAGMA table_info(individuals)")
+    existing_columns = [row[1] for row in cursor.fetchall()]
+    for col_name in INDIVIDUAL_COLUMNS:
+        if col_name not in existing_columns:
+            cursor.execute(f"ALTER TABLE individuals ADD COLUMN {col_name} TEXT")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS relationships (
+            person_id TEXT,
+            related_id TEXT,
+            type TEXT,
+            PRIMARY KEY (person_id, related_id, type)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS freshness (
+            id TEXT PRIMARY KEY,
+            last_scraped_at REAL,
+            content_hash TEXT,
+            checks INTEGER DEFAULT 0,
+            changes INTEGER DEFAULT 0,
+            observed_seconds REAL DEFAULT 0,
+            change_rate REAL
+        )
+    """)
+    cursor.execute("PRAGMA table_info(freshness)")
+    if "record_hash" not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE freshness ADD COLUMN record_hash TEXT")
+        cursor.execute("ALTER TABLE freshness ADD COLUMN relationships_hash TEXT")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS http_validators (
+            id TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT
+        )
+    """)
+
+    # discovered_urls doubles as the crawl frontier
+    if "state" not in existing_discovered_columns:
+        cursor.execute("ALTER TABLE discovered_urls ADD COLUMN state TEXT DEFAULT 'queued'")
+        cursor.execute("ALTER TABLE discovered_urls ADD COLUMN depth INTEGER")
+        cursor.execute("ALTER TABLE discovered_urls ADD COLUMN priority INTEGER DEFAULT 0")
+        cursor.execute("UPDATE discovered_urls SET state = 'done' WHERE id IN (SELECT id FROM individuals)")
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS individuals (
-                id TEXT PRIMARY KEY,
-                name TEXT,
-                first_name TEXT,
-                last_name TEXT,
-                prefix TEXT,
-                suffix TEXT,
-                birth_date TEXT,
-                birth_date_civil TEXT,
-                birth_place TEXT,
-                death_date TEXT,
-                death_date_civil TEXT,
-                death_place TEXT,
-                gender TEXT,
-                url TEXT
+            UPDATE discovered_urls SET priority = (
+                SELECT COUNT(*) FROM relationships r WHERE r.related_id = discovered_urls.id
             )
         """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS discovered_urls (
-                id TEXT PRIMARY KEY,
-                url TEXT,
-                failure_count INTEGER DEFAULT 0
-            )
+    if "lease_owner" not in existing_discovered_columns:
+        cursor.execute("ALTER TABLE discovered_urls ADD COLUMN lease_owner TEXT")
+        cursor.execute("ALTER TABLE discovered_urls ADD COLUMN lease_expires REAL")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_discovered_frontier ON discovered_urls (state, depth, priority)")
+    # Claimable and pending URLs are a small part of a table that is
+    # mostly done URLs, so partial indexes find them without a scan
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_discovered_claimable ON discovered_urls (depth, priority)"
+        " WHERE state IN ('queued', 'in_flight')"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_discovered_pending ON discovered_urls (failure_count) WHERE state != 'done'"
+    )
+    # Reverse lookups: who links to a person
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_relationships_related ON relationships (related_id)")
+
+    # Highest numeric person ID, kept up to date by a trigger instead of
+    # a scan of every ID
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS id_watermarks (
+            name TEXT PRIMARY KEY,
+            value INTEGER
+        )
+    """)
+    if cursor.execute("SELECT 1 FROM id_watermarks WHERE name = 'individuals'").fetchone() is None:
+        cursor.execute(f"""
+            INSERT INTO id_watermarks (name, value)
+            SELECT 'individuals', COALESCE(MAX(CAST(id AS INTEGER)), 0) FROM individuals WHERE {_NUMERIC_ID}
         """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS individuals_max_id AFTER INSERT ON individuals
+        WHEN NEW.id GLOB '[0-9]*' AND NEW.id NOT GLOB '*[^0-9]*'
+        BEGIN
+            UPDATE id_watermarks SET value = MAX(value, CAST(NEW.id AS INTEGER)) WHERE name = 'individuals';
+        END
+    """)
 
-        # Ensure all columns exist (simple migration)
-        cursor.execute("PRAGMA table_info(discovered_urls)")
-        existing_discovered_columns = [row[1] for row in cursor.fetchall()]
-        if "failure_count" not in existing_discovered_columns:
-            cursor.execute("ALTER TABLE discovered_urls ADD COLUMN failure_count INTEGER DEFAULT 0")
-
-        cursor.execute("PRAGMA table_info(individuals)")
-        existing_columns = [row[1] for row in cursor.fetchall()]
-        required_columns = [
-            ("birth_date_civil", "TEXT"),
-            ("death_date_civil", "TEXT"),
-            ("first_name", "TEXT"),
-            ("last_name", "TEXT"),
-            ("prefix", "TEXT"),
-            ("suffix", "TEXT"),
-        ]
-        for col_name, col_type in required_columns:
-            if col_name not in existing_columns:
-                cursor.execute(f"ALTER TABLE individuals ADD COLUMN {col_name} {col_type}")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS negative_cache (
+            id TEXT PRIMARY KEY,
+            url TEXT,
+            failure_class TEXT,
+            recorded_at REAL,
+            expires_at REAL,
+            hits INTEGER DEFAULT 1
+        )
+    """)
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS relationships (
-                person_id TEXT,
-                related_id TEXT,
-                type TEXT,
-                PRIMARY KEY (person_id, related_id, type)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            name TEXT PRIMARY KEY,
+            tokens REAL,
+            updated_at REAL,
+            paused_until REAL DEFAULT 0
+        )
+    """)
+
+
+def _compact_schema(cursor):
+    """Version 2: integer person IDs, WITHOUT ROWID link tables, shared URL templates and type names.
+
+    ``individuals`` and ``discovered_urls`` stay rowid tables, since the
+    visited snapshot and the frontier order rely on their rowids, which
+    are copied over unchanged.
+    """
+    cursor.execute("CREATE TABLE relationship_types (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    cursor.executemany("INSERT INTO relationship_types (name) VALUES (?)", [(name,) for name in RELATIONSHIP_TYPES])
+    cursor.execute("CREATE TABLE url_templates (id INTEGER PRIMARY KEY, template TEXT NOT NULL UNIQUE)")
+    record_columns = ", ".join(_RECORD_COLUMNS)
+
+    cursor.execute(f"""
+        CREATE TABLE individuals_new (
+            id PERSON_ID PRIMARY KEY,
+            {", ".join(f"{col} TEXT" for col in _RECORD_COLUMNS[1:])},
+            url_template INTEGER,
+            url TEXT
+        )
+    """)
+    people = [(row[0],) + tuple(row[1:-1]) + _url_parts(row[1], row[-1])
+              for row in cursor.execute(f"SELECT rowid, {record_columns}, url FROM individuals").fetchall()]
+    _store_templates(cursor, [row[-2] for row in people])
+    cursor.executemany(
+        f"INSERT OR IGNORE INTO individuals_new (rowid, {record_columns}, url_template, url)"
+        f" VALUES (?, {', '.join('?' for _ in _RECORD_COLUMNS)}, {_TEMPLATE_ID}, ?)",
+        people,
+    )
+
+    cursor.execute("""
+        CREATE TABLE discovered_urls_new (
+            id PERSON_ID PRIMARY KEY,
+            url_template INTEGER,
+            url TEXT,
+            failure_count INTEGER DEFAULT 0,
+            state TEXT DEFAULT 'queued',
+            depth INTEGER,
+            priority INTEGER DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires REAL
+        )
+    """)
+    frontier_columns = "failure_count, state, depth, priority, lease_owner, lease_expires"
+    discovered = [(row[0], row[1]) + _url_parts(row[1], row[2]) + tuple(row[3:])
+                  for row in cursor.execute(f"SELECT rowid, id, url, {frontier_columns} FROM discovered_urls").fetchall()]
+    _store_templates(cursor, [row[2] for row in discovered])
+    cursor.executemany(
+        f"INSERT OR IGNORE INTO discovered_urls_new (rowid, id, url_template, url, {frontier_columns})"
+        f" VALUES (?, ?, {_TEMPLATE_ID}, ?, ?, ?, ?, ?, ?, ?)",
+        discovered,
+    )
+
+    cursor.execute("""
+        CREATE TABLE relationships_new (
+            person_id PERSON_ID,
+            related_id PERSON_ID,
+            type_id INTEGER,
+            PRIMARY KEY (person_id, related_id, type_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("INSERT OR IGNORE INTO relationship_types (name) SELECT DISTINCT type FROM relationships")
+    cursor.execute("""
+        INSERT OR IGNORE INTO relationships_new (person_id, related_id, type_id)
+        SELECT r.person_id, r.related_id, t.id FROM relationships r JOIN relationship_types t ON t.name = r.type
+    """)
+
+    for table, columns in (
+        ("freshness", "id PERSON_ID PRIMARY KEY, last_scraped_at REAL, content_hash TEXT, checks INTEGER DEFAULT 0,"
+                      " changes INTEGER DEFAULT 0, observed_seconds REAL DEFAULT 0, change_rate REAL,"
+                      " record_hash TEXT, relationships_hash TEXT"),
+        ("http_validators", "id PERSON_ID PRIMARY KEY, etag TEXT, last_modified TEXT"),
+        ("negative_cache", "id PERSON_ID PRIMARY KEY, url TEXT, failure_class TEXT, recorded_at REAL,"
+                           " expires_at REAL, hits INTEGER DEFAULT 1"),
+        ("id_watermarks", "name TEXT PRIMARY KEY, value INTEGER"),
+        ("rate_limits", "name TEXT PRIMARY KEY, tokens REAL, updated_at REAL, paused_until REAL DEFAULT 0"),
+    ):
+        cursor.execute(f"CREATE TABLE {table}_new ({columns}) WITHOUT ROWID")
+        cursor.execute(f"INSERT OR IGNORE INTO {table}_new SELECT * FROM {table}")
+
+    for table in ("individuals", "discovered_urls", "relationships", "freshness", "http_validators",
+                  "negative_cache", "id_watermarks", "rate_limits"):
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+    cursor.execute("CREATE INDEX idx_discovered_frontier ON discovered_urls (state, depth, priority)")
+    cursor.execute(
+        "CREATE INDEX idx_discovered_claimable ON discovered_urls (depth, priority) WHERE state IN ('queued', 'in_flight')"
+    )
+    cursor.execute("CREATE INDEX idx_discovered_pending ON discovered_urls (failure_count) WHERE state != 'done'")
+    cursor.execute("CREATE INDEX idx_relationships_related ON relationships (related_id)")
+    cursor.execute("""
+        CREATE TRIGGER individuals_max_id AFTER INSERT ON individuals
+        WHEN typeof(NEW.id) = 'integer'
+        BEGIN
+            UPDATE id_watermarks SET value = MAX(value, NEW.id) WHERE name = 'individuals';
+        END
+    """)
+
+    # What the code reads: people with their full URL, links with their type name
+    cursor.execute(f"""
+        CREATE VIEW individual_records AS
+        SELECT {", ".join(f"i.{col}" for col in _RECORD_COLUMNS)},
+               COALESCE(i.url, replace(t.template, '{{id}}', i.id)) AS url
+        FROM individuals i LEFT JOIN url_templates t ON t.id = i.url_template
+    """)
+    cursor.execute("""
+        CREATE VIEW relationship_records AS
+        SELECT r.person_id, r.related_id, t.name AS type
+        FROM relationships r JOIN relationship_types t ON t.id = r.type_id
+    """)
+
+
+# Schema changes in order; a database records the versions it has applied
+# in ``schema_version`` and gets the rest when it is opened
+MIGRATIONS = (
+    (1, _baseline_schema),
+    (2, _compact_schema),
+)
+
+
+class DatabaseHelper:
+    """SQLite storage with one writing connection and a pool of readers.
+
+    Every write goes through ``conn`` under ``lock``. Queries run on up to
+    ``readers`` read-only connections (see ``reader``), so exports and
+    lookups do not wait for the crawl's writes. With ``wal`` the file uses
+    write-ahead logging, which lets those readers work while a write
+    transaction is open; processes on different hosts sharing the file
+    over a network file system need ``wal=False``. An in-memory database
+    has no separate readers and serves queries from ``conn``.
+
+    With ``memory`` the file at ``db_path`` is loaded into an in-memory
+    database, so writes cost no disk I/O, and copied back by ``snapshot``
+    every ``snapshot_interval`` seconds and on ``close`` (or at exit).
+    A crash loses at most the writes since the last snapshot. Only one
+    process should use the file this way at a time.
+    """
+
+    def __init__(self, db_path, wal=True, readers=DEFAULT_READERS, memory=False,
+                 snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL):
+        self.db_path = db_path
+        self.wal = wal
+        # Several crawl processes may share the file; wait for their locks
+        self.conn = sqlite3.connect(":memory:" if memory else db_path, check_same_thread=False, timeout=30,
+                                    detect_types=sqlite3.PARSE_DECLTYPES)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        self.in_memory = memory or _is_memory(db_path)
+        if wal and not self.in_memory:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.max_readers = 0 if self.in_memory else readers
+        self._readers = Queue()
+        self._reader_count = 0
+        self._readers_lock = threading.Lock()
+        self.snapshot_path = db_path if memory and not _is_memory(db_path) else None
+        self.snapshots = 0
+        self._snapshot_changes = None
+        self._snapshot_thread = None
+        self._stop_snapshots = threading.Event()
+        if self.snapshot_path is not None and os.path.exists(self.snapshot_path):
+            source = sqlite3.connect(self.snapshot_path, timeout=30)
+            try:
+                source.backup(self.conn)
+            finally:
+                source.close()
+            self._snapshot_changes = self.conn.total_changes
+        self._migrate()
+        if self.snapshot_path is not None:
+            # Exiting without close(), after Ctrl-C say, still keeps the work
+            atexit.register(self.close)
+            if snapshot_interval:
+                self._snapshot_thread = threading.Thread(
+                    target=self._snapshot_loop, args=(snapshot_interval,), name="db-snapshot", daemon=True
+                )
+                self._snapshot_thread.start()
+
+    def snapshot(self):
+        """Copy the in-memory database to ``snapshot_path`` with SQLite's online backup API.
+
+        The copy is one transaction on the file, so a crash part way
+        through leaves the previous snapshot intact. Does nothing when
+        nothing was written since the last snapshot. Returns True when a
+        snapshot was written.
+        """
+        if self.snapshot_path is None:
+            return False
+        target = sqlite3.connect(self.snapshot_path, timeout=30)
+        try:
+            if self.wal:
+                target.execute("PRAGMA journal_mode=WAL")
+            with self.lock:
+                if self.conn.total_changes == self._snapshot_changes:
+                    return False
+                self.conn.backup(target)
+                self._snapshot_changes = self.conn.total_changes
+        finally:
+            target.close()
+        self.snapshots += 1
+        return True
+
+    def _snapshot_loop(self, interval):
+        while not self._stop_snapshots.wait(interval):
+            try:
+                self.snapshot()
+            except sqlite3.Error as e:
+                print(f"Error writing the database snapshot to {self.snapshot_path}: {e}")
+
+    def _open_reader(self):
+        uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=30,
+                               detect_types=sqlite3.PARSE_DECLTYPES)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _migrate(self):
+        """Apply the ``MIGRATIONS`` this database has not had yet.
+
+        They run in one immediate transaction, so a process opening the
+        file while another migrates it waits and then finds it up to date.
+        """
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                applied_at REAL
             )
         """)
-        self.conn.commit()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self.conn.cursor()
+                current = cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+                pending = [(version, migration) for version, migration in MIGRATIONS if version > current]
+                for version, migration in pending:
+                    migration(cursor)
+                    cursor.execute("INSERT INTO schema_version (version, applied_at) VALUES (?, ?)",
+                                   (version, time.time()))
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            if pending and self.conn.execute("PRAGMA freelist_count").fetchone()[0]:
+                # Give back the pages of the tables a migration rebuilt
+                try:
+                    self.conn.execute("VACUUM")
+                except sqlite3.OperationalError as e:
+                    print(f"Could not compact the database after migrating it: {e}")
+
+    def schema_version(self):
+        with self.reader() as conn:
+            return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0]
+
+    @contextmanager
+    def reader(self):
+        """A read-only connection for queries, returned to the pool afterwards.
+
+        Statements run in one read transaction, so a multi-query read (an
+        export) sees a single consistent snapshot of the database.
+        """
+        if not self.max_readers:
+            with self.lock:
+                yield self.conn
+            return
+        try:
+            conn = self._readers.get_nowait()
+        except Empty:
+            with self._readers_lock:
+                create = self._reader_count < self.max_readers
+                if create:
+                    self._reader_count += 1
+            conn = self._open_reader() if create else self._readers.get()
+        try:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            finally:
+                conn.rollback()
+        finally:
+            self._readers.put(conn)
 
     def add_individual(self, data):
         with self.lock:
             cursor = self.conn.cursor()
-            cursor.execute("""
-                INSERT OR REPLACE INTO individuals
-                (id, name, first_name, last_name, prefix, suffix, birth_date, birth_date_civil, birth_place, death_date, death_date_civil, death_place, gender, url)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                data.get("id"),
-                data.get("name"),
-                data.get("first_name"),
-                data.get("last_name"),
-                data.get("prefix"),
-                data.get("suffix"),
-                data.get("birth_date"),
-                data.get("birth_date_civil"),
-                data.get("birth_place"),
-                data.get("death_date"),
-                data.get("death_date_civil"),
-                data.get("death_place"),
-                data.get("gender"),
-                data.get("url")
-            ))
+            _store_templates(cursor, [_url_parts(data.get("id"), data.get("url"))[0]])
+            cursor.execute("INSERT OR REPLACE" + _INSERT_INDIVIDUAL, _individual_row(data))
+            cursor.execute("UPDATE freshness SET record_hash = NULL WHERE id = ?", (data.get("id"),))
             self.conn.commit()
 
-    def get_individual(self, individual_id):
+    def add_individuals(self, records):
+        """Insert or replace many individuals in a single transaction."""
+        rows = [_individual_row(data) for data in records]
         with self.lock:
-            cursor = self.conn.cursor()
+            with self.conn:
+                _store_templates(self.conn, [row[-2] for row in rows])
+                self.conn.executemany("INSERT OR REPLACE" + _INSERT_INDIVIDUAL, rows)
+                self.conn.executemany("UPDATE freshness SET record_hash = NULL WHERE id = ?",
+                                      [(data.get("id"),) for data in records])
+
+    def get_individuals(self):
+        """Every stored individual, keyed by ID."""
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM individual_records")
+            return {row["id"]: dict(row) for row in cursor.fetchall()}
+
+    def get_individual(self, individual_id):
+        with self.reader() as conn:
+            cursor = conn.cursor()
             cursor.execute(
-                "SELECT * FROM individuals WHERE id = ?", (individual_id,)
+                "SELECT * FROM individual_records WHERE id = ?", (individual_id,)
             )
             row = cursor.fetchone()
             return dict(row) if row else None
@@ -105,43 +584,376 @@ class DatabaseHelper:
     def add_relationship(self, person_id, related_id, rel_type):
         with self.lock:
             cursor = self.conn.cursor()
-            cursor.execute("""
-                INSERT OR IGNORE INTO relationships (person_id, related_id, type)
-                VALUES (?, ?, ?)
-            """, (person_id, related_id, rel_type))
+            _store_types(cursor, [rel_type])
+            cursor.execute(_INSERT_RELATIONSHIP, (person_id, related_id, rel_type))
             self.conn.commit()
 
-    def get_relationships(self, person_id):
+    def store_person(self, data, rels, record_hash, relationships_hash):
+        """Write a scraped person and its relationships, skipping what is unchanged.
+
+        The hashes of the last stored record and relationship set are kept
+        in ``freshness``; when they match nothing is written. A changed
+        record only updates the columns that differ and a changed
+        relationship set only inserts and deletes the links that differ.
+        Call it after ``record_check`` so the freshness row exists. Returns
+        ``(record_written, relationships_written)``.
+        """
         with self.lock:
-            cursor = self.conn.cursor()
+            with self.conn:
+                return self._store_person(data, rels, record_hash, relationships_hash)
+
+    def _store_person(self, data, rels, record_hash, relationships_hash):
+        person_id = data["id"]
+        row = self.conn.execute(
+            "SELECT record_hash, relationships_hash FROM freshness WHERE id = ?", (person_id,)
+        ).fetchone()
+        record_written = row is None or row["record_hash"] != record_hash
+        if record_written:
+            record_written = self._write_individual(data)
+        relationships_written = row is None or row["relationships_hash"] != relationships_hash
+        if relationships_written:
+            relationships_written = self._write_relationships(person_id, rels)
+        if row is not None and (row["record_hash"], row["relationships_hash"]) != (record_hash, relationships_hash):
+            self.conn.execute(
+                "UPDATE freshness SET record_hash = ?, relationships_hash = ? WHERE id = ?",
+                (record_hash, relationships_hash, person_id),
+            )
+        return record_written, relationships_written
+
+    def _write_individual(self, data):
+        stored = self.conn.execute("SELECT * FROM individual_records WHERE id = ?", (data["id"],)).fetchone()
+        template, url = _url_parts(data["id"], data.get("url"))
+        if stored is None:
+            _store_templates(self.conn, [template])
+            self.conn.execute("INSERT" + _INSERT_INDIVIDUAL, _individual_row(data))
+            return True
+        changed = [col for col in INDIVIDUAL_COLUMNS if stored[col] != data.get(col)]
+        assignments = [f"{col} = ?" for col in changed if col != "url"]
+        params = tuple(data.get(col) for col in changed if col != "url")
+        if "url" in changed:
+            _store_templates(self.conn, [template])
+            assignments += [f"url_template = {_TEMPLATE_ID}", "url = ?"]
+            params += (template, url)
+        if changed:
+            self.conn.execute(f"UPDATE individuals SET {', '.join(assignments)} WHERE id = ?", params + (data["id"],))
+        return bool(changed)
+
+    def _write_relationships(self, person_id, rels):
+        stored = {tuple(link) for link in self.conn.execute(
+            "SELECT related_id, type FROM relationship_records WHERE person_id = ?", (person_id,)
+        )}
+        links = {(rel["related_id"], rel["type"]) for rel in rels}
+        self.conn.executemany(
+            f"DELETE FROM relationships WHERE person_id = ? AND related_id = ? AND type_id = {_TYPE_ID}",
+            [(person_id,) + link for link in stored - links],
+        )
+        _store_types(self.conn, [rel_type for _, rel_type in links - stored])
+        self.conn.executemany(_INSERT_RELATIONSHIP, [(person_id,) + link for link in links - stored])
+        return stored != links
+
+    def replace_relationships(self, person_ids, rels):
+        """Swap the stored relationships of ``person_ids`` for ``rels`` in one transaction."""
+        with self.lock:
+            with self.conn:
+                self.conn.executemany("DELETE FROM relationships WHERE person_id = ?", [(pid,) for pid in person_ids])
+                self.conn.executemany("UPDATE freshness SET relationships_hash = NULL WHERE id = ?",
+                                      [(pid,) for pid in person_ids])
+                _store_types(self.conn, [rel["type"] for rel in rels])
+                self.conn.executemany(
+                    _INSERT_RELATIONSHIP, [(rel["person_id"], rel["related_id"], rel["type"]) for rel in rels]
+                )
+                discovered = [(rel["related_id"],) + _url_parts(rel["related_id"], rel["url"]) for rel in rels]
+                _store_templates(self.conn, [row[1] for row in discovered])
+                self.conn.executemany(
+                    f"INSERT OR IGNORE INTO discovered_urls (id, url_template, url) VALUES (?, {_TEMPLATE_ID}, ?)",
+                    discovered,
+                )
+
+    def get_all_relationships(self):
+        """Every stored relationship as ``{person_id: {(related_id, type), ...}}``."""
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT person_id, related_id, type FROM relationship_records")
+            relationships = {}
+            for person_id, related_id, rel_type in cursor.fetchall():
+                relationships.setdefault(person_id, set()).add((related_id, rel_type))
+            return relationships
+
+    def get_relationships(self, person_id):
+        with self.reader() as conn:
+            cursor = conn.cursor()
             cursor.execute(
-                "SELECT * FROM relationships WHERE person_id = ?", (person_id,)
+                "SELECT * FROM relationship_records WHERE person_id = ?", (person_id,)
             )
             return [dict(row) for row in cursor.fetchall()]
 
     def get_all_ids(self):
-        with self.lock:
-            cursor = self.conn.cursor()
+        with self.reader() as conn:
+            cursor = conn.cursor()
             cursor.execute("SELECT id FROM individuals")
             return [row[0] for row in cursor.fetchall()]
 
+    def get_ids_watermark(self):
+        """``(max_rowid, count)`` of ``individuals``; changes whenever a person is added.
+
+        ``INSERT OR REPLACE`` gives the row a new rowid, so rows written
+        after a watermark are exactly those with a larger rowid.
+        """
+        with self.reader() as conn:
+            row = conn.execute("SELECT COALESCE(MAX(rowid), 0), COUNT(*) FROM individuals").fetchone()
+            return row[0], row[1]
+
+    def get_ids_since(self, rowid):
+        """IDs of the people written after ``rowid``."""
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM individuals WHERE rowid > ?", (rowid,))
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_existing_ids(self, person_ids):
+        """The subset of ``person_ids`` already stored, found in one query."""
+        with self.lock:
+            with self.conn:
+                self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_ids (id PERSON_ID PRIMARY KEY)")
+                self.conn.execute("DELETE FROM lookup_ids")
+                self.conn.executemany("INSERT OR IGNORE INTO lookup_ids (id) VALUES (?)", [(pid,) for pid in person_ids])
+                rows = self.conn.execute("SELECT i.id FROM individuals i JOIN lookup_ids l ON i.id = l.id").fetchall()
+                self.conn.execute("DELETE FROM lookup_ids")
+        return {row[0] for row in rows}
+
+    def get_undiscovered_relatives(self, limit):
+        """``(related_id, url)`` of people linked from a stored person but neither stored nor queued.
+
+        ``url`` is the page of the person linking to them.
+        """
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            # Distinct IDs come off the related_id index; the linking page
+            # is only looked up for the IDs returned
+            cursor.execute("""
+                SELECT r.related_id, (
+                    SELECT i.url FROM relationships r2 JOIN individual_records i ON i.id = r2.person_id
+                    WHERE r2.related_id = r.related_id LIMIT 1
+                ) AS url
+                FROM (SELECT DISTINCT related_id FROM relationships) r
+                WHERE NOT EXISTS (SELECT 1 FROM individuals i WHERE i.id = r.related_id)
+                  AND NOT EXISTS (SELECT 1 FROM discovered_urls d WHERE d.id = r.related_id)
+                  AND url IS NOT NULL
+                LIMIT ?
+            """, (limit,))
+            return [tuple(row) for row in cursor.fetchall()]
+
     def add_discovered_url(self, person_id, url):
         with self.lock:
             cursor = self.conn.cursor()
-            cursor.execute("""
-                INSERT OR IGNORE INTO discovered_urls (id, url)
-                VALUES (?, ?)
-            """, (person_id, url))
+            template, url = _url_parts(person_id, url)
+            _store_templates(cursor, [template])
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO discovered_urls (id, url_template, url)
+                VALUES (?, {_TEMPLATE_ID}, ?)
+            """, (person_id, template, url))
             self.conn.commit()
 
-    def get_pending_urls(self, max_failures=3):
+    def enqueue_relationships(self, rels):
+        """Add the people linked from a crawled page to the frontier.
+
+        Each link is queued one step further from the seed than the page it
+        was found on, keeping the shortest distance seen, and raises the
+        priority of a person that is still waiting. Returns the number of
+        people newly added.
+        """
+        with self.lock:
+            with self.conn:
+                return self._enqueue_relationships(rels)
+
+    def _enqueue_relationships(self, rels):
+        added = 0
+        urls = [_url_parts(rel["related_id"], rel["url"]) for rel in rels]
+        _store_templates(self.conn, [template for template, _ in urls])
+        for rel, (template, url) in zip(rels, urls):
+            # People already stored (the seed, say) are not queued again
+            cursor = self.conn.execute(f"""
+                INSERT OR IGNORE INTO discovered_urls (id, url_template, url, state, depth, priority)
+                SELECT ?, {_TEMPLATE_ID}, ?, 'queued',
+                       COALESCE((SELECT depth FROM discovered_urls WHERE id = ?), 0) + 1, 1
+                WHERE NOT EXISTS (SELECT 1 FROM individuals WHERE id = ?)
+            """, (rel["related_id"], template, url, rel["person_id"], rel["related_id"]))
+            if cursor.rowcount:
+                added += 1
+                continue
+            self.conn.execute("""
+                UPDATE discovered_urls
+                SET priority = priority + 1,
+                    depth = MIN(COALESCE(depth, 1000000000),
+                                COALESCE((SELECT depth FROM discovered_urls WHERE id = ?), 0) + 1)
+                WHERE id = ? AND state = 'queued'
+            """, (rel["person_id"], rel["related_id"]))
+        return added
+
+    def queue_url(self, person_id, url, max_failures):
+        """Put a single URL on the frontier; True if it was not already waiting."""
+        template, url = _url_parts(person_id, url)
+        with self.lock:
+            with self.conn:
+                _store_templates(self.conn, [template])
+                cursor = self.conn.execute(_QUEUE_URL, (person_id, template, url))
+                if cursor.rowcount:
+                    return True
+                cursor = self.conn.execute("""
+                    UPDATE discovered_urls SET state = 'queued'
+                    WHERE id = ? AND state = 'failed' AND failure_count < ?
+                """, (person_id, max_failures))
+                return cursor.rowcount > 0
+
+    def queue_urls(self, seeds, max_failures):
+        """Put many ``(person_id, url)`` pairs on the frontier in one transaction.
+
+        Returns the IDs that were not already waiting.
+        """
+        added = []
+        seeds = [(person_id,) + _url_parts(person_id, url) for person_id, url in seeds]
+        with self.lock:
+            with self.conn:
+                _store_templates(self.conn, [template for _, template, _ in seeds])
+                for person_id, template, url in seeds:
+                    cursor = self.conn.execute(_QUEUE_URL, (person_id, template, url))
+                    if not cursor.rowcount:
+                        cursor = self.conn.execute("""
+                            UPDATE discovered_urls SET state = 'queued'
+                            WHERE id = ? AND state = 'failed' AND failure_count < ?
+                        """, (person_id, max_failures))
+                    if cursor.rowcount:
+                        added.append(person_id)
+        return added
+
+    def claim_frontier(self, limit, max_failures, owner, lease_seconds, now=None):
+        """Lease the ``limit`` most valuable queued URLs to ``owner`` and return them.
+
+        URLs closest to the seed come first, then those linked from the most
+        crawled pages. URLs whose lease has expired, because the worker
+        holding them died, are handed out again. The claim is a single
+        ``UPDATE ... RETURNING`` inside an immediate transaction, so
+        concurrent processes never lease the same URL.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.conn.execute(f"""
+                    UPDATE discovered_urls
+                    SET state = 'in_flight', lease_owner = ?, lease_expires = ?
+                    WHERE id IN (
+                        SELECT d.id FROM discovered_urls d
+                        WHERE {_CLAIMABLE}
+                        ORDER BY d.depth IS NULL, d.depth, d.priority DESC, d.rowid
+                        LIMIT ?
+                    )
+                    RETURNING id, {_FRONTIER_URL} AS url, depth, priority, rowid
+                """, (owner, now + lease_seconds, now, max_failures, now, limit)).fetchall()
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        # RETURNING does not preserve the ORDER BY of the subquery
+        rows.sort(key=lambda row: (row["depth"] is None, row["depth"] or 0, -row["priority"], row["rowid"]))
+        return [(row["id"], row["url"]) for row in rows]
+
+    def count_queued(self, max_failures, now=None):
+        """Number of URLs a worker could claim right now."""
+        now = time.time() if now is None else now
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM discovered_urls d WHERE {_CLAIMABLE}", (now, max_failures, now))
+            return cursor.fetchone()[0]
+
+    def renew_leases(self, owner, lease_seconds, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE discovered_urls SET lease_expires = ? WHERE lease_owner = ? AND state = 'in_flight'",
+                    (now + lease_seconds, owner),
+                )
+
+    def set_frontier_state(self, person_ids, state, owner=None):
+        """Finish URLs with ``state`` and drop their leases.
+
+        With ``owner`` only URLs still leased to it are changed.
+        """
+        with self.lock:
+            with self.conn:
+                self._set_frontier_state(person_ids, state, owner)
+
+    def _set_frontier_state(self, person_ids, state, owner=None):
+        query = """
+            UPDATE discovered_urls SET state = ?, lease_owner = NULL, lease_expires = NULL
+            WHERE id = ? AND (state IS NOT ? OR lease_owner IS NOT NULL)
+        """
+        if owner is not None:
+            query += " AND lease_owner = ?"
+        self.conn.executemany(
+            query,
+            [(state, person_id, state) + ((owner,) if owner is not None else ()) for person_id in person_ids],
+        )
+
+    def reserve_rate_token(self, name, rate, burst, now=None):
+        """Take a token from a token bucket shared by every process; returns the wait."""
+        now = time.time() if now is None else now
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT tokens, updated_at FROM rate_limits WHERE name = ?", (name,)).fetchone()
+                if row is None or row["tokens"] is None:
+                    tokens = float(burst)
+                else:
+                    tokens = min(burst, row["tokens"] + max(0.0, now - row["updated_at"]) * rate)
+                tokens -= 1
+                self.conn.execute("""
+                    INSERT INTO rate_limits (name, tokens, updated_at) VALUES (?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+                """, (name, tokens, now))
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        return 0.0 if tokens >= 0 else -tokens / rate
+
+    def pause_shared(self, name, until):
+        """Extend the shared pause of ``name`` to the wall-clock time ``until``."""
+        with self.lock:
+            with self.conn:
+                self.conn.execute("""
+                    INSERT INTO rate_limits (name, paused_until) VALUES (?, ?)
+                    ON CONFLICT(name) DO UPDATE SET paused_until = MAX(COALESCE(paused_until, 0), excluded.paused_until)
+                """, (name, until))
+
+    def get_shared_pause(self, name):
         with self.lock:
             cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT d.id, d.url 
+            cursor.execute("SELECT paused_until FROM rate_limits WHERE name = ?", (name,))
+            row = cursor.fetchone()
+            return row[0] or 0.0 if row else 0.0
+
+    def requeue_frontier(self, state, max_failures=None):
+        """Move URLs in ``state`` back to queued; returns how many moved."""
+        query = "UPDATE discovered_urls SET state = 'queued' WHERE state = ?"
+        params = (state,)
+        if max_failures is not None:
+            query += " AND failure_count < ?"
+            params += (max_failures,)
+        with self.lock:
+            with self.conn:
+                return self.conn.execute(query, params).rowcount
+
+    def get_pending_urls(self, max_failures=3):
+        # A done URL is always stored, so the partial index skips all of them
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT d.id, {_FRONTIER_URL} AS url
                 FROM discovered_urls d
-                LEFT JOIN individuals i ON d.id = i.id
-                WHERE i.id IS NULL AND d.failure_count < ?
+                WHERE d.state != 'done' AND d.failure_count < ?
+                  AND NOT EXISTS (SELECT 1 FROM individuals i WHERE i.id = d.id)
             """, (max_failures,))
             return [dict(row) for row in cursor.fetchall()]
 
@@ -161,16 +973,253 @@ class DatabaseHelper:
             cursor.execute("""
                 UPDATE discovered_urls
                 SET failure_count = 0
-                WHERE id = ?
+                WHERE id = ? AND failure_count != 0
             """, (person_id,))
             self.conn.commit()
 
-    def get_max_id(self):
+    def get_validators(self, person_id):
+        """The ETag/Last-Modified last seen for a person's page, or None."""
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT etag, last_modified FROM http_validators WHERE id = ?", (person_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def set_validators(self, person_id, etag, last_modified):
         with self.lock:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT MAX(CAST(id AS INTEGER)) FROM individuals")
+            with self.conn:
+                self.conn.execute(_UPSERT_VALIDATORS, (person_id, etag, last_modified))
+
+    def record_check(self, person_id, content_hash=None, now=None):
+        """Record that a person's page was just fetched.
+
+        ``content_hash`` is None when the server answered 304, which counts
+        as unchanged. Returns True when the content differs from the last
+        check.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            with self.conn:
+                return self._record_check(person_id, content_hash, now)
+
+    def _record_check(self, person_id, content_hash, now):
+        row = self.conn.execute("SELECT * FROM freshness WHERE id = ?", (person_id,)).fetchone()
+        if row is None:
+            self.conn.execute("""
+                INSERT INTO freshness (id, last_scraped_at, content_hash, change_rate)
+                VALUES (?, ?, ?, ?)
+            """, (person_id, now, content_hash, change_rate(0, 0)))
+            return False
+        changed = content_hash is not None and content_hash != row["content_hash"]
+        checks = row["checks"] + 1
+        changes = row["changes"] + int(changed)
+        observed = row["observed_seconds"] + max(0.0, now - row["last_scraped_at"])
+        self.conn.execute("""
+            UPDATE freshness
+            SET last_scraped_at = ?, content_hash = ?, checks = ?, changes = ?,
+                observed_seconds = ?, change_rate = ?
+            WHERE id = ?
+        """, (now, content_hash or row["content_hash"], checks, changes, observed,
+              change_rate(changes, observed), person_id))
+        return changed
+
+    def write_batch(self, items):
+        """Apply queued ``PageResult``, ``PageCheck`` and ``PageFailure`` items in one transaction.
+
+        Items are applied in order, with runs of the same kind grouped so
+        their single-row updates go through ``executemany``. Returns
+        ``(changed, written)`` for every page result, in order: whether its
+        content changed since the last check and whether anything besides
+        the check was written.
+        """
+        outcomes = []
+        with self.lock:
+            with self.conn:
+                for kind, group in groupby(items, key=type):
+                    group = list(group)
+                    if kind is PageResult:
+                        outcomes.extend(self._write_pages(group))
+                    elif kind is PageCheck:
+                        for check in group:
+                            self._record_check(check.person_id, None, check.checked_at)
+                    elif kind is PageFailure:
+                        self._write_failures(group)
+                    else:
+                        raise TypeError(f"Cannot write {kind.__name__}")
+        return outcomes
+
+    def _write_pages(self, pages):
+        outcomes = []
+        discovered = []
+        for page in pages:
+            person_id = page.data["id"]
+            changed = self._record_check(person_id, page.content_hash, page.checked_at)
+            record_written, relationships_written = self._store_person(
+                page.data, page.rels, page.record_hash, page.relationships_hash
+            )
+            if relationships_written:
+                discovered.extend(page.rels)
+            outcomes.append((changed, record_written or relationships_written))
+        person_ids = [page.data["id"] for page in pages]
+        self.conn.executemany(
+            "UPDATE discovered_urls SET failure_count = 0 WHERE id = ? AND failure_count != 0",
+            [(person_id,) for person_id in person_ids],
+        )
+        self.conn.executemany(
+            _UPSERT_VALIDATORS, [(page.data["id"],) + tuple(page.validators) for page in pages if page.validators]
+        )
+        self._enqueue_relationships(discovered)
+        self._set_frontier_state(person_ids, 'done')
+        return outcomes
+
+    def _write_failures(self, failures):
+        self.conn.executemany(
+            "UPDATE discovered_urls SET failure_count = failure_count + 1 WHERE id = ?",
+            [(failure.person_id,) for failure in failures],
+        )
+        self._set_frontier_state([failure.person_id for failure in failures if failure.final], 'failed')
+
+    def get_freshness(self, person_id):
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM freshness WHERE id = ?", (person_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def get_stale_individuals(self, budget, now=None):
+        """The ``budget`` people whose stored data is most likely out of date.
+
+        People never checked since freshness tracking started come first,
+        then the rest by expected number of changes since their last check
+        (change rate times age), which orders them like ``staleness``.
+        """
+        now = time.time() if now is None else now
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT i.id, i.url, f.last_scraped_at, f.change_rate
+                FROM individual_records i
+                LEFT JOIN freshness f ON i.id = f.id
+                WHERE i.url IS NOT NULL
+                ORDER BY f.id IS NOT NULL,
+                         f.change_rate * (? - f.last_scraped_at) DESC
+                LIMIT ?
+            """, (now, budget))
+            stale = []
+            for row in cursor.fetchall():
+                item = dict(row)
+                if item["last_scraped_at"] is None:
+                    item["staleness"] = 1.0
+                else:
+                    item["staleness"] = staleness(item["change_rate"], now - item["last_scraped_at"])
+                stale.append(item)
+            return stale
+
+    def add_negative(self, person_id, url, failure_class, ttl, now=None):
+        """Remember that ``person_id`` failed with ``failure_class`` for ``ttl`` seconds."""
+        now = time.time() if now is None else now
+        with self.lock:
+            with self.conn:
+                self.conn.execute("""
+                    INSERT INTO negative_cache (id, url, failure_class, recorded_at, expires_at, hits)
+                    VALUES (?, ?, ?, ?, ?, 1)
+                    ON CONFLICT(id) DO UPDATE SET
+                        url = COALESCE(excluded.url, url), failure_class = excluded.failure_class,
+                        recorded_at = excluded.recorded_at, expires_at = excluded.expires_at, hits = hits + 1
+                """, (person_id, url, failure_class, now, now + ttl))
+
+    def remove_negative(self, person_id):
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM negative_cache WHERE id = ?", (person_id,))
+
+    def get_negative_ids(self, now=None):
+        """IDs whose negative cache entry has not expired."""
+        now = time.time() if now is None else now
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM negative_cache WHERE expires_at > ?", (now,))
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_negative_entries(self, failure_class=None, limit=None):
+        query = "SELECT * FROM negative_cache"
+        params = ()
+        if failure_class:
+            query += " WHERE failure_class = ?"
+            params = (failure_class,)
+        query += " ORDER BY recorded_at DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+
+    def count_negative(self, now=None):
+        """``{failure_class: (active, expired)}`` counts."""
+        now = time.time() if now is None else now
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT failure_class, SUM(expires_at > ?), SUM(expires_at <= ?)
+                FROM negative_cache GROUP BY failure_class ORDER BY failure_class
+            """, (now, now))
+            return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+    def purge_negative(self, failure_class=None, person_id=None, expired_only=False, now=None):
+        """Delete negative cache entries matching every given filter; returns the count."""
+        now = time.time() if now is None else now
+        conditions, params = [], []
+        if failure_class:
+            conditions.append("failure_class = ?")
+            params.append(failure_class)
+        if person_id:
+            conditions.append("id = ?")
+            params.append(person_id)
+        if expired_only:
+            conditions.append("expires_at <= ?")
+            params.append(now)
+        query = "DELETE FROM negative_cache"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self.lock:
+            with self.conn:
+                return self.conn.execute(query, params).rowcount
+
+    def get_numeric_ids(self):
+        """Sorted integer IDs of every stored or discovered person."""
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT CAST(id AS INTEGER) AS n FROM individuals WHERE {_NUMERIC_ID}
+                UNION
+                SELECT CAST(id AS INTEGER) FROM discovered_urls WHERE {_NUMERIC_ID}
+                ORDER BY n
+            """)
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_max_id(self):
+        """Highest numeric person ID ever stored, from the maintained watermark."""
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT value FROM id_watermarks WHERE name = 'individuals'")
             row = cursor.fetchone()
             return row[0] if row and row[0] else 0
 
     def close(self):
+        with self.lock:
+            # Refresh the planner statistics the indexes rely on
+            self.conn.execute("PRAGMA optimize")
+        if self.snapshot_path is not None:
+            atexit.unregister(self.close)
+            self._stop_snapshots.set()
+            if self._snapshot_thread is not None:
+                self._snapshot_thread.join()
+            self.snapshot()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except Empty:
+                break
         self.conn.close()
@@ -1,210 +1,741 @@
 import requests
+import re
 import time
 import random
 from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
-from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
-from src.scraper import Scraper
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from src.scraper import Scraper, PageTooLarge, parse_page
+from src.rate_limiter import TokenBucket, CircuitBreaker, SharedTokenBucket, SharedCircuitBreaker, parse_retry_after
+from src.concurrency import AdaptiveConcurrency
+from src.retry_scheduler import RetryScheduler, RetryLater
+from src.freshness import content_hash, record_hash, relationships_hash
+from src.frontier import Frontier
+from src.negative_cache import NegativeCache
+from src.prober import IdProber, person_url
+from src.budget import TimeBudget
+from src.idset import IdSet
+from src.writer import PageWriter, DEFAULT_WRITE_BATCH
+from src.database import PageResult, PageCheck, PageFailure
+from src.utils import person_id_from_url
 import threading
-from queue import Queue, Empty
+from queue import Empty
+
+DEFAULT_MAX_BODY_BYTES = 5 * 1024 * 1024
+STREAM_CHUNK_SIZE = 16 * 1024
+CHARSET_RE = re.compile(r'charset=["\']?([\w.:-]+)', re.I)
+# Fetch result for a page the server reported as unchanged (304)
+NOT_MODIFIED = object()
+
 
 class ScraperEngine:
-    def __init__(self, db_helper, max_workers=2, delay=1.0):
+    def __init__(self, db_helper, max_workers=2, delay=1.0, rate=None, burst=1, min_workers=None,
+                 parse_workers=0, stream=False, max_body_bytes=DEFAULT_MAX_BODY_BYTES, archive=None,
+                 shared_limits=False, write_batch=DEFAULT_WRITE_BATCH):
         self.db = db_helper
         self.scraper = Scraper()
-        self.visited_ids = set(self.db.get_all_ids())
-        self.pending_ids = set()
+        self.visited_ids = self._load_visited()
         self.lock = threading.Lock()
-        self.queue = Queue()
         self.max_workers = max_workers
+        self.parse_workers = parse_workers
+        # Streaming parses pages on the fetch threads while they download
+        self.stream = stream
+        self.max_body_bytes = max_body_bytes
+        # Optional PageArchive that keeps the raw body of every fetched page
+        self.archive = archive
+        # Validators of fetched pages, saved once the page is persisted
+        self._validators = {}
+        # Visited people queued again by `refresh`
+        self.refreshing = set()
+        self.unchanged_count = 0
+        self.skipped_writes = 0
+        self.changed_count = 0
+        self._stage_futures = None
+        # With min_workers below max_workers the number of in-flight
+        # requests is tuned at runtime; otherwise it stays at max_workers.
+        self.concurrency = AdaptiveConcurrency(
+            min_workers if min_workers is not None else max_workers, max_workers
+        )
         self.delay = delay
+        # `delay` is the engine-wide spacing between requests; an explicit
+        # `rate` (requests/second) takes precedence over it.
+        if rate is None:
+            rate = 1.0 / delay if delay > 0 else None
+        if shared_limits:
+            # Every process crawling this database draws from one budget
+            self.rate_limiter = SharedTokenBucket(self.db, rate, burst=burst)
+            self.breaker = SharedCircuitBreaker(self.db)
+        else:
+            self.rate_limiter = TokenBucket(rate, burst=burst)
+            self.breaker = CircuitBreaker()
+        self.max_retries = 3
+        # Queue workers record every failed attempt, so a URL gets up to
+        # three runs' worth of attempts before it stops being pending.
+        self.max_failures = (self.max_retries + 1) * 3
+        self.frontier = Frontier(self.db, self.max_failures)
+        # Page results are written behind the crawl in batched transactions
+        self.writer = PageWriter(self.db, batch_size=write_batch, on_page=self._on_written)
+        self.negative_cache = NegativeCache(self.db)
+        # Failure classes noted on fetch threads, recorded by the coordinator
+        self._failure_classes = {}
+        self.retries = RetryScheduler()
+        self.budget = TimeBudget()
         self.session = requests.Session()
         self.session.headers.update({'User-Agent': 'Lynx'})
 
+    def _snapshot_path(self):
+        db_path = getattr(self.db, "db_path", None)
+        if not db_path or db_path == ":memory:":
+            return None
+        return f"{db_path}.visited"
+
+    def _load_visited(self):
+        """Visited IDs from the snapshot, topped up from the database.
+
+        The snapshot is trusted only up to its watermark; people written
+        since are read by rowid. If the counts then disagree (a deleted or
+        edited row) the set is rebuilt from the database.
+        """
+        path = self._snapshot_path()
+        watermark = self.db.get_ids_watermark()
+        snapshot = IdSet.load(path) if path else None
+        if snapshot is not None:
+            ids, (max_rowid, _) = snapshot
+            if max_rowid <= watermark[0]:
+                ids.update(self.db.get_ids_since(max_rowid))
+                if len(ids) == watermark[1]:
+                    return ids
+        return IdSet(self.db.get_ids_since(0))
+
+    def save_visited(self):
+        """Snapshot the visited IDs so the next start does not rescan the database."""
+        path = self._snapshot_path()
+        if path:
+            # The watermark must cover every person the snapshot holds
+            self.writer.flush()
+            with self.lock:
+                self.visited_ids.save(path, self.db.get_ids_watermark())
+
+    def set_time_budget(self, seconds):
+        """Stop taking new work early enough to finish within ``seconds``."""
+        self.budget = TimeBudget(seconds)
+
+    def request_stop(self):
+        """Finish the pages in flight, keep the rest queued and return."""
+        self.budget.request_stop()
+
+    def resume(self):
+        """Take new work again after ``request_stop``; a time budget keeps its deadline."""
+        self.budget.clear_stop()
+
+    def close(self):
+        """Write what is still queued, give back unfinished leases and snapshot the visited IDs."""
+        self.writer.close()
+        # Retries parked when a run hit its limit stay leased until now
+        self.retries.drain()
+        self.frontier.release()
+        self.save_visited()
+
     def scrape_person(self, url, force=False):
         result = self._scrape_one(url, force=force)
         return result[0] if result else None
 
-    def _request_with_retry(self, url, max_retries=3, backoff_factor=5):
-        for attempt in range(max_retries + 1):
-            try:
-                if self.delay > 0:
-                    time.sleep(self.delay)
+    def scrape_many(self, seeds, force=False):
+        """Scrape a list of ``(person_id, url)`` seeds through the concurrent pipeline.
 
-                response = self.session.get(url, timeout=30)
+        Seeds are checked against the database in one query. Stored people
+        are skipped unless ``force`` is set, in which case they are
+        revalidated like a refresh. Relatives are recorded on the durable
+        frontier but not crawled.
+        """
+        existing = self.db.get_existing_ids([person_id for person_id, _ in seeds])
+        queued = 0
+        for person_id, url in seeds:
+            if person_id in existing:
+                if not force:
+                    continue
+                with self.lock:
+                    self.refreshing.add(person_id)
+            elif not force and self.negative_cache.skip(person_id):
+                continue
+            if self.frontier.put_transient(person_id, url):
+                queued += 1
+        print(f"Scraping {queued} of {len(seeds)} people ({len(seeds) - queued} already stored or known missing)...")
+        if not queued:
+            return 0
+        return self._process_queue(limit=queued, follow_links=False)
 
-                if response.status_code == 429:
-                    reason = "Rate limited (429)"
-                elif response.status_code in [500, 502, 503, 504]:
-                    reason = f"Server error ({response.status_code})"
-                else:
-                    response.raise_for_status()
-                    return response
+    def _throttle(self):
+        """Block until the circuit breaker is closed and a rate token is free."""
+        self.breaker.wait()
+        self.rate_limiter.acquire()
 
-                if attempt < max_retries:
-                    sleep_time = backoff_factor * (2 ** attempt) + random.uniform(0, 1)
-                    print(f"{reason} for {url} (Attempt {attempt+1}/{max_retries+1}). Retrying in {sleep_time:.2f}s...")
-                    time.sleep(sleep_time)
-                    continue
-                else:
-                    print(f"{reason} for {url}. Max retries reached.")
-                    return None
+    def _trip_breaker(self, response, sleep_time):
+        """Pause every worker for the backoff or the server's Retry-After hint."""
+        retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+        pause = max(sleep_time, retry_after or 0)
+        self.breaker.trip(pause)
+        return pause
 
-            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
-                if attempt < max_retries:
-                    sleep_time = backoff_factor * (2 ** attempt) + random.uniform(0, 1)
-                    print(f"Connection error/Timeout ({type(e).__name__}) for {url} (Attempt {attempt+1}/{max_retries+1}). Retrying in {sleep_time:.2f}s...")
-                    time.sleep(sleep_time)
-                    continue
+    def _remember_validators(self, url, headers):
+        """Hold a response's ETag/Last-Modified until its page is persisted."""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        etag = etag if isinstance(etag, str) else None
+        last_modified = last_modified if isinstance(last_modified, str) else None
+        person_id = self._person_id_from_url(url)
+        if person_id and (etag or last_modified):
+            with self.lock:
+                self._validators[person_id] = (etag, last_modified)
+
+    def _conditional_headers(self, person_id):
+        """If-None-Match/If-Modified-Since for a stored page, or None."""
+        validators = self.db.get_validators(person_id) if person_id else None
+        if not validators:
+            return None
+        headers = {}
+        if validators["etag"]:
+            headers['If-None-Match'] = validators["etag"]
+        if validators["last_modified"]:
+            headers['If-Modified-Since'] = validators["last_modified"]
+        return headers or None
+
+    def _request_once(self, url, attempt=0, backoff_factor=5, headers=None, stream=None):
+        """Issue a single throttled GET request.
+
+        Returns ``(response, reason, backoff, shared)``. On success ``reason``
+        is None and the response may be a 304 when ``headers`` carried
+        validators. A transient failure (429, 5xx, connection error or timeout)
+        carries a ``reason`` and the ``backoff`` in seconds before the next
+        attempt; ``shared`` is True when the circuit breaker already pauses
+        every worker for that long. Permanent failures return no reason.
+        """
+        started = time.monotonic()
+        kwargs = {'timeout': 30}
+        if self.stream if stream is None else stream:
+            kwargs['stream'] = True
+        if headers:
+            kwargs['headers'] = headers
+        response = None
+        try:
+            self._throttle()
+
+            started = time.monotonic()
+            response = self.session.get(url, **kwargs)
+            latency = time.monotonic() - started
+
+            if response.status_code == 429:
+                reason = "Rate limited (429)"
+                self.concurrency.record(latency, "throttled")
+            elif response.status_code in [500, 502, 503, 504]:
+                reason = f"Server error ({response.status_code})"
+                self.concurrency.record(latency, "error")
+            else:
+                self.concurrency.record(latency)
+                if response.status_code in (404, 410):
+                    self._note_failure(url, "not_found")
+                response.raise_for_status()
+                if response.status_code != 304:
+                    self._remember_validators(url, response.headers)
+                return response, None, 0, False
+
+            sleep_time = backoff_factor * (2 ** attempt) + random.uniform(0, 1)
+            backoff = self._trip_breaker(response, sleep_time)
+            # A streamed body holds its connection until it is closed
+            response.close()
+            return None, reason, backoff, True
+
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            self.concurrency.record(time.monotonic() - started, "error")
+            sleep_time = backoff_factor * (2 ** attempt) + random.uniform(0, 1)
+            return None, f"Connection error/Timeout ({type(e).__name__})", sleep_time, False
+        except requests.exceptions.RequestException as e:
+            print(f"HTTP error for {url}: {e}")
+            if response is not None:
+                response.close()
+            return None, None, 0, False
+        except Exception as e:
+            print(f"Unexpected error requesting {url}: {e}")
+            if response is not None:
+                response.close()
+            return None, None, 0, False
+
+    def _request_with_retry(self, url, max_retries=3, backoff_factor=5, headers=None, stream=None):
+        for attempt in range(max_retries + 1):
+            response, reason, backoff, shared = self._request_once(url, attempt, backoff_factor, headers=headers,
+                                                                   stream=stream)
+            if reason is None:
+                return response
+
+            if attempt < max_retries:
+                if shared:
+                    print(f"{reason} for {url} (Attempt {attempt+1}/{max_retries+1}). Pausing all workers for {backoff:.2f}s...")
                 else:
-                    print(f"Failed to connect to {url} after {max_retries+1} attempts: {type(e).__name__}")
-                    return None
-            except requests.exceptions.RequestException as e:
-                print(f"HTTP error for {url}: {e}")
-                return None
-            except Exception as e:
-                print(f"Unexpected error requesting {url}: {e}")
+                    print(f"{reason} for {url} (Attempt {attempt+1}/{max_retries+1}). Retrying in {backoff:.2f}s...")
+                    time.sleep(backoff)
+                continue
+            else:
+                print(f"{reason} for {url}. Max retries reached after {max_retries+1} attempts.")
+                if reason.startswith("Server error"):
+                    self._note_failure(url, "server_error")
                 return None
         return None
 
     def retry_failed(self, limit=100):
-        pending = self.db.get_pending_urls()
+        self.frontier.requeue_failed()
+        pending = self.frontier.qsize()
         if not pending:
             print("No pending/failed URLs to retry.")
             return
             
-        print(f"Retrying {len(pending)} pending/failed URLs...")
-        for item in pending:
-            with self.lock:
-                if item["id"] not in self.visited_ids and item["id"] not in self.pending_ids:
-                    self.pending_ids.add(item["id"])
-                    self.queue.put((item["id"], item["url"]))
-        
+        print(f"Retrying {pending} pending/failed URLs...")
         self._process_queue(limit=limit)
 
-    def _process_queue(self, limit=100):
+    def refresh(self, budget=100):
+        """Re-fetch the ``budget`` stored people most likely to have changed.
+
+        Pages are revalidated with conditional requests, so unchanged ones
+        cost a 304 and no writes. Newly linked people are recorded as
+        pending but not crawled.
+        """
+        stale = self.db.get_stale_individuals(budget)
+        if not stale:
+            print("Nothing to refresh.")
+            return 0
+
+        print(f"Refreshing {len(stale)} people most likely to be stale...")
+        for item in stale:
+            with self.lock:
+                self.refreshing.add(item["id"])
+            self.frontier.put_transient(item["id"], item["url"])
+
+        count = self._process_queue(limit=len(stale), follow_links=False)
+        print(f"Refresh finished: {count} re-scraped ({self.changed_count} changed, "
+              f"{self.skipped_writes} without writes), {self.unchanged_count} unchanged (304).")
+        return count
+
+    def _process_queue(self, limit=100, follow_links=True):
+        """Run the frontier through the fetch -> parse -> persist pipeline.
+
+        Fetching happens on a thread pool, parsing on a process pool when
+        ``parse_workers`` is set (otherwise on the fetch threads), and every
+        database write on this coordinating thread. Fetching pauses while
+        fetched pages wait for a parser, and the loop blocks on the next
+        completion or retry due time instead of polling. With
+        ``follow_links`` False only URLs queued for this run (refreshes) are
+        fetched; relatives of crawled pages are still recorded on the
+        durable frontier for a later crawl.
+        """
         count = 0
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = {}
-            
-            while (self.queue.qsize() > 0 or futures) and count < limit:
-                # Fill up the futures
-                while len(futures) < self.max_workers and count + len(futures) < limit:
-                    try:
-                        person_id, url = self.queue.get_nowait()
-                        # Double check visited_ids in case it was finished by another thread
-                        with self.lock:
-                            if person_id in self.visited_ids:
-                                continue
-                        
-                        future = executor.submit(self._scrape_one, url)
-                        futures[future] = url
-                    except Empty:
+        fetching = {}  # future -> (person_id, url, attempt)
+        parsing = {}  # future -> (person_id, url)
+        backlog = deque()  # (person_id, url, html) waiting for a parser
+        out_of_time = False
+        self._stage_futures = (fetching, backlog, parsing)
+        with ExitStack() as stack:
+            fetch_executor = stack.enter_context(ThreadPoolExecutor(max_workers=self.max_workers))
+            if self.parse_workers > 0:
+                parse_executor = stack.enter_context(ProcessPoolExecutor(max_workers=self.parse_workers))
+                parse_capacity = 2 * self.parse_workers
+            else:
+                parse_executor = fetch_executor
+                parse_capacity = self.max_workers
+
+            while count < limit:
+                # Parse stage: hand waiting pages to free parser slots
+                while backlog and len(parsing) < parse_capacity:
+                    person_id, url, html_content = backlog.popleft()
+                    parsing[parse_executor.submit(parse_page, html_content, url)] = (person_id, url)
+
+                # Fetch stage: due retries first, then the frontier. Nothing
+                # new is fetched while parsed pages are piling up.
+                in_progress = len(fetching) + len(backlog) + len(parsing)
+                free = min(self.concurrency.limit - len(fetching), limit - count - in_progress)
+                # Nothing new starts once it could not finish within the time budget
+                accepting = self.budget.can_start(in_progress)
+                if free > 0 and len(backlog) < parse_capacity and accepting:
+                    for person_id, url, attempt in self.retries.pop_due(limit=free):
+                        self._submit_fetch(fetch_executor, fetching, person_id, url, attempt)
+                    while len(fetching) < self.concurrency.limit and count + len(fetching) + len(backlog) + len(parsing) < limit:
+                        if not self.budget.can_start(len(fetching) + len(backlog) + len(parsing)):
+                            break
+                        try:
+                            person_id, url = self._next_url(durable=follow_links)
+                        except Empty:
+                            break
+                        self._submit_fetch(fetch_executor, fetching, person_id, url, 0)
+
+                if not (fetching or parsing):
+                    if not backlog and not self.budget.can_start():
+                        out_of_time = True
                         break
-                
-                if not futures:
-                    if self.queue.qsize() == 0:
+                    next_due = self.retries.next_due_in()
+                    if next_due is None:
+                        # Relatives of the last pages may still be on their way to the frontier
+                        self.writer.flush()
+                        if self.frontier.qsize(durable=follow_links) == 0:
+                            break
+                        continue
+                    if not self.budget.can_start(delay=next_due):
+                        out_of_time = True
                         break
-                    time.sleep(0.1)
+                    # Only delayed retries are left; sleep until the first is due
+                    time.sleep(next_due)
+                    person_id, url, attempt = self.retries.pop_next()
+                    self._submit_fetch(fetch_executor, fetching, person_id, url, attempt)
                     continue
-                    
-                # Wait for at least one future to complete
-                done, not_done = wait(futures.keys(), return_when=FIRST_COMPLETED)
-                
+
+                # Wait for any stage to complete, or for a retry to fall due
+                timeout = self.retries.next_due_in() if accepting else None
+                done, _ = wait(list(fetching) + list(parsing), timeout=timeout, return_when=FIRST_COMPLETED)
+
                 for future in done:
-                    url = futures.pop(future)
-                    try:
-                        result = future.result()
-                        if result:
-                            count += 1
-                            data, rels = result
-                            print(f"Crawled {data['id']}: {url} ({count}/{limit if limit < 1000000 else 'all'})")
-                            for rel in rels:
-                                # Save discovered URL to DB
-                                self.db.add_discovered_url(rel["related_id"], rel["url"])
-                                with self.lock:
-                                    if rel["related_id"] not in self.visited_ids and rel["related_id"] not in self.pending_ids:
-                                        self.pending_ids.add(rel["related_id"])
-                                        self.queue.put((rel["related_id"], rel["url"]))
-                    except Exception as e:
-                        print(f"Future for {url} raised exception: {e}")
-                
-                # Be a bit nice
-                time.sleep(0.05)
+                    if future in fetching:
+                        person_id, url, attempt = fetching.pop(future)
+                        # Streamed pages come back already parsed
+                        parsed = self._on_fetched(future, person_id, url, attempt, backlog)
+                        if parsed is None:
+                            continue
+                    else:
+                        person_id, url = parsing.pop(future)
+                        try:
+                            parsed = future.result()
+                        except Exception as e:
+                            print(f"Unexpected error scraping {url}: {type(e).__name__}: {e}")
+                            parsed = None
+
+                    # Persist stage: the only place queue results touch the DB
+                    result = self._persist_page(url, person_id, parsed)
+                    if result:
+                        count += 1
+                        self.budget.record_page()
+                        data, rels = result
+                        print(f"Crawled {data['id']}: {url} ({count}/{limit if limit < 1000000 else 'all'})")
+                        if count % 25 == 0:
+                            self._print_stage_depths()
+                            if self.budget.deadline is not None:
+                                print(self.budget.summary())
+        if out_of_time:
+            # Pending retries wait for the next run too
+            self.retries.drain()
+        # Everything this run did is on disk before the leases are given back
+        self.writer.flush()
+        # Unstarted URLs go back to the durable frontier for the next run
+        self.frontier.release(keep=self.retries.person_ids())
+        if out_of_time:
+            print(f"{self.budget.summary()}; {self.frontier.qsize()} URLs stay queued for the next run.")
+        self._print_stage_depths()
+        self._stage_futures = None
+        if self.concurrency.adaptive:
+            print(f"Adaptive concurrency settled at {self.concurrency.limit} workers "
+                  f"(bounds {self.concurrency.min_limit}-{self.concurrency.max_limit}, "
+                  f"{len(self.concurrency.decisions)} adjustments).")
         return count
 
+    def stage_depths(self):
+        """Current number of items waiting in or passing through each stage."""
+        fetching, backlog, parsing = self._stage_futures or ((), (), ())
+        return {
+            "frontier": self.frontier.qsize(),
+            "retrying": len(self.retries),
+            "fetching": len(fetching),
+            "parse_backlog": len(backlog),
+            "parsing": len(parsing),
+            "writing": self.writer.pending(),
+        }
+
+    def _next_url(self, durable=True):
+        """Next URL from the frontier, writing pending results first if it looks empty."""
+        try:
+            return self.frontier.get_nowait(durable=durable)
+        except Empty:
+            if not durable or not self.writer.pending():
+                raise
+        self.writer.flush()
+        return self.frontier.get_nowait(durable=durable)
+
+    def _on_written(self, changed, written):
+        with self.lock:
+            self.changed_count += int(changed)
+            # An unchanged page costs no writes beyond its freshness check
+            self.skipped_writes += int(not written)
+
+    def _print_stage_depths(self):
+        depths = self.stage_depths()
+        print("Pipeline: " + ", ".join(f"{name}={depth}" for name, depth in depths.items()))
+
+    def _submit_fetch(self, executor, fetching, person_id, url, attempt):
+        # Double check visited_ids in case it was finished by another thread
+        with self.lock:
+            refreshing = person_id in self.refreshing
+            if person_id in self.visited_ids and not refreshing:
+                return
+        headers = self._conditional_headers(person_id) if refreshing else None
+        future = executor.submit(self._timed_fetch, url, attempt, headers)
+        fetching[future] = (person_id, url, attempt)
+
+    def _timed_fetch(self, url, attempt, headers):
+        started = time.monotonic()
+        try:
+            return self._fetch_page(url, attempt, headers)
+        finally:
+            self.budget.record_fetch(time.monotonic() - started)
+
+    def _on_fetched(self, future, person_id, url, attempt, backlog):
+        """Route a fetch result; returns a streamed ``(data, rels)`` to persist."""
+        try:
+            outcome = future.result()
+        except Exception as e:
+            print(f"Future for {url} raised exception: {e}")
+            outcome = None
+        if isinstance(outcome, RetryLater):
+            if person_id:
+                self.writer.submit(PageFailure(person_id, final=False))
+            self.retries.schedule(person_id, url, attempt + 1, outcome.delay)
+            print(f"{outcome.reason} for {url} (Attempt {attempt+1}/{self.max_retries+1}). Rescheduled in {outcome.delay:.2f}s.")
+        elif outcome is NOT_MODIFIED:
+            self._record_unchanged(person_id, url)
+        elif isinstance(outcome, tuple):
+            return outcome
+        elif outcome:
+            backlog.append((person_id, url, outcome))
+        elif person_id:
+            with self.lock:
+                self.refreshing.discard(person_id)
+            self._record_failure(person_id, url)
+        return None
+
+    def _fetch_page(self, url, attempt=0, headers=None):
+        """Fetch stage: make one attempt at downloading ``url``.
+
+        Returns the page HTML (or, in streaming mode, the parsed
+        ``(data, rels)``), ``NOT_MODIFIED`` when a conditional request got a
+        304, ``RetryLater`` for a transient failure that still has attempts
+        left, or None. Nothing is written to the database here; the
+        coordinator records the outcome.
+        """
+        url = url.replace('//?', '/?')
+        response, reason, backoff, shared = self._request_once(url, attempt, headers=headers)
+        if reason is not None:
+            if attempt < self.max_retries:
+                return RetryLater(backoff, reason)
+            print(f"{reason} for {url}. Max retries reached after {attempt+1} attempts.")
+            if reason.startswith("Server error"):
+                self._note_failure(url, "server_error")
+            return None
+        if not response:
+            return None
+        if response.status_code == 304:
+            response.close()
+            return NOT_MODIFIED
+        if self.stream:
+            return self._stream_page(response, url)
+        try:
+            html_content = response.text
+        except Exception as e:
+            print(f"Unexpected error scraping {url}: {type(e).__name__}: {e}")
+            return None
+        if not html_content:
+            print(f"Received empty response from {url}")
+            self._note_failure(url, "empty")
+            return None
+        self._archive_page(url, html_content)
+        return html_content
+
+    def _archive_page(self, url, body):
+        if self.archive is not None:
+            self.archive.store(self._person_id_from_url(url), url, body)
+
+    def _read_chunks(self, chunks, body):
+        """Yield ``chunks`` while keeping a copy of them in ``body``."""
+        received = 0
+        for chunk in chunks:
+            received += len(chunk)
+            if received > self.max_body_bytes:
+                raise PageTooLarge(f"Body is larger than {self.max_body_bytes} bytes")
+            body.append(chunk)
+            yield chunk
+
+    def _stream_page(self, response, url):
+        """Parse a streamed response while it downloads; (data, rels) or None."""
+        match = CHARSET_RE.search(response.headers.get('Content-Type') or '')
+        chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+        body = [] if self.archive is not None else None
+        if body is not None:
+            chunks = self._read_chunks(chunks, body)
+        try:
+            data, rels = self.scraper.extract_page_stream(
+                chunks, url,
+                encoding=match.group(1) if match else None,
+                max_bytes=self.max_body_bytes,
+            )
+            if body is not None:
+                # The archive keeps the whole page, not just the part parsed
+                for _ in chunks:
+                    pass
+        except Exception as e:
+            print(f"Unexpected error scraping {url}: {type(e).__name__}: {e}")
+            return None
+        finally:
+            # Stop the transfer if parsing finished before the body did
+            response.close()
+        if not data or not data.get("id"):
+            return None
+        if body is not None:
+            self._archive_page(url, b"".join(body))
+        return data, rels
+
     def _scrape_one(self, url, force=False):
+        try:
+            return self._scrape_single(url, force=force)
+        finally:
+            # Callers read a single page back from the database right away
+            self.writer.flush()
+
+    def _scrape_single(self, url, force=False):
         url = url.replace('//?', '/?')
-        parsed_url = urlparse(url)
-        person_id = parse_qs(parsed_url.query).get('i', [None])[0]
+        person_id = self._person_id_from_url(url)
 
         if person_id and not force:
             with self.lock:
                 if person_id in self.visited_ids:
                     return None
+            if self.negative_cache.skip(person_id):
+                print(f"Skipping {person_id}: known missing or dead")
+                return None
 
-        response = self._request_with_retry(url)
+        # A forced refresh of a stored page only downloads it if it changed
+        headers = self._conditional_headers(person_id) if force else None
+        response = self._request_with_retry(url, max_retries=self.max_retries, headers=headers)
         if not response:
             if person_id:
-                self.db.increment_failure_count(person_id)
+                self._record_failure(person_id, url)
+            return None
+        if response.status_code == 304:
+            self._record_unchanged(person_id, url)
             return None
 
+        if self.stream:
+            return self._persist_page(url, person_id, self._stream_page(response, url), force=force)
+
         try:
             html_content = response.text
-            if not html_content:
-                print(f"Received empty response from {url}")
-                if person_id:
-                    self.db.increment_failure_count(person_id)
-                return None
+        except Exception as e:
+            print(f"Unexpected error scraping {url}: {type(e).__name__}: {e}")
+            if person_id:
+                self._record_failure(person_id)
+            return None
+        if html_content:
+            self._archive_page(url, html_content)
+        return self._handle_page(url, person_id, html_content, force=force)
+
+    def _record_unchanged(self, person_id, url):
+        # Nothing to parse or store for a page the server says is unchanged;
+        # only the time of the check is recorded for the freshness estimate.
+        with self.lock:
+            self.refreshing.discard(person_id)
+        self.unchanged_count += 1
+        if person_id:
+            self.writer.submit(PageCheck(person_id, time.time()))
+        print(f"Unchanged {person_id}: {url} (304 Not Modified)")
+
+    def _handle_page(self, url, person_id, html_content, force=False):
+        """Parse a fetched page and persist the person and relationships.
+
+        Shared by every engine flavour so that persistence and visited
+        bookkeeping stay identical no matter how the page was fetched.
+        """
+        if not html_content:
+            print(f"Received empty response from {url}")
+            if person_id:
+                self._record_failure(person_id, url, "empty")
+            return None
+        try:
+            parsed = parse_page(html_content, url)
+        except Exception as e:
+            print(f"Unexpected error scraping {url}: {type(e).__name__}: {e}")
+            parsed = None
+        return self._persist_page(url, person_id, parsed, force=force)
 
-            # Extract biographical data
-            data = self.scraper.extract_biographical_data(html_content, url)
-            if data and data.get("id"):
+    def _persist_page(self, url, person_id, parsed, force=False):
+        """Store a parsed ``(data, relationships)`` pair, or record a failure."""
+        try:
+            if parsed:
+                data, rels = parsed
                 person_id = data["id"]
                 
                 with self.lock:
+                    if person_id in self.refreshing:
+                        self.refreshing.discard(person_id)
+                        force = True
                     if not force and person_id in self.visited_ids:
                         return None
                     self.visited_ids.add(person_id)
 
-                self.db.add_individual(data)
-                self.db.reset_failure_count(person_id)
-                
-                # Extract relationships
-                rels = self.scraper.extract_relationships(html_content, person_id, base_url=url)
-                for rel in rels:
-                    self.db.add_relationship(rel["person_id"], rel["related_id"], rel["type"])
-                    # Always save discovered URL to DB for future crawling/retries
-                    self.db.add_discovered_url(rel["related_id"], rel["url"])
+                with self.lock:
+                    validators = self._validators.pop(person_id, None)
+                # The writer stores the person, puts changed relatives on the
+                # durable frontier and marks the URL done
+                self.writer.submit(PageResult(
+                    data, rels, content_hash(data, rels), record_hash(data), relationships_hash(rels),
+                    validators, time.time(),
+                ))
+                self.frontier.unclaim(person_id)
+                self.negative_cache.discard(person_id)
                     
                 return data, rels
             else:
                 if person_id:
-                    self.db.increment_failure_count(person_id)
+                    with self.lock:
+                        self._validators.pop(person_id, None)
+                        self.refreshing.discard(person_id)
+                    # A page without a person block, unless the fetch noted why
+                    self._record_failure(person_id, url, "unparsable")
                 return None
         except Exception as e:
             print(f"Unexpected error scraping {url}: {type(e).__name__}: {e}")
             if person_id:
-                self.db.increment_failure_count(person_id)
+                self._record_failure(person_id)
             return None
 
+    @staticmethod
+    def _person_id_from_url(url):
+        return person_id_from_url(url)
+
+    def _note_failure(self, url, failure_class):
+        """Remember why a fetch failed until the coordinator records it."""
+        person_id = self._person_id_from_url(url)
+        if person_id:
+            with self.lock:
+                self._failure_classes[person_id] = failure_class
+
+    def _record_failure(self, person_id, url=None, failure_class=None):
+        """Count a failed scrape and park the URL until the next retry run.
+
+        Failures with a known class (noted during the fetch, or passed in)
+        also go to the negative cache so later runs skip the ID.
+        """
+        self.writer.submit(PageFailure(person_id, final=True))
+        self.frontier.unclaim(person_id)
+        with self.lock:
+            failure_class = self._failure_classes.pop(person_id, failure_class)
+        if failure_class:
+            self.negative_cache.record(person_id, url, failure_class)
+
+    def _enqueue(self, person_id, url):
+        """Queue a person unless it is already visited or pending."""
+        with self.lock:
+            if person_id in self.visited_ids:
+                return False
+        return self.frontier.put(person_id, url)
+
     def _discover_from_db(self, limit=1000):
         """Try to find missing URLs by looking at relationships of already visited people."""
         # Find people in 'individuals' who have relationships with people NOT in 'individuals'
         # and we don't have a URL for those related people in 'discovered_urls'.
-        with self.lock:
-            cursor = self.db.conn.cursor()
-            # This is a bit complex, let's find IDs first
-            cursor.execute("""
-                SELECT DISTINCT r.related_id, i.url
-                FROM relationships r
-                JOIN individuals i ON r.person_id = i.id
-                LEFT JOIN individuals i2 ON r.related_id = i2.id
-                LEFT JOIN discovered_urls d ON r.related_id = d.id
-                WHERE i2.id IS NULL AND d.id IS NULL
-                LIMIT ?
-            """, (limit,))
-            rows = cursor.fetchall()
-            
+        rows = self.db.get_undiscovered_relatives(limit)
+
         added = 0
         
         for related_id, parent_url in rows:
@@ -231,38 +762,43 @@ class ScraperEngine:
             max_id_int = 0
 
         added = 0
-        parsed = urlparse(base_url)
 
         # We'll probe IDs from max_id_int + 1 up to max_id_int + lookahead
-        # But we only add those that are not in visited_ids and not in pending_ids
+        # But we only add those that are not in visited_ids
         for i in range(1, lookahead + 1):
             if added >= limit:
                 break
 
             probe_id = str(max_id_int + i)
             with self.lock:
-                if probe_id in self.visited_ids or probe_id in self.pending_ids:
+                if probe_id in self.visited_ids:
                     continue
-
-            query = parse_qs(parsed.query)
-            query['i'] = [probe_id]
-            new_query = urlencode(query, doseq=True)
-            new_url = urlunparse((parsed.scheme, parsed.netloc, parsed.path, parsed.params, new_query, parsed.fragment))
+            if self.negative_cache.skip(probe_id):
+                continue
 
             # We don't add to DB yet, just to the queue for checking
-            with self.lock:
-                if probe_id not in self.pending_ids:
-                    self.pending_ids.add(probe_id)
-                    self.queue.put((probe_id, new_url))
-                    added += 1
+            if self.frontier.put_transient(probe_id, person_url(base_url, probe_id)):
+                added += 1
 
         if added > 0:
             print(f"Probing {added} new IDs starting from {max_id_int + 1}...")
         return added
 
-    def crawl(self, start_url, limit=100):
-        parsed_url = urlparse(start_url)
-        start_id = parse_qs(parsed_url.query).get('i', [None])[0]
+    def _probe_gallop(self, base_url, limit=100, lookahead=500):
+        """Queue new IDs found by cheap checks guided by the known ID space."""
+        prober = IdProber(self, base_url)
+        added = 0
+        for probe_id in prober.probe(limit=limit, lookahead=lookahead):
+            with self.lock:
+                if probe_id in self.visited_ids:
+                    continue
+            if self.frontier.put_transient(probe_id, person_url(base_url, probe_id)):
+                added += 1
+        print(f"Probing found {added} candidate IDs with {prober.requests} checks.")
+        return added
+
+    def crawl(self, start_url, limit=100, probe='sequential'):
+        start_id = self._person_id_from_url(start_url)
 
         # Initial scrape to start the process
         first_res = None
@@ -273,71 +809,53 @@ class ScraperEngine:
         if first_res:
             data, rels = first_res
             count = 1
+            # Its relatives are already on the frontier
             print(f"Crawled {data['id']}: {start_url} ({count}/{limit})")
-            
-            # Add discovered URLs to queue and DB
-            for rel in rels:
-                self.db.add_discovered_url(rel["related_id"], rel["url"])
-                with self.lock:
-                    if rel["related_id"] not in self.visited_ids and rel["related_id"] not in self.pending_ids:
-                        self.pending_ids.add(rel["related_id"])
-                        self.queue.put((rel["related_id"], rel["url"]))
+        elif start_id in self.visited_ids:
+            # The frontier is stored in the database, so resuming needs no
+            # request for the start page.
+            queued = self.frontier.qsize()
+            print(f"Start node {start_id} already visited. Resuming from the saved frontier ({queued} queued)...")
+
+            # If we still don't have enough work, try to discover URLs from DB
+            if queued < limit:
+                self._discover_from_db(limit=limit)
+
+            # Give URLs that failed in earlier runs another chance
+            if self.frontier.qsize() < limit:
+                requeued = self.frontier.requeue_failed()
+                if requeued > 0:
+                    print(f"Re-queued {requeued} previously failed URLs to resume crawl.")
         else:
-            # If already visited, we might still want to start crawling from its relationships
-            # to continue where we left off.
-            parsed_url = urlparse(start_url)
-            start_id = parse_qs(parsed_url.query).get('i', [None])[0]
-            
-            if start_id in self.visited_ids:
-                print(f"Start node {start_id} already visited. Exploring its relationships to resume crawl...")
-                # Re-scrape just to get fresh relationships and URLs
-                try:
-                    response = self.session.get(start_url, timeout=30)
-                    response.raise_for_status()
-                    html_content = response.text
-                    rels = self.scraper.extract_relationships(html_content, start_id, base_url=start_url)
-                    for rel in rels:
-                        self.db.add_discovered_url(rel["related_id"], rel["url"])
-                        with self.lock:
-                            if rel["related_id"] not in self.visited_ids and rel["related_id"] not in self.pending_ids:
-                                self.pending_ids.add(rel["related_id"])
-                                self.queue.put((rel["related_id"], rel["url"]))
-                    print(f"Added {len(rels)} neighbors of {start_id} to queue.")
-                    
-                    # If we still don't have enough work, try to discover URLs from DB
-                    if self.queue.qsize() < limit:
-                         self._discover_from_db(limit=limit)
-                    
-                    # If we don't have enough pending work in the queue to reach the limit,
-                    # pull pending URLs from the DB.
-                    if self.queue.qsize() < limit:
-                        pending = self.db.get_pending_urls()
-                        if pending:
-                            added_count = 0
-                            for item in pending:
-                                with self.lock:
-                                    if item["id"] not in self.visited_ids and item["id"] not in self.pending_ids:
-                                        self.pending_ids.add(item["id"])
-                                        self.queue.put((item["id"], item["url"]))
-                                        added_count += 1
-                                if added_count + self.queue.qsize() >= limit:
-                                    break
-                            if added_count > 0:
-                                print(f"Added {added_count} pending URLs from database to resume crawl.")
-                except Exception as e:
-                    print(f"Error re-scraping {start_url} to resume: {e}")
-            else:
-                print(f"Failed to scrape start URL: {start_url}")
-                return
+            print(f"Failed to scrape start URL: {start_url}")
+            return
 
+        self._crawl_frontier(start_url, limit, count, probe)
+
+    def crawl_seeds(self, seeds, limit=100, probe='sequential'):
+        """Crawl outward from many ``(person_id, url)`` seeds at once.
+
+        Seeds are checked against the database in one query and the new
+        ones queued in one transaction; the crawl then proceeds as usual.
+        """
+        existing = self.db.get_existing_ids([person_id for person_id, _ in seeds])
+        added = self.frontier.put_many([seed for seed in seeds if seed[0] not in existing])
+        print(f"Queued {len(added)} of {len(seeds)} seeds ({len(existing)} already stored).")
+        if seeds:
+            self._crawl_frontier(seeds[0][1], limit, 0, probe)
+
+    def _crawl_frontier(self, base_url, limit, count, probe):
         if count < limit:
             # First pass with existing queue
             count += self._process_queue(limit=limit - count)
             
             # If still below limit, try probing for new IDs
-            if count < limit:
-                self._probe_new_ids(start_url, limit=limit - count)
-                if self.queue.qsize() > 0:
+            if count < limit and self.budget.can_start():
+                if probe == 'gallop':
+                    self._probe_gallop(base_url, limit=limit - count)
+                else:
+                    self._probe_new_ids(base_url, limit=limit - count)
+                if self.frontier.qsize() > 0:
                     count += self._process_queue(limit=limit - count)
 
         print(f"Crawl finished. Total individuals scraped in this session: {count}")
@@ -0,0 +1,55 @@
+import hashlib
+import json
+import math
+
+SECONDS_PER_DAY = 86400.0
+# Gamma prior on a page's change rate: one change per year until the page
+# has been checked often enough to say otherwise.
+PRIOR_CHANGES = 1.0
+PRIOR_DAYS = 365.0
+
+
+def _digest(value):
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _record(data):
+    return {key: value for key, value in data.items() if value not in (None, "")}
+
+
+def _links(rels):
+    return sorted({(rel["related_id"], rel["type"]) for rel in rels})
+
+
+def record_hash(data):
+    """Hash of an extracted person record, ignoring empty fields."""
+    return _digest(_record(data))
+
+
+def relationships_hash(rels):
+    """Hash of a page's relationship set, ignoring order and duplicates."""
+    return _digest(_links(rels))
+
+
+def content_hash(data, rels):
+    """Hash of what a page contributes to the database.
+
+    Only the extracted record and relationships are hashed, so markup
+    changes that do not affect the data do not count as changes.
+    """
+    return _digest([_record(data), sorted((rel["related_id"], rel["type"]) for rel in rels)])
+
+
+def change_rate(changes, observed_seconds):
+    """Estimated changes per day of a page modelled as a Poisson process.
+
+    ``changes`` is the number of re-checks that found different content and
+    ``observed_seconds`` the total time covered by those re-checks.
+    """
+    return (changes + PRIOR_CHANGES) / (observed_seconds / SECONDS_PER_DAY + PRIOR_DAYS)
+
+
+def staleness(rate, age_seconds):
+    """Probability that a page has changed ``age_seconds`` after its last check."""
+    return 1.0 - math.exp(-rate * age_seconds / SECONDS_PER_DAY)
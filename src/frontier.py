@@ -0,0 +1,135 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from queue import Empty
+
+DEFAULT_BUFFER_SIZE = 256
+DEFAULT_LEASE_SECONDS = 600.0
+
+
+class Frontier:
+    """Crawl frontier backed by the ``discovered_urls`` table.
+
+    Every discovered URL is stored with a state (queued, in_flight, done or
+    failed), its distance from the seed and a priority, so the frontier
+    survives restarts. Only a bounded buffer of claimed URLs is held in
+    memory; it is refilled from the database, most valuable URLs first,
+    whenever it runs dry.
+
+    Claimed URLs are leased to this frontier's ``owner`` for
+    ``lease_seconds`` and the lease is renewed while the run is alive, so
+    several processes, or hosts sharing the database file, can work on
+    one frontier without fetching the same page twice. When a worker dies
+    its leases expire and other workers claim the URLs again.
+
+    ``get_nowait``/``qsize`` mirror ``queue.Queue`` so the engines can
+    treat it as their work queue.
+    """
+
+    def __init__(self, db, max_failures, buffer_size=DEFAULT_BUFFER_SIZE, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.db = db
+        self.max_failures = max_failures
+        self.buffer_size = buffer_size
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._renewed_at = time.monotonic()
+        self._buffer = deque()
+        # Probes and refreshes are not part of the durable frontier
+        self._transient = deque()
+        self._transient_ids = set()
+        self._claimed = set()
+        self.lock = threading.Lock()
+
+    def put(self, person_id, url):
+        """Queue a URL durably; True unless it was already waiting."""
+        with self.lock:
+            if person_id in self._claimed or person_id in self._transient_ids:
+                return False
+        return self.db.queue_url(person_id, url, self.max_failures)
+
+    def put_many(self, seeds):
+        """Queue many ``(person_id, url)`` pairs durably; returns the IDs added."""
+        with self.lock:
+            seeds = [(person_id, url) for person_id, url in seeds
+                     if person_id not in self._claimed and person_id not in self._transient_ids]
+        return self.db.queue_urls(seeds, self.max_failures)
+
+    def put_relationships(self, rels):
+        return self.db.enqueue_relationships(rels)
+
+    def put_transient(self, person_id, url):
+        """Queue a URL for this run only, without recording it in the database."""
+        with self.lock:
+            if person_id in self._claimed or person_id in self._transient_ids:
+                return False
+            self._transient_ids.add(person_id)
+            self._transient.append((person_id, url))
+            return True
+
+    def get_nowait(self, durable=True):
+        """Next URL to fetch; with ``durable`` False only transient ones."""
+        with self.lock:
+            if self._transient:
+                person_id, url = self._transient.popleft()
+                self._transient_ids.discard(person_id)
+                self._claimed.add(person_id)
+                return person_id, url
+            if not durable:
+                raise Empty
+            self._renew_leases()
+            if not self._buffer:
+                claimed = self.db.claim_frontier(self.buffer_size, self.max_failures, self.owner, self.lease_seconds)
+                for person_id, url in claimed:
+                    self._claimed.add(person_id)
+                    self._buffer.append((person_id, url))
+            if self._buffer:
+                return self._buffer.popleft()
+        raise Empty
+
+    def _renew_leases(self):
+        # Renewing a third of the way into the lease keeps slow runs alive
+        now = time.monotonic()
+        if self._claimed and now - self._renewed_at > self.lease_seconds / 3:
+            self.db.renew_leases(self.owner, self.lease_seconds)
+            self._renewed_at = now
+
+    def qsize(self, durable=True):
+        with self.lock:
+            if not durable:
+                return len(self._transient)
+            buffered = len(self._buffer) + len(self._transient)
+        return buffered + self.db.count_queued(self.max_failures)
+
+    def mark_done(self, person_id):
+        self._finish(person_id, 'done')
+
+    def mark_failed(self, person_id):
+        self._finish(person_id, 'failed')
+
+    def _finish(self, person_id, state):
+        self.unclaim(person_id)
+        self.db.set_frontier_state([person_id], state)
+
+    def unclaim(self, person_id):
+        """Stop tracking a claimed URL whose final state is written elsewhere."""
+        with self.lock:
+            self._claimed.discard(person_id)
+
+    def release(self, keep=()):
+        """Return claimed URLs that were not finished to the queue.
+
+        ``keep`` names URLs that stay claimed, e.g. ones waiting for a retry.
+        """
+        with self.lock:
+            self._buffer.clear()
+            released = self._claimed - set(keep)
+            self._claimed -= released
+        # A URL whose lease expired may already belong to another worker
+        self.db.set_frontier_state(released, 'queued', owner=self.owner)
+
+    def requeue_failed(self):
+        """Give URLs that failed in earlier runs another chance."""
+        return self.db.requeue_frontier('failed', self.max_failures)
@@ -6,10 +6,10 @@ class GedcomExporter:
         self.db = db_helper
 
     def export(self, output_path):
-        # Fetch data
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT * FROM individuals")
-        individuals = cursor.fetchall()
+        # Fetch data from one snapshot, without waiting for a running crawl
+        with self.db.reader() as conn:
+            individuals = conn.execute("SELECT * FROM individual_records").fetchall()
+            rels = conn.execute("SELECT * FROM relationship_records").fetchall()
         
         id_map = {} # db_id -> gedcom_id
         for i, row in enumerate(individuals):
@@ -26,9 +26,6 @@ class GedcomExporter:
         person_famc = {} # child_id -> fam_id
         person_fams = {} # parent_id -> [fam_ids]
         
-        cursor.execute("SELECT * FROM relationships")
-        rels = cursor.fetchall()
-        
         # Temporary storage to build families
         child_parents = {} # child_id -> {'father': id, 'mother': id}
         
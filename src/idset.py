@@ -0,0 +1,115 @@
+import os
+import struct
+from collections.abc import MutableSet
+
+# IDs above this stay in the fallback set so a stray huge ID cannot blow up the bitmap
+MAX_BITMAP_ID = 1 << 26
+SNAPSHOT_MAGIC = b"TTIDSET1"
+_HEADER = struct.Struct("<8sqqq")  # magic, watermark rowid, watermark count, bitmap length
+
+
+def _bit_index(person_id):
+    """Bitmap position of a canonical decimal ID, or None for any other ID."""
+    if isinstance(person_id, int):
+        return person_id if 0 <= person_id < MAX_BITMAP_ID else None
+    if (not isinstance(person_id, str) or not person_id.isascii() or not person_id.isdigit()
+            or (person_id[0] == "0" and len(person_id) > 1)):
+        return None
+    value = int(person_id)
+    return value if value < MAX_BITMAP_ID else None
+
+
+class IdSet(MutableSet):
+    """Set of person IDs kept as a bitmap over the numeric ``i=`` values.
+
+    One bit per possible ID instead of one string object per member keeps
+    a few hundred thousand IDs in tens of kilobytes. IDs that are not plain
+    decimal numbers (or are implausibly large) live in an ordinary set.
+    Members are reported back as strings, like the database stores them.
+    """
+
+    def __init__(self, ids=()):
+        self._bits = bytearray()
+        self._count = 0
+        self._other = set()
+        for person_id in ids:
+            self.add(person_id)
+
+    def __contains__(self, person_id):
+        index = _bit_index(person_id)
+        if index is None:
+            return person_id in self._other
+        byte = index >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (index & 7)))
+
+    def __len__(self):
+        return self._count + len(self._other)
+
+    def __iter__(self):
+        for byte_index, byte in enumerate(self._bits):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield str(byte_index * 8 + bit)
+        yield from self._other
+
+    def add(self, person_id):
+        index = _bit_index(person_id)
+        if index is None:
+            self._other.add(person_id)
+            return
+        byte, mask = index >> 3, 1 << (index & 7)
+        if byte >= len(self._bits):
+            # Grow geometrically so sequential IDs do not reallocate every time
+            self._bits.extend(bytes(max(byte + 1 - len(self._bits), len(self._bits) // 2)))
+        if not self._bits[byte] & mask:
+            self._bits[byte] |= mask
+            self._count += 1
+
+    def discard(self, person_id):
+        index = _bit_index(person_id)
+        if index is None:
+            self._other.discard(person_id)
+            return
+        byte, mask = index >> 3, 1 << (index & 7)
+        if byte < len(self._bits) and self._bits[byte] & mask:
+            self._bits[byte] &= ~mask
+            self._count -= 1
+
+    def update(self, ids):
+        for person_id in ids:
+            self.add(person_id)
+
+    def __repr__(self):
+        return f"IdSet({len(self)} ids)"
+
+    def save(self, path, watermark):
+        """Write a snapshot tagged with the database ``watermark`` ``(max_rowid, count)``."""
+        other = "\n".join(self._other).encode("utf-8")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(SNAPSHOT_MAGIC, watermark[0], watermark[1], len(self._bits)))
+            f.write(self._bits)
+            f.write(other)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a snapshot; returns ``(ids, watermark)`` or None if it is missing or unreadable."""
+        try:
+            with open(path, "rb") as f:
+                header = f.read(_HEADER.size)
+                magic, max_rowid, count, bitmap_length = _HEADER.unpack(header)
+                if magic != SNAPSHOT_MAGIC:
+                    return None
+                bits = bytearray(f.read(bitmap_length))
+                other = f.read().decode("utf-8")
+        except (OSError, struct.error, UnicodeDecodeError):
+            return None
+        if len(bits) != bitmap_length:
+            return None
+        ids = cls()
+        ids._bits = bits
+        ids._count = int.from_bytes(bits, "little").bit_count()
+        ids._other = set(other.split("\n")) if other else set()
+        return ids, (max_rowid, count)
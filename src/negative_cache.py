@@ -0,0 +1,55 @@
+import threading
+
+DAY = 86400.0
+
+# How long each kind of failure is remembered before the ID is tried again
+NEGATIVE_TTLS = {
+    "not_found": 30 * DAY,     # 404 / 410
+    "unparsable": 14 * DAY,    # a page without a person block
+    "empty": 7 * DAY,          # an empty response body
+    "server_error": 1 * DAY,   # 5xx after every retry
+}
+
+
+class NegativeCache:
+    """Person IDs known to be missing or dead, kept across runs.
+
+    Entries live in the ``negative_cache`` table with a TTL that depends on
+    the failure class, so a 404 is not probed again for a month while a
+    server error is retried the next day. Active IDs are held in memory
+    for cheap lookups; the frontier query skips them in the database.
+    """
+
+    def __init__(self, db, ttls=None):
+        self.db = db
+        self.ttls = dict(NEGATIVE_TTLS, **(ttls or {}))
+        self._ids = set(self.db.get_negative_ids())
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def __contains__(self, person_id):
+        with self.lock:
+            return person_id in self._ids
+
+    def skip(self, person_id):
+        """True (and counted) when ``person_id`` should not be fetched."""
+        with self.lock:
+            if person_id not in self._ids:
+                return False
+            self.skipped += 1
+            return True
+
+    def record(self, person_id, url, failure_class):
+        if failure_class not in self.ttls:
+            raise ValueError(f"Unknown failure class: {failure_class}")
+        self.db.add_negative(person_id, url, failure_class, self.ttls[failure_class])
+        with self.lock:
+            self._ids.add(person_id)
+
+    def discard(self, person_id):
+        """Forget an ID that turned out to exist after all."""
+        with self.lock:
+            if person_id not in self._ids:
+                return
+            self._ids.discard(person_id)
+        self.db.remove_negative(person_id)
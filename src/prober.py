@@ -0,0 +1,154 @@
+import bisect
+import math
+import re
+from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
+
+# Bytes that show a page has a person block; the rest of the page is skipped
+PERSON_MARKER = re.compile(rb'class=["\'][^"\']*\bperson\b')
+PROBE_CHUNK_SIZE = 8192
+# Neighbouring IDs counted when estimating how densely a region is populated
+DENSITY_WINDOW = 200
+# Longest run of consecutive IDs checked before a spot is declared dead
+MAX_RUN = 8
+
+
+def person_url(base_url, person_id):
+    """``base_url`` with its ``i`` query parameter replaced by ``person_id``."""
+    parsed = urlparse(base_url)
+    query = parse_qs(parsed.query)
+    query['i'] = [str(person_id)]
+    return urlunparse(parsed._replace(query=urlencode(query, doseq=True)))
+
+
+def density(known, low, high):
+    """Share of the IDs in ``[low, high)`` present in the sorted list ``known``."""
+    if high <= low:
+        return 0.0
+    return (bisect.bisect_left(known, high) - bisect.bisect_left(known, low)) / (high - low)
+
+
+def run_length(live_share, miss_chance=0.05):
+    """IDs to check in a row so that a live region is missed with at most ``miss_chance``."""
+    if live_share <= 0:
+        return MAX_RUN
+    if live_share >= 1:
+        return 1
+    return max(1, min(MAX_RUN, math.ceil(math.log(miss_chance) / math.log(1 - live_share))))
+
+
+class IdProber:
+    """Finds unlinked person IDs with a small number of cheap requests.
+
+    The IDs already stored or discovered show how densely the ID space is
+    populated. Above the highest known ID, exponentially growing offsets are
+    checked until one is dead and the end of the live range is then located
+    by binary search, instead of fetching every ID in a fixed window. Below
+    it, the holes between known IDs are checked, small holes in dense
+    regions first. A check streams the page only until the person block
+    shows up and never parses it; IDs found alive are returned for a full
+    fetch by the engine. Dead IDs go to the engine's negative cache.
+    """
+
+    def __init__(self, engine, base_url):
+        self.engine = engine
+        self.base_url = base_url
+        self.known = engine.db.get_numeric_ids()
+        self.requests = 0
+        self._checked = {}
+
+    def exists(self, person_id):
+        """Whether ``person_id`` has a person page; each ID is checked at most once."""
+        person_id = int(person_id)
+        if person_id not in self._checked:
+            self._checked[person_id] = self._check(str(person_id))
+        return self._checked[person_id]
+
+    def _check(self, person_id):
+        if person_id in self.engine.negative_cache:
+            return False
+        url = person_url(self.base_url, person_id)
+        self.requests += 1
+        response = self.engine._request_with_retry(url, max_retries=self.engine.max_retries, stream=True)
+        with self.engine.lock:
+            failure_class = self.engine._failure_classes.pop(person_id, None)
+        if response is None:
+            if failure_class:
+                self.engine.negative_cache.record(person_id, url, failure_class)
+            return False
+        tail = b""
+        received = 0
+        try:
+            for chunk in response.iter_content(chunk_size=PROBE_CHUNK_SIZE):
+                received += len(chunk)
+                window = tail + chunk
+                if PERSON_MARKER.search(window):
+                    return True
+                # Keep enough bytes to match a marker split across chunks
+                tail = window[-64:]
+        except Exception as e:
+            print(f"Error probing {url}: {type(e).__name__}: {e}")
+            return False
+        finally:
+            response.close()
+        self.engine.negative_cache.record(person_id, url, "unparsable" if received else "empty")
+        return False
+
+    def _live_at(self, person_id, run):
+        """Whether any of ``run`` consecutive IDs from ``person_id`` is alive."""
+        return any(self.exists(person_id + i) for i in range(run))
+
+    def find_end(self, max_id, lookahead=500):
+        """Last live ID above ``max_id`` within ``lookahead``, or ``max_id``."""
+        run = run_length(density(self.known, max_id - DENSITY_WINDOW, max_id + 1))
+        live, dead, offset = 0, None, 1
+        while offset <= lookahead:
+            if not self._live_at(max_id + offset, run):
+                dead = offset
+                break
+            live = offset
+            offset *= 2
+        if dead is None:
+            return max_id + live
+        # The boundary lies between the last live and the first dead offset
+        while dead - live > run:
+            middle = (live + dead) // 2
+            if self._live_at(max_id + middle, run):
+                live = middle
+            else:
+                dead = middle
+        found = [i for i in range(live, min(dead + run, lookahead + 1)) if self._checked.get(max_id + i)]
+        return max_id + max(found + [live])
+
+    def gaps(self):
+        """Missing IDs between known ones, most promising first.
+
+        A hole is more likely to hold unlinked people when it is short and
+        surrounded by densely populated IDs.
+        """
+        ranked = []
+        for low, high in zip(self.known, self.known[1:]):
+            size = high - low - 1
+            if size <= 0:
+                continue
+            share = density(self.known, low - DENSITY_WINDOW, high + DENSITY_WINDOW)
+            ranked.append((share / size, low, high))
+        ranked.sort(key=lambda gap: -gap[0])
+        for _, low, high in ranked:
+            yield from range(low + 1, high)
+
+    def probe(self, limit=100, lookahead=500):
+        """IDs worth a full fetch, found with about ``limit`` checks at most."""
+        found = []
+        max_id = self.known[-1] if self.known else 0
+        end = self.find_end(max_id, lookahead=lookahead)
+        # Everything up to the end of the live range is fetched; dead IDs in
+        # it are cheap to rule out on the next run thanks to the cache.
+        for person_id in range(max_id + 1, end + 1):
+            if self._checked.get(person_id, True) and str(person_id) not in self.engine.negative_cache:
+                found.append(str(person_id))
+        for person_id in self.gaps():
+            if len(found) >= limit or self.requests >= limit:
+                break
+            if self.exists(person_id):
+                found.append(str(person_id))
+        return found[:limit]
@@ -0,0 +1,144 @@
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every worker of an engine.
+
+    ``rate`` is the sustained number of requests per second and ``burst``
+    the number of requests that may be issued back to back after an idle
+    period. A rate of ``None`` or ``0`` disables limiting entirely.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.rate and self.rate > 0)
+
+    def set_rate(self, rate, burst=None):
+        with self.lock:
+            self._refill()
+            self.rate = rate
+            if burst is not None:
+                self.burst = max(1, burst)
+                self.tokens = min(self.tokens, self.burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.enabled:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take a token and return how long the caller must wait before using it.
+
+        Tokens may go negative so that concurrent callers queue up behind each
+        other instead of all waking up at once when a token becomes free.
+        """
+        if not self.enabled:
+            return 0.0
+        with self.lock:
+            self._refill()
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class CircuitBreaker:
+    """Engine-wide pause switch tripped by 429 and 5xx responses.
+
+    While the breaker is open every worker waits before its next request,
+    so an overloaded site sees the whole engine back off at once instead of
+    each thread retrying on its own schedule.
+    """
+
+    def __init__(self):
+        self.open_until = 0.0
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def trip(self, delay):
+        with self.lock:
+            self.trips += 1
+            self.open_until = max(self.open_until, time.monotonic() + delay)
+
+    def remaining(self):
+        with self.lock:
+            return max(0.0, self.open_until - time.monotonic())
+
+    @property
+    def is_open(self):
+        return self.remaining() > 0
+
+    def wait(self):
+        remaining = self.remaining()
+        if remaining > 0:
+            time.sleep(remaining)
+        return remaining
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket kept in the crawl database and shared by every process.
+
+    Each reservation runs in one immediate SQLite transaction, so processes
+    (or hosts) crawling from the same database file together stay within
+    ``rate`` requests per second however many of them there are.
+    """
+
+    def __init__(self, db, rate, burst=1, name="default"):
+        super().__init__(rate, burst=burst)
+        self.db = db
+        self.name = name
+
+    def reserve(self):
+        if not self.enabled:
+            return 0.0
+        return self.db.reserve_rate_token(self.name, self.rate, self.burst)
+
+
+class SharedCircuitBreaker(CircuitBreaker):
+    """Circuit breaker whose pause is also seen by other processes."""
+
+    def __init__(self, db, name="default"):
+        super().__init__()
+        self.db = db
+        self.name = name
+
+    def trip(self, delay):
+        super().trip(delay)
+        self.db.pause_shared(self.name, time.time() + delay)
+
+    def remaining(self):
+        shared = self.db.get_shared_pause(self.name) - time.time()
+        return max(super().remaining(), shared, 0.0)
+
+
+def parse_retry_after(value):
+    """Return the ``Retry-After`` header value in seconds, or None."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,104 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from src.archive import read_object
+from src.database import INDIVIDUAL_COLUMNS
+from src.scraper import parse_page
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+def _reextract_page(path, compression, url):
+    """Worker: decompress one archived body and run it through the scraper."""
+    try:
+        html_content = read_object(path, compression).decode("utf-8", errors="replace")
+        return parse_page(html_content, url)
+    except Exception as e:
+        # A single bad page is reported as failed instead of aborting the run
+        print(f"Failed to re-extract {url}: {type(e).__name__}: {e}")
+        return None
+
+
+class ReextractReport:
+    """What a re-extraction run changed in the database."""
+
+    def __init__(self):
+        self.pages = 0
+        self.failed = []
+        self.added = []
+        self.changed = {}  # person_id -> sorted list of changed fields
+        self.unchanged = 0
+
+    def summary(self):
+        return (f"Re-extracted {self.pages} archived pages: {len(self.added)} added, "
+                f"{len(self.changed)} changed, {self.unchanged} unchanged, {len(self.failed)} failed.")
+
+
+class Reextractor:
+    """Rebuild ``individuals`` and ``relationships`` from archived pages.
+
+    The newest archived body of every person is parsed again with the
+    current ``Scraper`` in a process pool, with no HTTP requests. Results
+    are compared with what is stored and written back in batches of
+    ``batch_size`` records, one transaction per batch.
+    """
+
+    def __init__(self, db_helper, archive, workers=None, batch_size=DEFAULT_BATCH_SIZE):
+        self.db = db_helper
+        self.archive = archive
+        self.workers = workers
+        self.batch_size = batch_size
+
+    def run(self, person_ids=None, dry_run=False):
+        versions = self.archive.latest_versions()
+        if person_ids is not None:
+            wanted = set(person_ids)
+            versions = [v for v in versions if v["person_id"] in wanted]
+
+        stored = self.db.get_individuals()
+        stored_rels = self.db.get_all_relationships()
+        report = ReextractReport()
+        batch = []
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(
+                _reextract_page,
+                [v["path"] for v in versions],
+                [v["compression"] for v in versions],
+                [v["url"] for v in versions],
+                chunksize=max(1, min(256, len(versions) // (4 * (self.workers or os.cpu_count() or 1)))),
+            )
+            for version, parsed in zip(versions, results):
+                report.pages += 1
+                if not parsed:
+                    report.failed.append(version["person_id"])
+                    continue
+                data, rels = parsed
+                self._compare(report, data, rels, stored, stored_rels)
+                batch.append(parsed)
+                if len(batch) >= self.batch_size:
+                    self._write(batch, dry_run)
+                    batch = []
+        self._write(batch, dry_run)
+        return report
+
+    @staticmethod
+    def _compare(report, data, rels, stored, stored_rels):
+        person_id = data["id"]
+        before = stored.get(person_id)
+        if before is None:
+            report.added.append(person_id)
+            return
+        changed = [col for col in INDIVIDUAL_COLUMNS if (before.get(col) or None) != (data.get(col) or None)]
+        if {(rel["related_id"], rel["type"]) for rel in rels} != stored_rels.get(person_id, set()):
+            changed.append("relationships")
+        if changed:
+            report.changed[person_id] = changed
+        else:
+            report.unchanged += 1
+
+    def _write(self, batch, dry_run):
+        if not batch or dry_run:
+            return
+        self.db.add_individuals([data for data, _ in batch])
+        self.db.replace_relationships([data["id"] for data, _ in batch], [rel for _, rels in batch for rel in rels])
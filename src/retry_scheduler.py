@@ -0,0 +1,81 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class RetryLater:
+    """Returned by a single fetch attempt that failed transiently."""
+
+    def __init__(self, delay, reason):
+        self.delay = delay
+        self.reason = reason
+
+    def __bool__(self):
+        # A deferred retry is not a scraped page.
+        return False
+
+
+class RetryScheduler:
+    """Time-ordered delay queue for URLs whose fetch should be retried later.
+
+    Instead of sleeping through the backoff inside a worker, the engine parks
+    the URL here and the worker moves on to other work. ``pop_due`` hands the
+    entries back once their backoff has elapsed.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            return len(self._heap)
+
+    def schedule(self, person_id, url, attempt, delay):
+        due = time.monotonic() + delay
+        with self.lock:
+            heapq.heappush(self._heap, (due, next(self._counter), person_id, url, attempt))
+
+    def pop_due(self, limit=None):
+        """Remove and return ``(person_id, url, attempt)`` for every due entry."""
+        now = time.monotonic()
+        due = []
+        with self.lock:
+            while self._heap and self._heap[0][0] <= now:
+                if limit is not None and len(due) >= limit:
+                    break
+                _, _, person_id, url, attempt = heapq.heappop(self._heap)
+                due.append((person_id, url, attempt))
+        return due
+
+    def pop_next(self):
+        """Remove and return the earliest entry even if it is not due yet.
+
+        Used by a caller that has already slept until ``next_due_in``.
+        """
+        with self.lock:
+            if not self._heap:
+                return None
+            _, _, person_id, url, attempt = heapq.heappop(self._heap)
+        return person_id, url, attempt
+
+    def next_due_in(self):
+        """Seconds until the earliest entry is due, or None when empty."""
+        with self.lock:
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def person_ids(self):
+        """IDs of every entry still waiting for its retry."""
+        with self.lock:
+            return {person_id for _, _, person_id, _, _ in self._heap}
+
+    def drain(self):
+        """Remove and return every entry regardless of its due time."""
+        with self.lock:
+            entries = [(person_id, url, attempt) for _, _, person_id, url, attempt in sorted(self._heap)]
+            self._heap = []
+        return entries
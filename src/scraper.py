@@ -1,9 +1,49 @@
+import codecs
 from bs4 import BeautifulSoup
+from lxml import etree
 import re
-from urllib.parse import urlparse, parse_qs
-from src.utils import hebrew_to_civil, normalize_whitespace
+from urllib.parse import urljoin
+from src.utils import hebrew_to_civil, normalize_whitespace, person_id_from_url
 from src.name_parser import NameParser
 
+def _class_xpath(name, scope="//"):
+    # Same semantics as BeautifulSoup's class_= match on a multi-valued attribute
+    return etree.XPath(
+        f"({scope}*[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')])[1]"
+    )
+
+
+_PERSON_XPATH = _class_xpath("person")
+_PARENTS_XPATH = _class_xpath("parents")
+_KIDS_XPATH = _class_xpath("kids")
+_INFO_XPATH = _class_xpath("info", scope=".//")
+_ANCHORS_XPATH = etree.XPath(".//a")
+_LINKED_ANCHORS_XPATH = etree.XPath("//a[@href]")
+_TEXT_SKIPPED_TAGS = frozenset(["script", "style"])
+# Sections a streamed page must contain before reading can stop; the
+# parents list precedes both in the document, so it is complete by then.
+_STREAM_STOP_SECTIONS = frozenset(["person", "kids"])
+
+
+class PageTooLarge(ValueError):
+    """Raised when a streamed page exceeds the configured size limit."""
+
+
+def _stripped_text(element):
+    """Equivalent of BeautifulSoup's ``get_text(strip=True)`` for lxml."""
+    parts = [element.text.strip()] if element.text else []
+    for child in element:
+        if isinstance(child.tag, str) and child.tag not in _TEXT_SKIPPED_TAGS:
+            parts.append(_stripped_text(child))
+        if child.tail:
+            parts.append(child.tail.strip())
+    return "".join(parts)
+
+
+def _classes(element):
+    return element.get("class", "").split()
+
+
 class Scraper:
     def __init__(self):
         self.name_parser = NameParser()
@@ -14,24 +54,13 @@ class Scraper:
         except Exception:
             return BeautifulSoup(html_content, 'html.parser')
 
-    def extract_biographical_data(self, html_content, url):
-        soup = self._get_soup(html_content)
-        
-        # Extract ID from URL query parameter 'i'
-        parsed_url = urlparse(url)
-        person_id = parse_qs(parsed_url.query).get('i', [None])[0]
-        
-        person_container = soup.find(class_='person')
-        if not person_container:
-            return None
-            
-        info_container = person_container.find(class_='info')
-        if not info_container:
-            return None
+    def _build_person(self, person_id, name, url, li_texts, person_classes, same_person_link_classes):
+        """Assemble the individual record shared by both extraction paths.
 
-        name_elem = info_container.find('h2')
-        name = normalize_whitespace(name_elem.get_text(strip=True)) if name_elem else ""
-        
+        ``same_person_link_classes`` is a lazy iterable of the class lists of
+        other links to this person; it is only consumed when neither the
+        name nor the person block reveals the gender.
+        """
         # Detect gender using NameParser
         gender = self.name_parser.detect_gender(name)
 
@@ -55,8 +84,7 @@ class Scraper:
         }
         
         # Extract dates and places from list items
-        for li in info_container.find_all('li'):
-            text = li.get_text(strip=True)
+        for text in li_texts:
             if 'תאריך לידה' in text:
                 data["birth_date"] = normalize_whitespace(text.replace('תאריך לידה:', ''))
                 data["birth_date_civil"] = hebrew_to_civil(data["birth_date"])
@@ -69,26 +97,20 @@ class Scraper:
                 data["death_place"] = normalize_whitespace(text.replace('מקום פטירה:', ''))
                 
         # Explicit gender detection from class overrides name detection
-        classes = person_container.get('class', [])
-        if "female" in classes:
+        if "female" in person_classes:
              data["gender"] = "F"
-        elif "male" in classes:
+        elif "male" in person_classes:
              data["gender"] = "M"
 
         # If gender still unknown or we want to be more robust, check other links to the same person on the page
         if data["gender"] not in ["F", "M"]:
-            # Find all links on the page
-            for a in soup.find_all('a', href=True):
-                href = a['href']
-                # Check if it links to the same person ID
-                if f"i={person_id}" in href:
-                    a_classes = a.get('class', [])
-                    if "female" in a_classes:
-                        data["gender"] = "F"
-                        break
-                    elif "male" in a_classes:
-                        data["gender"] = "M"
-                        break
+            for a_classes in same_person_link_classes:
+                if "female" in a_classes:
+                    data["gender"] = "F"
+                    break
+                elif "male" in a_classes:
+                    data["gender"] = "M"
+                    break
 
         # Default to U (Unknown) if still unknown
         if not data["gender"]:
@@ -96,8 +118,58 @@ class Scraper:
 
         return data
 
+    def _parent_type(self, classes, link_text):
+        if "male" in classes:
+            return "father"
+        elif "female" in classes:
+            return "mother"
+        # Fallback to name detection if class is missing
+        detected_gender = self.name_parser.detect_gender(normalize_whitespace(link_text))
+        if detected_gender == "M":
+            return "father"
+        # Default to mother if still unknown (as it was before, but now more robust)
+        return "mother"
+
+    @staticmethod
+    def _relationship(person_id, href, rel_type, base_url):
+        full_url = urljoin(base_url, href) if base_url else href
+        if full_url:
+            full_url = full_url.replace('//?', '/?')
+        related_id = person_id_from_url(full_url)
+        if not related_id:
+            return None
+        return {"person_id": person_id, "related_id": related_id, "type": rel_type, "url": full_url}
+
+    def extract_biographical_data(self, html_content, url):
+        soup = self._get_soup(html_content)
+        
+        # Extract ID from URL query parameter 'i'
+        person_id = person_id_from_url(url)
+        
+        person_container = soup.find(class_='person')
+        if not person_container:
+            return None
+            
+        info_container = person_container.find(class_='info')
+        if not info_container:
+            return None
+
+        name_elem = info_container.find('h2')
+        name = normalize_whitespace(name_elem.get_text(strip=True)) if name_elem else ""
+
+        # Links to the same person elsewhere on the page
+        same_person_links = (
+            a.get('class', []) for a in soup.find_all('a', href=True)
+            if f"i={person_id}" in a['href']
+        )
+        return self._build_person(
+            person_id, name, url,
+            (li.get_text(strip=True) for li in info_container.find_all('li')),
+            person_container.get('class', []),
+            same_person_links,
+        )
+
     def extract_relationships(self, html_content, person_id, base_url=None):
-        from urllib.parse import urljoin
         soup = self._get_soup(html_content)
         relationships = []
         
@@ -105,30 +177,10 @@ class Scraper:
         parents_container = soup.find(class_='parents')
         if parents_container:
             for parent_link in parents_container.find_all('a'):
-                href = parent_link.get('href', '')
-                full_url = urljoin(base_url, href) if base_url else href
-                if full_url:
-                    full_url = full_url.replace('//?', '/?')
-                parsed_href = urlparse(full_url)
-                related_id = parse_qs(parsed_href.query).get('i', [None])[0]
-                if related_id:
-                    classes = parent_link.get('class', [])
-                    if "male" in classes:
-                        rel_type = "father"
-                    elif "female" in classes:
-                        rel_type = "mother"
-                    else:
-                        # Fallback to name detection if class is missing
-                        parent_name = normalize_whitespace(parent_link.get_text(strip=True))
-                        detected_gender = self.name_parser.detect_gender(parent_name)
-                        if detected_gender == "M":
-                            rel_type = "father"
-                        elif detected_gender == "F":
-                            rel_type = "mother"
-                        else:
-                            # Default to mother if still unknown (as it was before, but now more robust)
-                            rel_type = "mother"
-                    relationships.append({"person_id": person_id, "related_id": related_id, "type": rel_type, "url": full_url})
+                rel_type = self._parent_type(parent_link.get('class', []), parent_link.get_text(strip=True))
+                rel = self._relationship(person_id, parent_link.get('href', ''), rel_type, base_url)
+                if rel:
+                    relationships.append(rel)
             
         # Spouse
         person_elem = soup.find(class_='person')
@@ -137,26 +189,144 @@ class Scraper:
             if info_container:
                 spouse_elem = info_container.find('h4')
                 if spouse_elem and spouse_elem.find('a'):
-                    href = spouse_elem.find('a').get('href', '')
-                    full_url = urljoin(base_url, href) if base_url else href
-                    if full_url:
-                        full_url = full_url.replace('//?', '/?')
-                    parsed_href = urlparse(full_url)
-                    related_id = parse_qs(parsed_href.query).get('i', [None])[0]
-                    if related_id:
-                        relationships.append({"person_id": person_id, "related_id": related_id, "type": "spouse", "url": full_url})
+                    rel = self._relationship(person_id, spouse_elem.find('a').get('href', ''), "spouse", base_url)
+                    if rel:
+                        relationships.append(rel)
 
         # Children
         kids_container = soup.find(class_='kids')
         if kids_container:
             for child_link in kids_container.find_all('a'):
-                href = child_link.get('href', '')
-                full_url = urljoin(base_url, href) if base_url else href
-                if full_url:
-                    full_url = full_url.replace('//?', '/?')
-                parsed_href = urlparse(full_url)
-                related_id = parse_qs(parsed_href.query).get('i', [None])[0]
-                if related_id:
-                    relationships.append({"person_id": person_id, "related_id": related_id, "type": "child", "url": full_url})
+                rel = self._relationship(person_id, child_link.get('href', ''), "child", base_url)
+                if rel:
+                    relationships.append(rel)
                 
         return relationships
+
+    def extract_page(self, html_content, url):
+        """Parse a person page once and return ``(data, relationships)``.
+
+        Produces the same output as ``extract_biographical_data`` followed by
+        ``extract_relationships``, but builds a single lxml tree and uses
+        precompiled XPath selectors. ``data`` is None when the page has no
+        person block. Falls back to the BeautifulSoup path if lxml cannot
+        parse the document at all.
+        """
+        try:
+            # lxml parser objects must not be shared between threads
+            root = etree.fromstring(html_content, etree.HTMLParser()) if html_content else None
+        except (etree.ParserError, ValueError):
+            root = None
+        if root is None:
+            data = self.extract_biographical_data(html_content, url)
+            person_id = data["id"] if data else person_id_from_url(url)
+            return data, self.extract_relationships(html_content, person_id, base_url=url)
+        return self.extract_from_tree(root, url)
+
+    def extract_page_stream(self, chunks, url, encoding=None, max_bytes=None):
+        """Parse a page incrementally from an iterable of byte chunks.
+
+        Bytes are fed straight into an lxml feed parser while they arrive.
+        UTF-8, the site's encoding and the assumption when the server names
+        none, is declared up front so no charset detection happens; other
+        encodings are decoded incrementally. Reading stops as soon as the
+        person block and the children list have been closed, and
+        ``PageTooLarge`` is raised once more than ``max_bytes`` arrive.
+        Returns ``(data, relationships)`` like ``extract_page``. Links to the
+        person that appear after the children list are not seen, so the
+        last-resort gender fallback only covers the part that was read.
+        """
+        utf8 = not encoding or codecs.lookup(encoding).name == 'utf-8'
+        parser = etree.HTMLPullParser(events=('end',), encoding='utf-8' if utf8 else None)
+        decoder = None if utf8 else codecs.getincrementaldecoder(encoding)(errors='replace')
+        received = 0
+        closed_sections = set()
+        for chunk in chunks:
+            if not chunk:
+                continue
+            received += len(chunk)
+            if max_bytes is not None and received > max_bytes:
+                raise PageTooLarge(f"{url} is larger than {max_bytes} bytes")
+            parser.feed(chunk if decoder is None else decoder.decode(chunk))
+            for _, element in parser.read_events():
+                classes = element.get('class') if isinstance(element.tag, str) else None
+                if classes:
+                    closed_sections.update(_STREAM_STOP_SECTIONS.intersection(classes.split()))
+            if closed_sections == _STREAM_STOP_SECTIONS:
+                break
+        try:
+            root = parser.close()
+        except etree.LxmlError:
+            root = None
+        if root is None:
+            return None, []
+        return self.extract_from_tree(root, url)
+
+    def extract_from_tree(self, root, url):
+        """Run the fused extraction on an already parsed lxml tree."""
+        person_id = person_id_from_url(url)
+        person_nodes = _PERSON_XPATH(root)
+        person_container = person_nodes[0] if person_nodes else None
+        info_nodes = _INFO_XPATH(person_container) if person_container is not None else []
+        info_container = info_nodes[0] if info_nodes else None
+
+        data = None
+        if info_container is not None:
+            name_elem = info_container.find('.//h2')
+            name = normalize_whitespace(_stripped_text(name_elem)) if name_elem is not None else ""
+            marker = f"i={person_id}"
+            same_person_links = (
+                _classes(a) for a in _LINKED_ANCHORS_XPATH(root) if marker in a.get('href')
+            )
+            data = self._build_person(
+                person_id, name, url,
+                (_stripped_text(li) for li in info_container.iter('li')),
+                _classes(person_container),
+                same_person_links,
+            )
+            person_id = data["id"]
+
+        relationships = []
+        parents_nodes = _PARENTS_XPATH(root)
+        if parents_nodes:
+            for parent_link in _ANCHORS_XPATH(parents_nodes[0]):
+                rel_type = self._parent_type(_classes(parent_link), _stripped_text(parent_link))
+                rel = self._relationship(person_id, parent_link.get('href', ''), rel_type, url)
+                if rel:
+                    relationships.append(rel)
+
+        if info_container is not None:
+            spouse_elem = info_container.find('.//h4')
+            if spouse_elem is not None:
+                spouse_link = spouse_elem.find('.//a')
+                if spouse_link is not None:
+                    rel = self._relationship(person_id, spouse_link.get('href', ''), "spouse", url)
+                    if rel:
+                        relationships.append(rel)
+
+        kids_nodes = _KIDS_XPATH(root)
+        if kids_nodes:
+            for child_link in _ANCHORS_XPATH(kids_nodes[0]):
+                rel = self._relationship(person_id, child_link.get('href', ''), "child", url)
+                if rel:
+                    relationships.append(rel)
+
+        return data, relationships
+
+
+_PROCESS_SCRAPER = None
+
+
+def parse_page(html_content, url):
+    """Extract ``(data, relationships)`` from a person page, or None.
+
+    Module-level so it can run in a ``ProcessPoolExecutor``; every worker
+    process builds its own ``Scraper`` once and reuses it.
+    """
+    global _PROCESS_SCRAPER
+    if _PROCESS_SCRAPER is None:
+        _PROCESS_SCRAPER = Scraper()
+    data, rels = _PROCESS_SCRAPER.extract_page(html_content, url)
+    if not data or not data.get("id"):
+        return None
+    return data, rels
@@ -0,0 +1,39 @@
+from urllib.parse import urlparse, parse_qs
+
+from src.prober import person_url
+from src.utils import canonical_person_id
+
+
+def canonical_url(line, base_url=None):
+    """``(person_id, url)`` for one seed line, or None if it names no person.
+
+    A seed is a person URL or, when ``base_url`` is given, a bare ID. The
+    URL is reduced to scheme, lower-cased host, path and the ``i``
+    parameter, with leading zeros dropped from a decimal ID, so the same
+    person written differently is fetched once.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line.isdigit():
+        return canonical_url(person_url(base_url, line)) if base_url else None
+    parsed = urlparse(line.replace('//?', '/?'))
+    person_id = canonical_person_id(parse_qs(parsed.query).get('i', [None])[0])
+    if not person_id or not parsed.scheme or not parsed.netloc:
+        return None
+    path = parsed.path or "/"
+    return person_id, f"{parsed.scheme.lower()}://{parsed.netloc.lower()}{path}?i={person_id}"
+
+
+def read_seeds(lines, base_url=None):
+    """Deduplicated ``(person_id, url)`` seeds in input order, and the number of bad lines."""
+    seeds = {}
+    invalid = 0
+    for line in lines:
+        seed = canonical_url(line, base_url)
+        if seed is None:
+            if line.strip() and not line.strip().startswith("#"):
+                invalid += 1
+            continue
+        seeds.setdefault(seed[0], seed[1])
+    return list(seeds.items()), invalid
@@ -1,6 +1,17 @@
 import re
+from urllib.parse import urlparse, parse_qs
 from pyluach.dates import HebrewDate, GregorianDate
 
+def canonical_person_id(person_id):
+    """A decimal ID without leading zeros, as the database stores it; other IDs unchanged."""
+    if person_id and person_id.isascii() and person_id.isdigit():
+        return str(int(person_id))
+    return person_id
+
+def person_id_from_url(url):
+    """The canonical person ID in a page URL's ``i`` parameter, or None."""
+    return canonical_person_id(parse_qs(urlparse(url).query).get('i', [None])[0])
+
 def normalize_whitespace(text):
     if not text:
         return text
@@ -0,0 +1,120 @@
+import threading
+import time
+from queue import Empty, Queue
+
+DEFAULT_WRITE_BATCH = 200
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+_STOP = object()
+
+
+class PageWriter:
+    """Write-behind queue in front of ``DatabaseHelper.write_batch``.
+
+    The crawl submits page results, 304 checks and failed attempts; a
+    background thread applies them in one transaction per batch of
+    ``batch_size`` items, or ``flush_interval`` seconds after the first
+    item of a batch arrived, whichever comes first. One commit per batch
+    instead of several per page keeps the database from being the
+    bottleneck of a concurrent crawl.
+
+    ``flush`` blocks until everything submitted so far is written; the
+    engine calls it before it reads back what the crawl wrote (the
+    frontier, the visited watermark) and ``close`` at shutdown. With
+    ``batch_size`` of 1 or less every item is written on submit.
+    ``on_page`` is called with ``(changed, written)`` for each page result
+    once it is stored, on the writer thread.
+    """
+
+    def __init__(self, db, batch_size=DEFAULT_WRITE_BATCH, flush_interval=DEFAULT_FLUSH_INTERVAL, on_page=None):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_page = on_page
+        self.batches = 0
+        self.written = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._queue = Queue()
+        self._thread = None
+        if batch_size > 1:
+            self._thread = threading.Thread(target=self._write_loop, name="page-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, item):
+        """Queue a ``PageResult``, ``PageCheck`` or ``PageFailure`` for writing."""
+        with self._lock:
+            self._pending += 1
+        if self._thread is None:
+            self._write([item])
+        else:
+            self._queue.put(item)
+
+    def pending(self):
+        """Items submitted but not written yet."""
+        with self._lock:
+            return self._pending
+
+    def flush(self):
+        """Block until every item submitted so far has been written."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        """Write what is queued and stop the writer thread."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _write_loop(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if not batch else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except Empty:
+                # The oldest queued item has waited flush_interval
+                self._write(batch)
+                batch = []
+                continue
+            if item is _STOP:
+                self._write(batch)
+                return
+            if isinstance(item, threading.Event):
+                self._write(batch)
+                batch = []
+                item.set()
+                continue
+            if not batch:
+                deadline = time.monotonic() + self.flush_interval
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            outcomes = self.db.write_batch(batch)
+        except Exception as e:
+            if len(batch) > 1:
+                # Keep the rest of the batch when one item cannot be written
+                for item in batch:
+                    self._write([item])
+                return
+            print(f"Error writing {type(batch[0]).__name__} to the database: {type(e).__name__}: {e}")
+            outcomes = []
+        else:
+            self.batches += 1
+            self.written += len(batch)
+        with self._lock:
+            self._pending -= len(batch)
+        if self.on_page is not None:
+            for changed, written in outcomes:
+                self.on_page(changed, written)
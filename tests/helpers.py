@@ -0,0 +1,19 @@
+import requests
+from unittest.mock import MagicMock
+
+
+def person_page(name, kids=()):
+    """HTML of a person page that links to ``kids``."""
+    links = "".join(f'<li><a href="?i={kid}">{kid}</a></li>' for kid in kids)
+    return f'<div class="person male"><div class="info"><h2>{name}</h2></div></div><ul class="kids">{links}</ul>'
+
+
+def make_response(status=200, text="", headers=None):
+    """Stand-in for a ``requests`` response; 4xx and 5xx raise from ``raise_for_status``."""
+    response = MagicMock()
+    response.status_code = status
+    response.headers = headers or {}
+    response.text = text
+    if status >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(f"{status} Error")
+    return response
@@ -0,0 +1,115 @@
+import gzip
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from src.archive import PageArchive
+from src.engine import ScraperEngine
+from src.database import DatabaseHelper
+
+PAGE = '<div class="person male"><div class="info"><h2>Archived</h2></div></div><ul class="kids"></ul>'
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_archive.db"
+    return DatabaseHelper(str(db_path))
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = PageArchive(str(tmp_path / "archive"), keep=2, compression="gzip")
+    yield archive
+    archive.close()
+
+def object_files(archive):
+    return [name for _, _, names in os.walk(os.path.join(archive.root, "objects")) for name in names]
+
+def test_identical_bodies_are_stored_once(archive):
+    archive.store("1", "http://example.com/?i=1", PAGE, fetched_at=1.0)
+    archive.store("1", "http://example.com/?i=1", PAGE, fetched_at=2.0)
+    archive.store("2", "http://example.com/?i=2", PAGE, fetched_at=3.0)
+    archive.flush()
+
+    assert [v["fetched_at"] for v in archive.versions("1")] == [2.0]
+    assert len(object_files(archive)) == 1
+    assert archive.latest("2").decode("utf-8") == PAGE
+
+def test_bodies_are_compressed(archive):
+    archive.store("1", "http://example.com/?i=1", PAGE * 50)
+    archive.flush()
+    version = archive.versions("1")[0]
+    path = os.path.join(archive.root, "objects", version["sha256"][:2], version["sha256"][2:] + ".gz")
+    with open(path, "rb") as f:
+        blob = f.read()
+    assert len(blob) < version["size"]
+    assert gzip.decompress(blob).decode("utf-8") == PAGE * 50
+
+def test_retention_keeps_newest_versions_and_drops_orphans(archive):
+    for i in range(4):
+        archive.store("1", "http://example.com/?i=1", f"version {i}", fetched_at=float(i))
+    archive.flush()
+
+    versions = archive.versions("1")
+    assert [archive.load(v["sha256"]) for v in versions] == [b"version 3", b"version 2"]
+    assert len(object_files(archive)) == 2
+
+def test_unchanged_refetches_keep_older_versions(archive):
+    archive.store("1", "u1", "old", fetched_at=1.0)
+    for i in range(3):
+        archive.store("1", "u1", "new", fetched_at=2.0 + i)
+    archive.flush()
+
+    versions = archive.versions("1")
+    assert [archive.load(v["sha256"]) for v in versions] == [b"new", b"old"]
+    assert versions[0]["fetched_at"] == 4.0
+    assert len(object_files(archive)) == 2
+
+def test_shared_body_survives_retention_of_other_person(archive):
+    archive.store("1", "u1", "shared", fetched_at=1.0)
+    archive.store("2", "u2", "shared", fetched_at=1.0)
+    archive.store("1", "u1", "a", fetched_at=2.0)
+    archive.store("1", "u1", "b", fetched_at=3.0)
+    archive.flush()
+    assert archive.latest("2") == b"shared"
+
+def test_index_survives_reopen(tmp_path):
+    root = str(tmp_path / "archive")
+    archive = PageArchive(root, compression="gzip")
+    archive.store("7", "http://example.com/?i=7", PAGE)
+    archive.close()
+
+    reopened = PageArchive(root, compression="gzip")
+    assert reopened.latest("7").decode("utf-8") == PAGE
+    reopened.close()
+
+def test_unknown_compression_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        PageArchive(str(tmp_path / "archive"), compression="lz4")
+
+def test_engine_archives_fetched_pages(mock_db, archive):
+    engine = ScraperEngine(mock_db, delay=0, archive=archive)
+    with patch("requests.Session.get") as mock_get:
+        mock_res = MagicMock()
+        mock_res.status_code = 200
+        mock_res.text = PAGE
+        mock_get.return_value = mock_res
+        engine._scrape_one("http://example.com/?i=a1")
+        engine._enqueue("a2", "http://example.com/?i=a2")
+        engine._process_queue(limit=5)
+    archive.flush()
+
+    assert archive.latest("a1").decode("utf-8") == PAGE
+    assert archive.versions("a2")[0]["url"] == "http://example.com/?i=a2"
+
+def test_stream_mode_archives_the_whole_body(mock_db, archive):
+    body = (PAGE + "<p>trailing</p>" * 2000).encode("utf-8")
+    response = MagicMock()
+    response.status_code = 200
+    response.headers = {"Content-Type": "text/html; charset=UTF-8"}
+    response.iter_content.return_value = (body[i:i + 512] for i in range(0, len(body), 512))
+    engine = ScraperEngine(mock_db, delay=0, stream=True, archive=archive)
+
+    with patch("requests.Session.get", return_value=response):
+        data, _ = engine._scrape_one("http://example.com/?i=s1")
+    archive.flush()
+
+    assert data["name"] == "Archived"
+    assert archive.latest("s1") == body
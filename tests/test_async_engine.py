@@ -0,0 +1,149 @@
+import threading
+import pytest
+from unittest.mock import patch
+from src.async_engine import AsyncScraperEngine
+from src.database import DatabaseHelper
+from tests.helpers import make_response, person_page
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_async.db"
+    return DatabaseHelper(str(db_path))
+
+def fake_fetch(pages, calls):
+    async def _fetch(self, url):
+        calls.append(url)
+        person_id = self._person_id_from_url(url)
+        status, text = pages.get(person_id, (404, ""))
+        return status, {}, text
+    return _fetch
+
+def test_async_process_queue_follows_relationships(mock_db):
+    pages = {
+        "p2": (200, person_page("Child", kids=["p3"])),
+        "p3": (200, person_page("Grandchild")),
+    }
+    calls = []
+    engine = AsyncScraperEngine(mock_db, delay=0)
+    engine._enqueue("p2", "http://example.com/?i=p2")
+
+    with patch.object(AsyncScraperEngine, "_fetch", fake_fetch(pages, calls)):
+        count = engine._process_queue(limit=10)
+
+    assert count == 2
+    assert mock_db.get_individual("p2") is not None
+    assert mock_db.get_individual("p3") is not None
+    assert {"p2", "p3"} <= engine.visited_ids
+    assert len(calls) == 2
+
+def test_async_process_queue_respects_limit(mock_db):
+    pages = {f"c{i}": (200, person_page(f"Child {i}")) for i in range(10)}
+    calls = []
+    engine = AsyncScraperEngine(mock_db, delay=0, concurrency=4)
+    for person_id in pages:
+        engine._enqueue(person_id, f"http://example.com/?i={person_id}")
+
+    with patch.object(AsyncScraperEngine, "_fetch", fake_fetch(pages, calls)):
+        count = engine._process_queue(limit=3)
+
+    assert count == 3
+    assert len(calls) == 3
+    assert len(mock_db.get_all_ids()) == 3
+
+def test_async_retries_on_429(mock_db):
+    responses = [(429, {"Retry-After": "7"}, ""), (200, {}, person_page("Retried"))]
+
+    async def _fetch(self, url):
+        return responses.pop(0)
+
+    engine = AsyncScraperEngine(mock_db, delay=0)
+    engine._enqueue("p1", "http://example.com/?i=p1")
+
+    with patch.object(AsyncScraperEngine, "_fetch", _fetch), \
+         patch("src.async_engine.asyncio.sleep") as mock_sleep:
+        count = engine._process_queue(limit=1)
+
+    assert count == 1
+    assert mock_sleep.call_count == 1
+    # The server's Retry-After hint outranks the 5s initial backoff
+    assert mock_sleep.call_args[0][0] > 6
+    assert engine.breaker.trips == 1
+    assert mock_db.get_individual("p1")["name"] == "Retried"
+
+def test_async_failure_increments_failure_count(mock_db):
+    mock_db.add_discovered_url("p9", "http://example.com/?i=p9")
+    calls = []
+    engine = AsyncScraperEngine(mock_db, delay=0)
+
+    with patch.object(AsyncScraperEngine, "_fetch", fake_fetch({}, calls)):
+        engine.retry_failed(limit=5)
+
+    assert mock_db.get_individual("p9") is None
+    row = mock_db.conn.execute("SELECT failure_count FROM discovered_urls WHERE id = 'p9'").fetchone()
+    assert row[0] == 1
+
+def test_async_engine_shares_rate_budget(mock_db):
+    engine = AsyncScraperEngine(mock_db, max_workers=4, delay=2.0)
+    assert engine.rate_limiter.rate == 0.5
+
+    engine = AsyncScraperEngine(mock_db, rate=3.0, burst=5)
+    assert engine.rate_limiter.rate == 3.0
+    assert engine.rate_limiter.burst == 5
+
+def test_async_refresh_revalidates_stored_pages(mock_db):
+    mock_db.add_individual({"id": "r1", "name": "Stored", "url": "http://example.com/?i=r1"})
+    mock_db.set_validators("r1", '"etag"', None)
+    seen_headers = []
+
+    async def _fetch(self, url, headers=None):
+        seen_headers.append(headers)
+        return 304, {}, ""
+
+    engine = AsyncScraperEngine(mock_db, delay=0)
+    with patch.object(AsyncScraperEngine, "_fetch", _fetch):
+        count = engine.refresh(budget=5)
+
+    assert count == 0
+    assert seen_headers == [{"If-None-Match": '"etag"'}]
+    assert engine.unchanged_count == 1
+    assert mock_db.get_individual("r1")["name"] == "Stored"
+
+def test_async_crawl_scrapes_start_page_and_relatives(mock_db):
+    pages = {"k1": (200, person_page("Kid"))}
+    calls = []
+    engine = AsyncScraperEngine(mock_db, delay=0)
+
+    with patch("requests.Session.get", return_value=make_response(200, person_page("Root", kids=["k1"]))), \
+         patch.object(AsyncScraperEngine, "_fetch", fake_fetch(pages, calls)):
+        engine.crawl("http://example.com/?i=root", limit=5)
+    engine.close()
+
+    assert set(mock_db.get_all_ids()) == {"root", "k1"}
+    assert engine.concurrency.limit == engine.max_workers
+
+def test_async_scrape_person_stores_the_page(mock_db):
+    engine = AsyncScraperEngine(mock_db, delay=0)
+
+    with patch("requests.Session.get", return_value=make_response(200, person_page("Solo"))):
+        data = engine.scrape_person("http://example.com/?i=solo")
+    engine.close()
+
+    assert data["name"] == "Solo"
+    assert mock_db.get_individual("solo")["name"] == "Solo"
+
+def test_async_parses_pages_off_the_event_loop(mock_db):
+    pages = {"p1": (200, person_page("Parsed"))}
+    threads = []
+    handle_page = AsyncScraperEngine._handle_page
+
+    def recording_handle_page(self, *args, **kwargs):
+        threads.append(threading.current_thread())
+        return handle_page(self, *args, **kwargs)
+
+    engine = AsyncScraperEngine(mock_db, delay=0)
+    engine._enqueue("p1", "http://example.com/?i=p1")
+    with patch.object(AsyncScraperEngine, "_fetch", fake_fetch(pages, [])), \
+         patch.object(AsyncScraperEngine, "_handle_page", recording_handle_page):
+        assert engine._process_queue(limit=1) == 1
+
+    assert threads and threading.main_thread() not in threads
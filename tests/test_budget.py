@@ -0,0 +1,85 @@
+import pytest
+from unittest.mock import patch
+from src.budget import TimeBudget
+from src.engine import ScraperEngine
+from src.database import DatabaseHelper
+from tests.helpers import make_response, person_page
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_budget.db"
+    return DatabaseHelper(str(db_path))
+
+def queued_ids(db):
+    return {row[0] for row in db.conn.execute("SELECT id FROM discovered_urls WHERE state = 'queued'")}
+
+def test_budget_plans_from_measured_times():
+    clock = [100.0]
+    with patch("src.budget.time.monotonic", side_effect=lambda: clock[0]):
+        budget = TimeBudget(60)
+        assert budget.can_start()
+        budget.record_fetch(10)
+        clock[0] += 20
+        budget.record_page()
+        budget.record_page()
+        # 40s left; two pages per 20s means a page admitted behind 3 others needs 40s
+        assert budget.estimate(in_progress=3) == 40
+        assert budget.can_start(in_progress=2)
+        assert not budget.can_start(in_progress=3)
+        assert not budget.can_start(delay=35)
+        assert budget.planned_pages() == 4
+        budget.request_stop()
+        assert not budget.can_start()
+
+def test_no_budget_never_stops():
+    budget = TimeBudget()
+    assert budget.can_start(in_progress=1000)
+    assert budget.summary() is None
+
+def test_stop_request_drains_and_keeps_frontier(mock_db):
+    engine = ScraperEngine(mock_db, delay=0, max_workers=1)
+    engine._enqueue("r", "http://example.com/?i=r")
+    requested = []
+
+    def fake_get(url, timeout=None):
+        person_id = url.split("i=")[1]
+        requested.append(person_id)
+        if person_id == "r":
+            # The signal arrives while the first page is in flight
+            engine.request_stop()
+            return make_response(200, person_page("Pr", kids=["a", "b"]))
+        return make_response(200, person_page(f"P{person_id}"))
+
+    with patch("requests.Session.get", side_effect=fake_get):
+        count = engine._process_queue(limit=10)
+
+    assert count == 1
+    assert requested == ["r"]
+    assert mock_db.get_individual("r") is not None
+    assert queued_ids(mock_db) == {"a", "b"}
+
+def test_expired_budget_starts_nothing(mock_db):
+    engine = ScraperEngine(mock_db, delay=0)
+    engine._enqueue("r", "http://example.com/?i=r")
+    engine.set_time_budget(0)
+
+    with patch("requests.Session.get") as mock_get:
+        assert engine._process_queue(limit=10) == 0
+
+    mock_get.assert_not_called()
+    assert queued_ids(mock_db) == {"r"}
+
+def test_pending_retries_are_requeued_when_time_runs_out(mock_db):
+    engine = ScraperEngine(mock_db, delay=0, max_workers=1)
+    engine._enqueue("flaky", "http://example.com/?i=flaky")
+    engine.set_time_budget(30)
+
+    # The retry backoff (5s or more) is longer than what is left
+    with patch("requests.Session.get", return_value=make_response(503)), \
+         patch("src.budget.TimeBudget.remaining", return_value=3.0), \
+         patch("src.engine.time.sleep") as mock_sleep:
+        assert engine._process_queue(limit=10) == 0
+
+    mock_sleep.assert_not_called()
+    assert len(engine.retries) == 0
+    assert queued_ids(mock_db) == {"flaky"}
@@ -1,6 +1,7 @@
 import pytest
 from click.testing import CliRunner
 from src.cli import main
+from tests.helpers import person_page
 from unittest.mock import patch, MagicMock
 
 @pytest.fixture
@@ -30,3 +31,163 @@ def test_cli_retry(runner, tmp_path):
         assert "Retrying up to 10 pending items" in result.output
         assert "Retry complete" in result.output
         mock_engine.retry_failed.assert_called_once_with(limit=10)
+
+def test_cli_crawl_async_engine(runner, tmp_path):
+    db_path = tmp_path / "test_crawl_async.db"
+    with patch("src.cli.AsyncScraperEngine") as mock_engine_cls:
+        mock_engine = mock_engine_cls.return_value
+
+        result = runner.invoke(main, ["crawl", "--db", str(db_path), "--engine", "async", "--concurrency", "50"])
+
+        assert result.exit_code == 0
+        assert mock_engine_cls.call_args.kwargs["concurrency"] == 50
+        mock_engine.crawl.assert_called_once()
+
+def test_cli_reextract(runner, tmp_path):
+    db_path = tmp_path / "test_reextract.db"
+    archive_dir = tmp_path / "archive"
+    archive_dir.mkdir()
+    with patch("src.cli.Reextractor") as mock_reextractor_cls:
+        report = mock_reextractor_cls.return_value.run.return_value
+        report.changed = {"1": ["name"], "2": ["gender"]}
+        report.summary.return_value = "Re-extracted 2 archived pages"
+
+        result = runner.invoke(main, ["reextract", "--archive", str(archive_dir), "--db", str(db_path), "--show", "1", "--dry-run"])
+
+        assert result.exit_code == 0
+        assert "1: name" in result.output
+        assert "... and 1 more" in result.output
+        assert "Re-extracted 2 archived pages" in result.output
+        mock_reextractor_cls.return_value.run.assert_called_once_with(dry_run=True)
+
+def test_cli_refresh(runner, tmp_path):
+    db_path = tmp_path / "test_refresh.db"
+    with patch("src.cli.ScraperEngine") as mock_engine_cls:
+        mock_engine = mock_engine_cls.return_value
+
+        result = runner.invoke(main, ["refresh", "--db", str(db_path), "--budget", "25"])
+
+        assert result.exit_code == 0
+        assert "Refresh complete" in result.output
+        mock_engine.refresh.assert_called_once_with(budget=25)
+
+def test_cli_negative_cache(runner, tmp_path):
+    from src.database import DatabaseHelper
+    db_path = tmp_path / "test_negative.db"
+    db_helper = DatabaseHelper(str(db_path))
+    db_helper.add_negative("gone", "http://example.com/?i=gone", "not_found", 3600)
+    db_helper.add_negative("old", None, "empty", 3600, now=0)
+    db_helper.close()
+
+    result = runner.invoke(main, ["negative-cache", "list", "--db", str(db_path)])
+    assert result.exit_code == 0
+    assert "not_found: 1 active, 0 expired" in result.output
+    assert "empty: 0 active, 1 expired" in result.output
+    assert "gone not_found" in result.output
+
+    result = runner.invoke(main, ["negative-cache", "purge", "--db", str(db_path), "--expired"])
+    assert result.exit_code == 0
+    assert "Purged 1 entries" in result.output
+
+def test_cli_time_budget_and_sigterm(runner, tmp_path):
+    import os
+    import signal
+    db_path = tmp_path / "test_budget.db"
+    previous = signal.getsignal(signal.SIGTERM)
+    try:
+        with patch("src.cli.ScraperEngine") as mock_engine_cls:
+            mock_engine = mock_engine_cls.return_value
+            mock_engine.crawl.side_effect = lambda *args, **kwargs: os.kill(os.getpid(), signal.SIGTERM)
+
+            result = runner.invoke(main, ["crawl", "--db", str(db_path), "--time-budget", "120"])
+
+            assert result.exit_code == 0
+            mock_engine.set_time_budget.assert_called_once_with(120.0)
+            mock_engine.request_stop.assert_called_once()
+            assert "Crawl complete" in result.output
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+
+def test_cli_crawler_ctl(runner):
+    with patch("src.cli.send_command") as mock_send:
+        mock_send.return_value = {"ok": True, "added": 1}
+        result = runner.invoke(main, ["crawler-ctl", "--socket", "x.sock", "enqueue", "http://example.com/?i=1"])
+        assert result.exit_code == 0
+        assert "Queued 1 of 1 URLs" in result.output
+        mock_send.assert_called_once_with("x.sock", "enqueue", urls=["http://example.com/?i=1"])
+
+        mock_send.return_value = {"ok": False, "error": "Unknown command: x"}
+        result = runner.invoke(main, ["crawler-ctl", "pause"])
+        assert result.exit_code != 0
+        assert "Unknown command" in result.output
+
+def test_cli_scrape_from_stdin(runner, tmp_path):
+    db_path = tmp_path / "test_seeds.db"
+    with patch("src.cli.ScraperEngine") as mock_engine_cls:
+        mock_engine = mock_engine_cls.return_value
+        mock_engine.scrape_many.return_value = 2
+
+        result = runner.invoke(main, ["scrape", "--from-file", "-", "--db", str(db_path), "--workers", "4"],
+                               input="http://example.com/?i=1\nhttp://example.com/?i=1\n2\nbad\n")
+
+        assert result.exit_code == 0
+        seeds = mock_engine.scrape_many.call_args.args[0]
+        assert [person_id for person_id, _ in seeds] == ["1", "2"]
+        assert "2 of 2 people scraped" in result.output
+
+def test_cli_crawl_seeds_file(runner, tmp_path):
+    db_path = tmp_path / "test_seeds.db"
+    seeds_file = tmp_path / "seeds.txt"
+    seeds_file.write_text("http://example.com/?i=1\nhttp://example.com/?i=3\n")
+    with patch("src.cli.ScraperEngine") as mock_engine_cls:
+        mock_engine = mock_engine_cls.return_value
+
+        result = runner.invoke(main, ["crawl", "--seeds-file", str(seeds_file), "--db", str(db_path)])
+
+        assert result.exit_code == 0
+        mock_engine.crawl.assert_not_called()
+        assert len(mock_engine.crawl_seeds.call_args.args[0]) == 2
+
+def test_cli_crawl_in_memory_saves_the_database(runner, tmp_path):
+    from src.database import DatabaseHelper
+    db_path = tmp_path / "test_memory.db"
+    with patch("src.cli.ScraperEngine") as mock_engine_cls:
+        mock_engine_cls.return_value.crawl.side_effect = (
+            lambda *args, **kwargs: mock_engine_cls.call_args.args[0].add_individual({"id": "1", "name": "A"})
+        )
+        mock_engine_cls.return_value.archive = None
+
+        result = runner.invoke(main, ["crawl", "--db", str(db_path), "--db-mode", "memory"])
+
+        assert result.exit_code == 0
+        assert mock_engine_cls.call_args.args[0].in_memory
+    assert DatabaseHelper(str(db_path)).get_individual("1")["name"] == "A"
+
+    result = runner.invoke(main, ["crawl", "--db", str(db_path), "--db-mode", "memory", "--shared-limits"])
+    assert result.exit_code != 0
+    assert "--shared-limits" in result.output
+
+def test_cli_async_engine_rejects_thread_only_options(runner, tmp_path):
+    db_path = tmp_path / "test_async_options.db"
+    with patch("src.cli.DatabaseHelper") as mock_db_cls:
+        result = runner.invoke(main, ["crawl", "--db", str(db_path), "--engine", "async", "--stream", "--parse-workers", "2"])
+    assert result.exit_code != 0
+    assert "--parse-workers, --stream only apply to --engine threads" in result.output
+    # Rejected before the database (or its snapshot thread) is opened
+    mock_db_cls.assert_not_called()
+
+def test_cli_crawl_writes_queued_pages_when_interrupted(runner, tmp_path):
+    from src.database import DatabaseHelper
+    from src.engine import ScraperEngine
+    db_path = tmp_path / "test_interrupted.db"
+
+    def interrupted_crawl(self, url, limit=100, probe=None):
+        for person_id in ("1", "2"):
+            self._handle_page(f"http://example.com/?i={person_id}", person_id, person_page(person_id))
+        raise KeyboardInterrupt
+
+    with patch.object(ScraperEngine, "crawl", interrupted_crawl):
+        result = runner.invoke(main, ["crawl", "--db", str(db_path), "--delay", "0"])
+
+    assert result.exit_code != 0
+    assert sorted(DatabaseHelper(str(db_path)).get_all_ids()) == ["1", "2"]
@@ -0,0 +1,72 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from src.concurrency import AdaptiveConcurrency
+from src.engine import ScraperEngine
+from src.database import DatabaseHelper
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_concurrency.db"
+    return DatabaseHelper(str(db_path))
+
+def feed(controller, count, latency=0.5, outcome="ok"):
+    for _ in range(count):
+        controller.record(latency, outcome)
+
+def test_fixed_bounds_never_adjust():
+    controller = AdaptiveConcurrency(3, 3, window=5)
+    feed(controller, 20, outcome="throttled")
+    assert controller.limit == 3
+    assert not controller.adaptive
+    assert controller.decisions == []
+
+def test_additive_increase_on_healthy_windows():
+    controller = AdaptiveConcurrency(1, 4, window=5)
+    feed(controller, 25)
+    # One slot per healthy window, capped at the upper bound
+    assert controller.limit == 4
+    assert [new for _, new, _ in controller.decisions] == [2, 3, 4]
+
+def test_multiplicative_decrease_on_429():
+    controller = AdaptiveConcurrency(1, 16, window=5)
+    controller.limit = 8
+    feed(controller, 4)
+    controller.record(0.5, "throttled")
+    assert controller.limit == 4
+    assert "rate-limited" in controller.decisions[-1][2]
+
+def test_decrease_on_error_rate_respects_min():
+    controller = AdaptiveConcurrency(2, 8, window=4)
+    controller.limit = 3
+    feed(controller, 4, outcome="error")
+    assert controller.limit == 2
+
+def test_decrease_on_latency_spike():
+    controller = AdaptiveConcurrency(1, 8, window=5)
+    feed(controller, 5, latency=0.2)  # Sets the baseline, +1
+    feed(controller, 5, latency=0.2)  # +1
+    assert controller.limit == 3
+    feed(controller, 5, latency=1.0)
+    assert controller.limit == 1
+    assert "latency" in controller.decisions[-1][2]
+
+def test_engine_adapts_in_flight_requests(mock_db):
+    engine = ScraperEngine(mock_db, min_workers=1, max_workers=4, delay=0)
+    assert engine.concurrency.adaptive
+    assert engine.concurrency.limit == 1
+
+    engine.concurrency.window = 2
+    with patch("requests.Session.get") as mock_get:
+        mock_res = MagicMock()
+        mock_res.status_code = 200
+        mock_res.text = '<div class="person"><div class="info"><h2>Someone</h2></div></div>'
+        mock_get.return_value = mock_res
+        for i in range(4):
+            engine._scrape_one(f"http://example.com/?i=a{i}")
+
+    assert engine.concurrency.limit == 3
+
+def test_engine_without_min_workers_is_fixed(mock_db):
+    engine = ScraperEngine(mock_db, max_workers=3)
+    assert not engine.concurrency.adaptive
+    assert engine.concurrency.limit == 3
@@ -0,0 +1,54 @@
+import pytest
+from unittest.mock import patch
+from src.engine import ScraperEngine
+from src.database import DatabaseHelper
+from tests.helpers import make_response
+
+PAGE = '<div class="person male"><div class="info"><h2>Cached</h2></div></div><ul class="kids"><li><a href="?i=kid">Kid</a></li></ul>'
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_conditional.db"
+    return DatabaseHelper(str(db_path))
+
+def test_validators_are_saved_with_the_page(mock_db):
+    engine = ScraperEngine(mock_db, delay=0)
+    headers = {"ETag": '"v1"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+    with patch("requests.Session.get", return_value=make_response(200, PAGE, headers)):
+        engine._scrape_one("http://example.com/?i=c1")
+
+    assert mock_db.get_validators("c1") == {"etag": '"v1"', "last_modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+
+def test_validators_are_not_saved_for_unparsable_pages(mock_db):
+    engine = ScraperEngine(mock_db, delay=0)
+    with patch("requests.Session.get", return_value=make_response(200, "<html></html>", {"ETag": '"bad"'})):
+        engine._scrape_one("http://example.com/?i=c2")
+
+    assert mock_db.get_validators("c2") is None
+    assert engine._validators == {}
+
+def test_forced_refresh_revalidates_and_skips_unchanged(mock_db):
+    mock_db.add_discovered_url("c3", "http://example.com/?i=c3")
+    mock_db.set_validators("c3", '"v1"', "Wed, 01 Jan 2025 00:00:00 GMT")
+    engine = ScraperEngine(mock_db, delay=0)
+
+    with patch("requests.Session.get", return_value=make_response(304)) as mock_get, \
+         patch.object(mock_db, "store_person") as mock_add:
+        result = engine._scrape_one("http://example.com/?i=c3", force=True)
+
+    assert result is None
+    mock_add.assert_not_called()
+    assert mock_get.call_args.kwargs["headers"] == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT",
+    }
+    assert engine.unchanged_count == 1
+    row = mock_db.conn.execute("SELECT failure_count FROM discovered_urls WHERE id = 'c3'").fetchone()
+    assert row[0] == 0
+
+def test_unforced_scrape_sends_no_validators(mock_db):
+    mock_db.set_validators("c4", '"v1"', None)
+    engine = ScraperEngine(mock_db, delay=0)
+    with patch("requests.Session.get", return_value=make_response(200, PAGE)) as mock_get:
+        engine._scrape_one("http://example.com/?i=c4")
+    assert "headers" not in mock_get.call_args.kwargs
@@ -0,0 +1,124 @@
+import json
+import socket
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from src.daemon import CrawlerDaemon, send_command
+from src.engine import ScraperEngine
+from src.database import DatabaseHelper
+from tests.helpers import make_response, person_page
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_daemon.db"
+    return DatabaseHelper(str(db_path))
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+@pytest.fixture
+def running(mock_db, tmp_path):
+    engine = ScraperEngine(mock_db, delay=0)
+    daemon = CrawlerDaemon(engine, socket_path=str(tmp_path / "c.sock"), idle_interval=0.05)
+    with patch("requests.Session.get", side_effect=lambda url, timeout=None: make_response(200, person_page(f"P{url.split('i=')[1]}"))):
+        thread = threading.Thread(target=daemon.serve)
+        thread.start()
+        wait_for(lambda: send_command_ok(daemon.socket_path))
+        yield daemon
+        daemon.stop()
+        thread.join(timeout=5)
+    assert not thread.is_alive()
+
+def send_command_ok(socket_path):
+    try:
+        return send_command(socket_path, "stats")["ok"]
+    except OSError:
+        return False
+
+def test_enqueued_urls_are_crawled(running, mock_db):
+    reply = send_command(running.socket_path, "enqueue", urls=["http://example.com/?i=1", "http://example.com/?i=2"])
+    assert reply == {"ok": True, "added": 2}
+    wait_for(lambda: running.crawled == 2)
+    assert mock_db.get_individual("2")["name"] == "P2"
+
+    stats = send_command(running.socket_path, "stats")
+    assert stats["crawled"] == 2
+    assert stats["visited"] == 2
+    assert stats["paused"] is False
+    # Already visited people are not queued again
+    assert send_command(running.socket_path, "enqueue", url="http://example.com/?i=1")["added"] == 0
+
+def test_pause_resume_and_rate(running, mock_db):
+    assert send_command(running.socket_path, "pause")["ok"]
+    send_command(running.socket_path, "enqueue", url="http://example.com/?i=3")
+    time.sleep(0.2)
+    assert running.crawled == 0
+
+    assert send_command(running.socket_path, "rate", rate=4, burst=2) == {"ok": True, "rate": 4.0, "burst": 2}
+    assert running.engine.rate_limiter.rate == 4.0
+
+    send_command(running.socket_path, "resume")
+    wait_for(lambda: running.crawled == 1)
+
+def test_bad_requests_get_errors(running):
+    assert send_command(running.socket_path, "fly")["error"] == "Unknown command: fly"
+    assert send_command(running.socket_path, "enqueue", url="http://example.com/")["ok"] is False
+    assert send_command(running.socket_path, "rate")["ok"] is False
+
+def test_non_object_requests_get_errors(running):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(running.socket_path)
+        stream = sock.makefile("rwb")
+        for line in (b"[]\n", b'"stats"\n', b"1\n"):
+            stream.write(line)
+            stream.flush()
+            assert json.loads(stream.readline()) == {"ok": False, "error": "Request must be a JSON object"}
+
+def test_refuses_a_socket_in_use(running, mock_db):
+    other = CrawlerDaemon(ScraperEngine(mock_db, delay=0), socket_path=running.socket_path)
+    with pytest.raises(RuntimeError):
+        other.serve()
+
+def test_pause_resume_keeps_the_time_budget(running):
+    running.engine.set_time_budget(3600)
+    deadline = running.engine.budget.deadline
+
+    send_command(running.socket_path, "pause")
+    send_command(running.socket_path, "resume")
+
+    assert running.engine.budget.deadline == deadline
+    assert not running.engine.budget.stop_requested
+    send_command(running.socket_path, "enqueue", url="http://example.com/?i=4")
+    wait_for(lambda: running.crawled == 1)
+
+def test_spent_budget_stops_the_daemon_without_spinning(mock_db, tmp_path):
+    engine = ScraperEngine(mock_db, delay=0)
+    engine.set_time_budget(0)
+    engine._enqueue("5", "http://example.com/?i=5")
+    daemon = CrawlerDaemon(engine, socket_path=str(tmp_path / "c.sock"), idle_interval=0.05)
+
+    with patch.object(ScraperEngine, "_process_queue", wraps=engine._process_queue) as process:
+        daemon._work_loop()
+
+    assert process.call_count == 1
+    assert daemon.crawled == 0
+
+def test_batch_without_progress_waits(mock_db, tmp_path):
+    engine = ScraperEngine(mock_db, delay=0)
+    engine._enqueue("6", "http://example.com/?i=6")
+    daemon = CrawlerDaemon(engine, socket_path=str(tmp_path / "c.sock"), idle_interval=0.05)
+    engine.request_stop()
+
+    thread = threading.Thread(target=daemon._work_loop, daemon=True)
+    with patch.object(ScraperEngine, "_process_queue", return_value=0) as process:
+        thread.start()
+        time.sleep(0.3)
+        daemon._stopped.set()
+        daemon._wake.set()
+        thread.join(timeout=2)
+
+    assert process.call_count <= 10
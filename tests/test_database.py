@@ -1,6 +1,10 @@
 import pytest
 import os
-from src.database import DatabaseHelper
+import sqlite3
+import threading
+import time
+from src.database import DatabaseHelper, MIGRATIONS, _baseline_schema, _url_parts
+from src.gedcom_exporter import GedcomExporter
 
 
 @pytest.fixture
@@ -46,3 +50,158 @@ def test_add_relationship(db_helper):
     assert len(relationships) == 1
     assert relationships[0]["related_id"] == "p2"
     assert relationships[0]["type"] == "parent"
+
+
+def test_file_database_uses_wal(tmp_path):
+    db = DatabaseHelper(str(tmp_path / "wal.db"))
+    assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    db.close()
+    db = DatabaseHelper(str(tmp_path / "rollback.db"), wal=False)
+    assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    db.close()
+
+
+def test_readers_do_not_wait_for_an_open_write(tmp_path):
+    db = DatabaseHelper(str(tmp_path / "concurrent.db"))
+    db.add_individual({"id": "p1", "name": "Father"})
+    db.add_individual({"id": "p2", "name": "Son"})
+    db.add_relationship("p2", "p1", "father")
+    results = {}
+
+    def read():
+        results["person"] = db.get_individual("p1")
+        output = tmp_path / "tree.ged"
+        GedcomExporter(db).export(str(output))
+        results["export"] = output.read_text(encoding="utf-8")
+
+    # A crawl in the middle of a write transaction holds the writer lock
+    with db.lock:
+        db.conn.execute("BEGIN IMMEDIATE")
+        db.conn.execute("UPDATE individuals SET name = 'Changed' WHERE id = 'p1'")
+        reader = threading.Thread(target=read)
+        reader.start()
+        reader.join(timeout=10)
+        assert not reader.is_alive()
+        db.conn.rollback()
+
+    # Readers see the last committed state
+    assert results["person"]["name"] == "Father"
+    assert "Father" in results["export"] and "FAMC" in results["export"]
+    db.close()
+
+
+def test_reader_connections_are_read_only(tmp_path):
+    db = DatabaseHelper(str(tmp_path / "readonly.db"))
+    with db.reader() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO individuals (id) VALUES ('x')")
+    db.close()
+
+
+def test_in_memory_database_reads_from_the_writer():
+    db = DatabaseHelper(":memory:")
+    db.add_individual({"id": "p1", "name": "Father"})
+    assert db.get_individual("p1")["name"] == "Father"
+    assert db.get_all_ids() == ["p1"]
+    db.close()
+
+
+def test_unversioned_database_is_migrated_to_the_compact_schema(tmp_path):
+    db_path = str(tmp_path / "v1.db")
+    url = "https://baalhatanya.org.il/%D7%90/?i={}"
+    conn = sqlite3.connect(db_path)
+    _baseline_schema(conn.cursor())
+    conn.executemany("INSERT INTO individuals (id, name, url) VALUES (?, ?, ?)",
+                     [("9", "Skipped", None), ("123", "Father", url.format(123)), ("p7", "Named", "http://x/p7")])
+    conn.execute("DELETE FROM individuals WHERE id = '9'")
+    conn.executemany("INSERT INTO relationships VALUES (?, ?, ?)",
+                     [("123", "456", "child"), ("123", "p7", "cousin")])
+    conn.executemany("INSERT INTO discovered_urls (id, url, state, depth) VALUES (?, ?, ?, ?)",
+                     [("123", url.format(123), "done", 0), ("456", url.format(456), "queued", 1)])
+    conn.execute("INSERT INTO freshness (id, last_scraped_at, record_hash) VALUES ('123', 5.0, 'abc')")
+    conn.commit()
+    conn.close()
+
+    db = DatabaseHelper(db_path)
+    assert db.schema_version() == len(MIGRATIONS)
+    stored = db.conn.execute(
+        "SELECT rowid, typeof(id), url_template, url FROM individuals WHERE id = '123'"
+    ).fetchone()
+    assert tuple(stored) == (2, "integer", 1, None)
+    assert db.get_individual("123")["url"] == url.format(123)
+    assert db.get_individual("p7")["url"] == "http://x/p7"
+    assert {(rel["related_id"], rel["type"]) for rel in db.get_relationships("123")} == {("456", "child"), ("p7", "cousin")}
+    assert db.get_pending_urls() == [{"id": "456", "url": url.format(456)}]
+    assert db.claim_frontier(5, 3, "me", 60) == [("456", url.format(456))]
+    assert db.get_freshness("123")["record_hash"] == "abc"
+    assert db.get_max_id() == 123
+    db.close()
+
+    # Opening it again applies nothing
+    db = DatabaseHelper(db_path)
+    assert db.conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == len(MIGRATIONS)
+    db.close()
+
+
+def test_zero_padded_ids_resolve_to_their_migrated_row(tmp_path):
+    from src.engine import ScraperEngine
+    db_path = str(tmp_path / "v1_padded.db")
+    conn = sqlite3.connect(db_path)
+    _baseline_schema(conn.cursor())
+    conn.execute("INSERT INTO individuals (id, name, url) VALUES ('0101', 'Padded', 'http://x/?i=0101')")
+    conn.execute("INSERT INTO discovered_urls (id, url, state) VALUES ('0101', 'http://x/?i=0101', 'done')")
+    conn.commit()
+    conn.close()
+
+    db = DatabaseHelper(db_path)
+    assert db.get_individual("101")["url"] == "http://x/?i=0101"
+    engine = ScraperEngine(db, delay=0)
+    person_id = engine._person_id_from_url("http://x/?i=0101")
+    assert person_id == "101"
+    assert person_id in engine.visited_ids
+    assert db.get_existing_ids([person_id]) == {"101"}
+    engine.close()
+    db.close()
+
+
+def test_only_urls_that_expand_back_exactly_become_templates():
+    assert _url_parts("123", "http://x/?i=123") == ("http://x/?i={id}", None)
+    assert _url_parts("123", "http://x/?a=1&i=123#top") == ("http://x/?a=1&i={id}#top", None)
+    assert _url_parts("0123", "http://x/?i=0123") == (None, "http://x/?i=0123")
+    assert _url_parts("p1", "http://x/?i=p1") == (None, "http://x/?i=p1")
+    assert _url_parts("12", "http://x/?i=123") == (None, "http://x/?i=123")
+    assert _url_parts("12", "http://x/?i=12&i=12") == (None, "http://x/?i=12&i=12")
+    assert _url_parts("12", None) == (None, None)
+
+
+def test_memory_mode_works_on_a_copy_and_snapshots_it(tmp_path):
+    db_path = str(tmp_path / "memory.db")
+    disk = DatabaseHelper(db_path)
+    disk.add_individual({"id": "1", "name": "Stored"})
+    disk.close()
+
+    db = DatabaseHelper(db_path, memory=True, snapshot_interval=None)
+    assert db.in_memory and db.get_individual("1")["name"] == "Stored"
+    db.add_individual({"id": "2", "name": "New"})
+    on_disk = sqlite3.connect(db_path)
+    assert on_disk.execute("SELECT COUNT(*) FROM individuals").fetchone()[0] == 1
+
+    assert db.snapshot()
+    assert not db.snapshot()
+    assert on_disk.execute("SELECT COUNT(*) FROM individuals").fetchone()[0] == 2
+    db.add_individual({"id": "3", "name": "Last"})
+    db.close()
+    assert on_disk.execute("SELECT COUNT(*) FROM individuals").fetchone()[0] == 3
+    on_disk.close()
+
+
+def test_memory_mode_snapshots_periodically(tmp_path):
+    db_path = str(tmp_path / "periodic.db")
+    db = DatabaseHelper(db_path, memory=True, snapshot_interval=0.05)
+    db.add_individual({"id": "1", "name": "Someone"})
+    deadline = time.monotonic() + 5
+    while not db.snapshots and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert DatabaseHelper(db_path).get_individual("1")["name"] == "Someone"
+    db.close()
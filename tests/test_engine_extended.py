@@ -39,33 +39,23 @@ def test_crawl_resume_already_visited(mock_db):
         "death_place": None, "gender": "M", "url": "http://example.com/?i=111815"
     })
 
+    # Its neighbour was left on the frontier by the previous run
+    mock_db.add_discovered_url("111816", "http://example.com/?i=111816")
+
     engine = ScraperEngine(mock_db, delay=0)
 
     with patch("requests.Session.get") as mock_get:
-        # Mock response for p1 that contains a neighbor p2
-        mock_res = MagicMock()
-        mock_res.status_code = 200
-        mock_res.text = """
-        <html><body>
-        <div class="person male">
-            <div class="info"><h2>Root</h2></div>
-            <div class="kids"><ul><li><a href="?i=111816">Child</a></li></ul></div>
-        </div>
-        </body></html>
-        """
-
-        # Also need a response for the neighbor p2 when the queue starts processing
+        # Response for the neighbour p2 when the queue starts processing
         mock_res2 = MagicMock()
         mock_res2.status_code = 200
         mock_res2.text = '<div class="person"><div class="info"><h2>Child</h2></div></div>'
+        mock_get.return_value = mock_res2
 
-        # 1. _scrape_one(start_url)
-        # 2. crawl's else branch: self.session.get(start_url)
-        # 3. _process_queue -> _scrape_one(neighbor_url)
-        mock_get.side_effect = [mock_res, mock_res, mock_res2]
-
-        engine.crawl("http://example.com/?i=111815", limit=2)
+        engine.crawl("http://example.com/?i=111815", limit=1)
 
+        # The start page is not fetched again
+        assert mock_get.call_count == 1
+        assert "i=111816" in mock_get.call_args[0][0]
         # Should have explored p2
         assert "111816" in engine.visited_ids
         assert mock_db.get_individual("111816") is not None
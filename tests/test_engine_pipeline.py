@@ -0,0 +1,127 @@
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from src.engine import ScraperEngine
+from src.database import DatabaseHelper
+from tests.helpers import make_response, person_page
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_pipeline.db"
+    return DatabaseHelper(str(db_path))
+
+def fake_site(pages):
+    def fake_get(url, timeout=None):
+        person_id = url.split("i=")[1]
+        name, kids = pages[person_id]
+        return make_response(200, person_page(name, kids))
+    return fake_get
+
+SITE = {
+    "r": ("Root", ["a", "b", "c"]),
+    "a": ("A", ["a1"]),
+    "b": ("B", []),
+    "c": ("C", []),
+    "a1": ("A1", []),
+}
+
+def test_pipeline_with_process_pool_parsers(mock_db):
+    engine = ScraperEngine(mock_db, delay=0, max_workers=3, parse_workers=2)
+    engine._enqueue("r", "http://example.com/?i=r")
+
+    with patch("requests.Session.get", side_effect=fake_site(SITE)):
+        count = engine._process_queue(limit=100)
+
+    assert count == 5
+    assert set(mock_db.get_all_ids()) == set(SITE)
+    assert {r["related_id"] for r in mock_db.get_relationships("r")} == {"a", "b", "c"}
+
+def test_persistence_happens_on_writer_thread(mock_db):
+    writer_threads = set()
+    original = mock_db.write_batch
+
+    def recording_write_batch(items):
+        writer_threads.add(threading.current_thread().name)
+        return original(items)
+
+    mock_db.write_batch = recording_write_batch
+    engine = ScraperEngine(mock_db, delay=0, max_workers=3)
+    engine._enqueue("r", "http://example.com/?i=r")
+
+    with patch("requests.Session.get", side_effect=fake_site(SITE)):
+        engine._process_queue(limit=100)
+
+    # Fetch threads never touch the database; the page writer does
+    assert writer_threads == {"page-writer"}
+    assert set(mock_db.get_all_ids()) == set(SITE)
+
+def test_coordinator_does_not_poll(mock_db):
+    engine = ScraperEngine(mock_db, delay=0, max_workers=2)
+    engine._enqueue("r", "http://example.com/?i=r")
+
+    with patch("requests.Session.get", side_effect=fake_site(SITE)), \
+         patch("src.engine.time.sleep") as mock_sleep:
+        count = engine._process_queue(limit=100)
+
+    assert count == 5
+    mock_sleep.assert_not_called()
+
+def test_limit_counts_pages_in_every_stage(mock_db):
+    engine = ScraperEngine(mock_db, delay=0, max_workers=3, parse_workers=1)
+    engine._enqueue("r", "http://example.com/?i=r")
+
+    with patch("requests.Session.get", side_effect=fake_site(SITE)) as mock_get:
+        count = engine._process_queue(limit=2)
+
+    assert count == 2
+    assert mock_get.call_count == 2
+
+def test_stage_depths_reported(mock_db):
+    engine = ScraperEngine(mock_db, delay=0)
+    engine._enqueue("r", "http://example.com/?i=r")
+    depths = engine.stage_depths()
+    assert depths == {"frontier": 1, "retrying": 0, "fetching": 0, "parse_backlog": 0, "parsing": 0,
+                      "writing": 0}
+
+def streaming_response(html):
+    response = MagicMock()
+    response.status_code = 200
+    response.headers = {"Content-Type": "text/html; charset=UTF-8"}
+    body = html.encode("utf-8")
+    response.iter_content.return_value = (body[i:i + 64] for i in range(0, len(body), 64))
+    return response
+
+def test_stream_mode_parses_on_fetch_threads(mock_db):
+    responses = {
+        "r": streaming_response('<div class="person male"><div class="info"><h2>Root</h2></div></div><ul class="kids"><li><a href="?i=k">K</a></li></ul>'),
+        "k": streaming_response('<div class="person female"><div class="info"><h2>Kid</h2></div></div><ul class="kids"></ul>'),
+    }
+    seen_kwargs = []
+
+    def fake_get(url, **kwargs):
+        seen_kwargs.append(kwargs)
+        return responses[url.split("i=")[1]]
+
+    engine = ScraperEngine(mock_db, delay=0, stream=True)
+    engine._enqueue("r", "http://example.com/?i=r")
+
+    with patch("requests.Session.get", side_effect=fake_get):
+        count = engine._process_queue(limit=10)
+
+    assert count == 2
+    assert all(kwargs.get("stream") for kwargs in seen_kwargs)
+    assert mock_db.get_individual("k")["gender"] == "F"
+    for response in responses.values():
+        response.close.assert_called_once()
+
+def test_stream_mode_rejects_oversized_pages(mock_db):
+    mock_db.add_discovered_url("big", "http://example.com/?i=big")
+    response = streaming_response("<html>" + "x" * 1000)
+    engine = ScraperEngine(mock_db, delay=0, stream=True, max_body_bytes=100)
+
+    with patch("requests.Session.get", return_value=response):
+        result = engine._scrape_one("http://example.com/?i=big")
+
+    assert result is None
+    row = mock_db.conn.execute("SELECT failure_count FROM discovered_urls WHERE id = 'big'").fetchone()
+    assert row[0] == 1
@@ -79,6 +79,7 @@ def test_crawl_skips_visited(mock_db):
     })
 
     with patch("src.engine.ScraperEngine._scrape_one") as mock_scrape, \
+         patch("src.engine.ScraperEngine._fetch_page", return_value=None) as mock_fetch, \
          patch("requests.Session.get") as mock_get:
 
         # Mock resume response for relationships
@@ -97,6 +98,9 @@ def test_crawl_skips_visited(mock_db):
         for call_args in mock_scrape.call_args_list:
             args, kwargs = call_args
             assert "i=visited1" not in args[0]
+        for call_args in mock_fetch.call_args_list:
+            args, kwargs = call_args
+            assert "i=visited1" not in args[0]
 
-        # But session.get might be called in the resume logic
-        assert mock_get.call_count == 1
+        # Resuming uses the stored frontier instead of re-fetching the start page
+        assert mock_get.call_count == 0
@@ -0,0 +1,128 @@
+import pytest
+from unittest.mock import patch
+from src.freshness import (content_hash, change_rate, staleness, record_hash, relationships_hash,
+                           PRIOR_CHANGES, PRIOR_DAYS)
+from src.engine import ScraperEngine
+from src.database import DatabaseHelper
+from tests.helpers import make_response, person_page
+
+DAY = 86400.0
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_freshness.db"
+    return DatabaseHelper(str(db_path))
+
+def test_content_hash_ignores_empty_fields_and_link_order():
+    rels = [{"related_id": "a", "type": "child"}, {"related_id": "b", "type": "father"}]
+    assert content_hash({"id": "1", "name": "X", "prefix": None}, rels) == \
+        content_hash({"id": "1", "name": "X"}, list(reversed(rels)))
+    assert content_hash({"id": "1", "name": "X"}, rels) != content_hash({"id": "1", "name": "Y"}, rels)
+
+def test_change_rate_starts_at_prior_and_learns():
+    assert change_rate(0, 0) == pytest.approx(PRIOR_CHANGES / PRIOR_DAYS)
+    assert change_rate(10, 30 * DAY) > change_rate(0, 30 * DAY)
+    assert staleness(0.1, 0) == 0
+    assert staleness(1.0, 30 * DAY) > staleness(0.01, 30 * DAY)
+
+def test_record_check_tracks_changes(mock_db):
+    assert mock_db.record_check("1", "h1", now=0) is False
+    assert mock_db.record_check("1", "h1", now=10 * DAY) is False
+    assert mock_db.record_check("1", None, now=20 * DAY) is False  # 304
+    assert mock_db.record_check("1", "h2", now=30 * DAY) is True
+
+    row = mock_db.get_freshness("1")
+    assert row["checks"] == 3
+    assert row["changes"] == 1
+    assert row["content_hash"] == "h2"
+    assert row["last_scraped_at"] == 30 * DAY
+    assert row["change_rate"] == pytest.approx(change_rate(1, 30 * DAY))
+
+def test_stale_individuals_prefer_unchecked_then_volatile(mock_db):
+    for person_id in ("static", "volatile", "legacy"):
+        mock_db.add_individual({"id": person_id, "name": person_id, "url": f"http://example.com/?i={person_id}"})
+    mock_db.record_check("static", "a", now=0)
+    mock_db.record_check("volatile", "a", now=0)
+    for day in range(1, 5):
+        mock_db.record_check("volatile", f"v{day}", now=day * DAY)
+        mock_db.record_check("static", "a", now=day * DAY)
+
+    stale = mock_db.get_stale_individuals(3, now=10 * DAY)
+
+    assert [item["id"] for item in stale] == ["legacy", "volatile", "static"]
+    assert stale[0]["staleness"] == 1.0
+    assert stale[1]["staleness"] > stale[2]["staleness"]
+    assert [item["id"] for item in mock_db.get_stale_individuals(1, now=10 * DAY)] == ["legacy"]
+
+def test_refresh_revalidates_within_budget(mock_db):
+    engine = ScraperEngine(mock_db, delay=0)
+    with patch("requests.Session.get", side_effect=[
+        make_response(200, person_page("One", kids=["k1"]), {"ETag": '"one"'}),
+        make_response(200, person_page("Two", kids=["k1"])),
+    ]):
+        engine._scrape_one("http://example.com/?i=one")
+        engine._scrape_one("http://example.com/?i=two")
+
+    engine = ScraperEngine(mock_db, delay=0)
+    requested = []
+
+    def fake_get(url, **kwargs):
+        requested.append((url, kwargs.get("headers")))
+        if url.endswith("i=one"):
+            return make_response(304)
+        return make_response(200, person_page("Two renamed", kids=["k2"]))
+
+    with patch("requests.Session.get", side_effect=fake_get):
+        count = engine.refresh(budget=2)
+
+    assert count == 1
+    assert engine.unchanged_count == 1
+    assert engine.changed_count == 1
+    assert ("http://example.com/?i=one", {"If-None-Match": '"one"'}) in requested
+    # Relatives found while refreshing are stored as pending but not crawled
+    assert len(requested) == 2
+    assert mock_db.get_individual("two")["name"] == "Two renamed"
+    assert any(p["id"] == "k2" for p in mock_db.get_pending_urls())
+    assert mock_db.get_freshness("one")["checks"] == 1
+    assert engine.refreshing == set()
+
+def test_refresh_with_empty_database(mock_db):
+    engine = ScraperEngine(mock_db, delay=0)
+    assert engine.refresh(budget=5) == 0
+
+def store(db, data, rels):
+    db.record_check(data["id"], content_hash(data, rels))
+    return db.store_person(data, rels, record_hash(data), relationships_hash(rels))
+
+def test_store_person_skips_unchanged_and_updates_differences(mock_db):
+    data = {"id": "1", "name": "Old", "gender": "M", "url": "u"}
+    rels = [{"person_id": "1", "related_id": "a", "type": "child"},
+            {"person_id": "1", "related_id": "b", "type": "child"}]
+    assert store(mock_db, data, rels) == (True, True)
+
+    before = mock_db.conn.total_changes
+    assert mock_db.store_person(data, list(reversed(rels)), record_hash(data), relationships_hash(rels)) == (False, False)
+    assert mock_db.conn.total_changes == before
+
+    changed = dict(data, name="New")
+    assert store(mock_db, changed, rels[:1]) == (True, True)
+    assert mock_db.get_individual("1")["name"] == "New"
+    assert {r["related_id"] for r in mock_db.get_relationships("1")} == {"a"}
+
+def test_direct_writes_invalidate_stored_hashes(mock_db):
+    data = {"id": "1", "name": "Same"}
+    store(mock_db, data, [])
+    mock_db.add_individual({"id": "1", "name": "Edited"})
+    assert mock_db.store_person(data, [], record_hash(data), relationships_hash([])) == (True, False)
+    assert mock_db.get_individual("1")["name"] == "Same"
+
+def test_unchanged_refresh_only_records_the_check(mock_db):
+    engine = ScraperEngine(mock_db, delay=0)
+    with patch("requests.Session.get", return_value=make_response(200, person_page("Same", kids=["k1"]))):
+        engine._scrape_one("http://example.com/?i=same")
+        before = mock_db.conn.total_changes
+        engine._scrape_one("http://example.com/?i=same", force=True)
+
+    # Only the freshness row is touched
+    assert mock_db.conn.total_changes - before == 1
+    assert engine.skipped_writes == 1
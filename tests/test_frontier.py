@@ -0,0 +1,201 @@
+import sqlite3
+import threading
+import pytest
+from queue import Empty
+from unittest.mock import MagicMock, patch
+from src.frontier import Frontier
+from src.engine import ScraperEngine
+from src.database import DatabaseHelper
+from tests.helpers import make_response, person_page
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_frontier.db"
+    return DatabaseHelper(str(db_path))
+
+def rel(person_id, related_id, rel_type="child"):
+    return {"person_id": person_id, "related_id": related_id, "type": rel_type, "url": f"http://example.com/?i={related_id}"}
+
+def state_of(db, person_id):
+    return db.conn.execute("SELECT state FROM discovered_urls WHERE id = ?", (person_id,)).fetchone()[0]
+
+def drain(frontier):
+    items = []
+    while True:
+        try:
+            items.append(frontier.get_nowait()[0])
+        except Empty:
+            return items
+
+def test_closest_and_most_linked_first(mock_db):
+    frontier = Frontier(mock_db, max_failures=3)
+    frontier.put_relationships([rel("seed", "a"), rel("seed", "b")])
+    frontier.put_relationships([rel("a", "far")])
+    frontier.put_relationships([rel("x", "b")])  # b is now linked twice
+
+    assert drain(frontier) == ["b", "a", "far"]
+
+def test_shortest_depth_wins(mock_db):
+    frontier = Frontier(mock_db, max_failures=3)
+    frontier.put_relationships([rel("seed", "a")])
+    frontier.put_relationships([rel("a", "b")])
+    frontier.put_relationships([rel("seed", "b")])
+    depth = mock_db.conn.execute("SELECT depth FROM discovered_urls WHERE id = 'b'").fetchone()[0]
+    assert depth == 1
+
+def test_buffer_is_bounded_and_claims_in_flight(mock_db):
+    frontier = Frontier(mock_db, max_failures=3, buffer_size=2)
+    frontier.put_relationships([rel("seed", str(i)) for i in range(5)])
+
+    assert frontier.get_nowait()[0] == "0"
+    states = [state_of(mock_db, str(i)) for i in range(5)]
+    assert states == ["in_flight", "in_flight", "queued", "queued", "queued"]
+    assert frontier.qsize() == 4
+
+def test_release_returns_unfinished_urls(mock_db):
+    frontier = Frontier(mock_db, max_failures=3, buffer_size=3)
+    frontier.put_relationships([rel("seed", "a"), rel("seed", "b"), rel("seed", "c")])
+    a = frontier.get_nowait()[0]
+    b = frontier.get_nowait()[0]
+    frontier.mark_done(a)
+    frontier.release(keep=[b])
+
+    assert [state_of(mock_db, pid) for pid in "abc"] == ["done", "in_flight", "queued"]
+
+def test_workers_never_share_a_lease(mock_db):
+    mock_db.enqueue_relationships([rel("seed", str(i)) for i in range(6)])
+    first = Frontier(mock_db, max_failures=3, buffer_size=4)
+    second = Frontier(mock_db, max_failures=3, buffer_size=4)
+
+    assert first.get_nowait()[0] == "0"  # Leases a batch of four
+    assert drain(second) == ["4", "5"]
+    assert drain(first) == ["1", "2", "3"]
+
+def test_expired_leases_are_reclaimed(mock_db):
+    mock_db.enqueue_relationships([rel("seed", "a"), rel("seed", "b")])
+    dead = Frontier(mock_db, max_failures=3, lease_seconds=60)
+    assert drain(dead) == ["a", "b"]
+    survivor = Frontier(mock_db, max_failures=3)
+    assert drain(survivor) == []
+
+    with patch("src.database.time.time", return_value=mock_db.conn.execute(
+            "SELECT MAX(lease_expires) FROM discovered_urls").fetchone()[0] + 1):
+        assert drain(survivor) == ["a", "b"]
+    owners = {row[0] for row in mock_db.conn.execute("SELECT lease_owner FROM discovered_urls")}
+    assert owners == {survivor.owner}
+
+    # The dead worker cannot push URLs it no longer owns back to the queue
+    dead.release()
+    assert state_of(mock_db, "a") == "in_flight"
+
+def test_leases_are_renewed(mock_db):
+    mock_db.enqueue_relationships([rel("seed", "a"), rel("seed", "b")])
+    frontier = Frontier(mock_db, max_failures=3, lease_seconds=30)
+    frontier.get_nowait()
+    before = mock_db.conn.execute("SELECT lease_expires FROM discovered_urls WHERE id = 'b'").fetchone()[0]
+    frontier._renewed_at -= 20
+    frontier.get_nowait()
+    after = mock_db.conn.execute("SELECT lease_expires FROM discovered_urls WHERE id = 'b'").fetchone()[0]
+    assert after > before
+
+def test_failed_urls_wait_for_requeue(mock_db):
+    frontier = Frontier(mock_db, max_failures=3)
+    frontier.put_relationships([rel("seed", "a")])
+    frontier.get_nowait()
+    mock_db.increment_failure_count("a")
+    frontier.mark_failed("a")
+
+    assert drain(frontier) == []
+    assert frontier.requeue_failed() == 1
+    assert drain(frontier) == ["a"]
+
+def test_put_ignores_claimed_and_transient(mock_db):
+    frontier = Frontier(mock_db, max_failures=3)
+    assert frontier.put("a", "http://example.com/?i=a")
+    assert not frontier.put("a", "http://example.com/?i=a")
+    assert frontier.put_transient("probe", "http://example.com/?i=probe")
+    assert not frontier.put_transient("probe", "http://example.com/?i=probe")
+    assert frontier.get_nowait(durable=False) == ("probe", "http://example.com/?i=probe")
+    with pytest.raises(Empty):
+        frontier.get_nowait(durable=False)
+    # Probes are never written to the database
+    assert mock_db.conn.execute("SELECT COUNT(*) FROM discovered_urls WHERE id = 'probe'").fetchone()[0] == 0
+
+def test_legacy_database_is_migrated(tmp_path):
+    db_path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE individuals (id TEXT PRIMARY KEY, name TEXT, url TEXT)")
+    conn.execute("CREATE TABLE discovered_urls (id TEXT PRIMARY KEY, url TEXT, failure_count INTEGER DEFAULT 0)")
+    conn.execute("CREATE TABLE relationships (person_id TEXT, related_id TEXT, type TEXT, PRIMARY KEY (person_id, related_id, type))")
+    conn.execute("INSERT INTO individuals (id, name) VALUES ('done1', 'Done')")
+    conn.executemany("INSERT INTO discovered_urls (id, url) VALUES (?, ?)", [("done1", "u1"), ("lonely", "u2"), ("popular", "u3")])
+    conn.executemany("INSERT INTO relationships VALUES (?, ?, 'child')", [("done1", "popular"), ("x", "popular")])
+    conn.commit()
+    conn.close()
+
+    db = DatabaseHelper(db_path)
+    assert state_of(db, "done1") == "done"
+    assert drain(Frontier(db, max_failures=3)) == ["popular", "lonely"]
+
+def test_crawl_leaves_unvisited_relatives_on_disk(mock_db):
+    engine = ScraperEngine(mock_db, delay=0)
+    with patch("requests.Session.get") as mock_get:
+        mock_res = MagicMock()
+        mock_res.status_code = 200
+        mock_res.text = '<div class="person male"><div class="info"><h2>Root</h2></div></div><ul class="kids"><li><a href="?i=k1">1</a></li><li><a href="?i=k2">2</a></li></ul>'
+        mock_get.return_value = mock_res
+        engine.crawl("http://example.com/?i=root", limit=1)
+
+    rows = mock_db.conn.execute("SELECT id, state, depth FROM discovered_urls ORDER BY id").fetchall()
+    assert [tuple(row) for row in rows] == [("k1", "queued", 1), ("k2", "queued", 1)]
+
+def test_engines_sharing_a_database_split_the_work(tmp_path):
+    db_path = str(tmp_path / "shared_frontier.db")
+    DatabaseHelper(db_path).enqueue_relationships([rel("seed", f"p{i}") for i in range(20)])
+    fetched = []
+
+    def fake_get(url, **kwargs):
+        fetched.append(url)
+        response = MagicMock()
+        response.status_code = 200
+        response.text = '<div class="person"><div class="info"><h2>Someone</h2></div></div>'
+        return response
+
+    engines = [ScraperEngine(DatabaseHelper(db_path), delay=0, max_workers=2) for _ in range(2)]
+    for engine in engines:
+        engine.frontier.buffer_size = 3
+    with patch("requests.Session.get", side_effect=fake_get):
+        threads = [threading.Thread(target=engine._process_queue, kwargs={"limit": 100}) for engine in engines]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(fetched) == 20
+    assert len(set(fetched)) == 20
+    assert len(DatabaseHelper(db_path).get_all_ids()) == 20
+
+def test_close_returns_parked_retries_to_the_queue(mock_db):
+    mock_db.enqueue_relationships([rel("seed", "a"), rel("seed", "b")])
+    engine = ScraperEngine(mock_db, delay=0, max_workers=1)
+
+    def fake_get(url, **kwargs):
+        return make_response(503 if url.endswith("=a") else 200, person_page("Someone"))
+
+    with patch("requests.Session.get", side_effect=fake_get), \
+         patch("src.engine.time.sleep"), patch("src.rate_limiter.time.sleep"):
+        assert engine._process_queue(limit=1) == 1
+    assert len(engine.retries) == 1
+    assert state_of(mock_db, "a") == "in_flight"
+
+    engine.close()
+    assert state_of(mock_db, "a") == "queued"
+    assert len(engine.retries) == 0
+
+def test_stored_relatives_are_not_queued(mock_db):
+    mock_db.add_individual({"id": "root", "name": "Root"})
+    frontier = Frontier(mock_db, max_failures=3)
+
+    assert frontier.put_relationships([rel("k1", "root", "father"), rel("k1", "k2", "sibling")]) == 1
+    ids = [row[0] for row in mock_db.conn.execute("SELECT id FROM discovered_urls")]
+    assert ids == ["k2"]
@@ -0,0 +1,66 @@
+import pytest
+from unittest.mock import patch
+from src.idset import IdSet, MAX_BITMAP_ID
+from src.engine import ScraperEngine
+from src.database import DatabaseHelper
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_idset.db"
+    return DatabaseHelper(str(db_path))
+
+def test_idset_behaves_like_a_set_of_strings():
+    ids = IdSet(["3", "111815", "r", "007"])
+    ids.add("3")
+    ids.add(str(MAX_BITMAP_ID + 1))
+    assert len(ids) == 5
+    assert "111815" in ids and "r" in ids and "007" in ids
+    assert "7" not in ids and "4" not in ids
+    assert {"3", "r"} <= ids
+    ids.discard("3")
+    ids.discard("3")
+    assert "3" not in ids
+    assert set(ids) == {"111815", "r", "007", str(MAX_BITMAP_ID + 1)}
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "ids.snapshot")
+    ids = IdSet(str(i) for i in range(0, 200000, 3))
+    ids.add("x-1")
+    ids.save(path, (42, len(ids)))
+
+    loaded, watermark = IdSet.load(path)
+    assert watermark == (42, len(ids))
+    assert set(loaded) == set(ids)
+    # Two hundred thousand IDs fit in about 25 KB
+    assert len(loaded._bits) < 40000
+
+def test_unreadable_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "ids.snapshot"
+    assert IdSet.load(str(path)) is None
+    path.write_bytes(b"garbage")
+    assert IdSet.load(str(path)) is None
+
+def test_engine_warm_starts_from_snapshot(mock_db):
+    for i in range(1, 4):
+        mock_db.add_individual({"id": str(i), "name": f"P{i}"})
+    ScraperEngine(mock_db, delay=0).save_visited()
+    mock_db.add_individual({"id": "4", "name": "P4"})
+
+    with patch.object(mock_db, "get_ids_since", wraps=mock_db.get_ids_since) as since:
+        engine = ScraperEngine(mock_db, delay=0)
+
+    # Only the people added after the snapshot are read
+    assert since.call_args_list[0].args[0] > 0
+    assert len(since.call_args_list) == 1
+    assert set(engine.visited_ids) == {"1", "2", "3", "4"}
+
+def test_stale_snapshot_is_rebuilt(mock_db):
+    mock_db.add_individual({"id": "1", "name": "P1"})
+    mock_db.add_individual({"id": "2", "name": "P2"})
+    ScraperEngine(mock_db, delay=0).save_visited()
+    mock_db.conn.execute("DELETE FROM individuals WHERE id = '2'")
+    mock_db.conn.commit()
+
+    engine = ScraperEngine(mock_db, delay=0)
+
+    assert set(engine.visited_ids) == {"1"}
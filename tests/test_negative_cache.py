@@ -0,0 +1,91 @@
+import pytest
+from unittest.mock import patch
+from src.negative_cache import NegativeCache, NEGATIVE_TTLS
+from src.engine import ScraperEngine
+from src.database import DatabaseHelper
+from tests.helpers import make_response, person_page
+
+DAY = 86400.0
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_negative_cache.db"
+    return DatabaseHelper(str(db_path))
+
+def test_entries_expire_per_class(mock_db):
+    mock_db.add_negative("gone", "u1", "not_found", NEGATIVE_TTLS["not_found"], now=0)
+    mock_db.add_negative("flaky", "u2", "server_error", NEGATIVE_TTLS["server_error"], now=0)
+    assert set(mock_db.get_negative_ids(now=2 * DAY)) == {"gone"}
+    assert mock_db.count_negative(now=2 * DAY) == {"not_found": (1, 0), "server_error": (0, 1)}
+
+    mock_db.add_negative("gone", None, "not_found", NEGATIVE_TTLS["not_found"], now=DAY)
+    entry = mock_db.get_negative_entries(failure_class="not_found")[0]
+    assert entry["hits"] == 2
+    assert entry["url"] == "u1"
+
+    assert mock_db.purge_negative(expired_only=True, now=2 * DAY) == 1
+    assert mock_db.purge_negative(person_id="gone") == 1
+    assert mock_db.get_negative_entries() == []
+
+def test_unknown_class_is_rejected(mock_db):
+    with pytest.raises(ValueError):
+        NegativeCache(mock_db).record("1", "u", "teapot")
+
+def test_404_is_skipped_in_the_next_run(mock_db):
+    url = "http://example.com/?i=gone"
+    engine = ScraperEngine(mock_db, delay=0)
+    with patch("requests.Session.get", return_value=make_response(404)) as mock_get:
+        assert engine._scrape_one(url) is None
+    assert mock_get.call_count == 1
+    assert mock_db.get_negative_entries()[0]["failure_class"] == "not_found"
+
+    engine = ScraperEngine(mock_db, delay=0)
+    with patch("requests.Session.get") as mock_get:
+        assert engine._scrape_one(url) is None
+    mock_get.assert_not_called()
+    assert engine.negative_cache.skipped == 1
+
+def test_frontier_skips_cached_ids(mock_db):
+    mock_db.add_discovered_url("gone", "http://example.com/?i=gone")
+    mock_db.add_discovered_url("ok", "http://example.com/?i=ok")
+    mock_db.add_negative("gone", None, "not_found", NEGATIVE_TTLS["not_found"])
+    engine = ScraperEngine(mock_db, delay=0, max_workers=1)
+
+    with patch("requests.Session.get", return_value=make_response(200, person_page("Ok"))) as mock_get:
+        count = engine._process_queue(limit=10)
+
+    assert count == 1
+    assert [c.args[0] for c in mock_get.call_args_list] == ["http://example.com/?i=ok"]
+
+def test_probe_skips_cached_ids(mock_db):
+    mock_db.add_individual({"id": "10", "name": "Max"})
+    mock_db.add_negative("11", None, "not_found", NEGATIVE_TTLS["not_found"])
+    engine = ScraperEngine(mock_db, delay=0)
+
+    assert engine._probe_new_ids("http://example.com/?i=10", limit=2, lookahead=3) == 2
+    probed = [engine.frontier.get_nowait(durable=False)[0] for _ in range(2)]
+    assert probed == ["12", "13"]
+
+def test_unparsable_and_server_errors_are_classified(mock_db):
+    engine = ScraperEngine(mock_db, delay=0, max_workers=1)
+    engine._enqueue("blank", "http://example.com/?i=blank")
+    engine._enqueue("down", "http://example.com/?i=down")
+    responses = {"blank": make_response(200, "<html>no person here</html>"), "down": make_response(503)}
+
+    with patch("requests.Session.get", side_effect=lambda url, timeout=None: responses[url.split("i=")[1]]), \
+         patch("time.sleep"):
+        engine._process_queue(limit=10)
+
+    classes = {e["id"]: e["failure_class"] for e in mock_db.get_negative_entries()}
+    assert classes == {"blank": "unparsable", "down": "server_error"}
+
+def test_success_clears_entry(mock_db):
+    url = "http://example.com/?i=back"
+    mock_db.add_negative("back", url, "server_error", NEGATIVE_TTLS["server_error"])
+    engine = ScraperEngine(mock_db, delay=0)
+
+    with patch("requests.Session.get", return_value=make_response(200, person_page("Back"))):
+        assert engine._scrape_one(url, force=True)
+
+    assert "back" not in engine.negative_cache
+    assert mock_db.get_negative_entries() == []
@@ -0,0 +1,102 @@
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+from src.prober import IdProber, density, run_length, person_url, MAX_RUN
+from src.engine import ScraperEngine
+from src.database import DatabaseHelper
+
+BASE_URL = "http://example.com/tree/?i=1"
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_prober.db"
+    return DatabaseHelper(str(db_path))
+
+def fake_site(live, requested):
+    """A site that serves a person page for ``live`` IDs and an empty shell otherwise."""
+    def fake_get(url, timeout=None, stream=None):
+        person_id = int(url.split("i=")[1])
+        requested.append(person_id)
+        response = MagicMock()
+        response.status_code = 200
+        response.headers = {}
+        header = b"<html><head>" + b"x" * 9000 + b"</head><body>"
+        body = b'<div class="person male"><div class="info"><h2>P</h2></div></div>' if person_id in live else b""
+        page = header + body + b"</body></html>"
+        response.iter_content.return_value = iter([page[i:i + 4096] for i in range(0, len(page), 4096)])
+        response.text = page.decode()
+        return response
+    return fake_get
+
+def seed(db, ids):
+    for person_id in ids:
+        db.add_individual({"id": str(person_id), "name": f"P{person_id}"})
+
+def test_density_and_run_length():
+    known = [1, 2, 3, 4, 10]
+    assert density(known, 1, 5) == 1.0
+    assert density(known, 5, 10) == 0.0
+    assert run_length(1.0) == 1
+    assert run_length(0.0) == MAX_RUN
+    assert run_length(0.5) == 5
+
+def test_person_url_replaces_id():
+    assert person_url(BASE_URL, 42) == "http://example.com/tree/?i=42"
+
+def test_find_end_uses_few_requests(mock_db):
+    seed(mock_db, range(1, 1001))
+    live = set(range(1, 1121))
+    requested = []
+    engine = ScraperEngine(mock_db, delay=0)
+    prober = IdProber(engine, BASE_URL)
+
+    with patch("requests.Session.get", side_effect=fake_site(live, requested)):
+        assert prober.find_end(1000, lookahead=500) == 1120
+
+    assert len(requested) < 20
+
+def test_probe_finds_new_and_gap_ids(mock_db):
+    seed(mock_db, [i for i in range(1, 201) if i not in (50, 51, 120)])
+    live = {50, 120, 201, 202, 203}
+    requested = []
+    engine = ScraperEngine(mock_db, delay=0)
+    prober = IdProber(engine, BASE_URL)
+
+    with patch("requests.Session.get", side_effect=fake_site(live, requested)):
+        found = prober.probe(limit=50, lookahead=500)
+
+    assert set(found) == {"50", "120", "201", "202", "203"}
+    # The small hole is tried before the larger one
+    assert requested.index(120) < requested.index(50)
+    # Dead IDs are remembered for later runs
+    assert "51" in engine.negative_cache
+    assert mock_db.get_negative_entries(failure_class="unparsable")
+
+def test_404_counts_as_dead(mock_db):
+    seed(mock_db, [1, 3])
+    engine = ScraperEngine(mock_db, delay=0)
+    prober = IdProber(engine, BASE_URL)
+    response = MagicMock()
+    response.status_code = 404
+    response.raise_for_status.side_effect = requests.exceptions.HTTPError("404")
+
+    with patch("requests.Session.get", return_value=response):
+        assert prober.exists(2) is False
+
+    assert mock_db.get_negative_entries()[0]["failure_class"] == "not_found"
+    # The streamed 404 body is not left holding its connection
+    response.close.assert_called_once()
+
+def test_crawl_gallop_mode_fetches_far_fewer_pages(mock_db):
+    seed(mock_db, range(1, 501))
+    live = set(range(1, 504))
+    requested = []
+    engine = ScraperEngine(mock_db, delay=0)
+    engine.visited_ids.update(str(i) for i in range(1, 501))
+
+    with patch("requests.Session.get", side_effect=fake_site(live, requested)):
+        engine.crawl("http://example.com/tree/?i=500", limit=100, probe="gallop")
+
+    for person_id in ("501", "502", "503"):
+        assert mock_db.get_individual(person_id) is not None
+    assert len(requested) < 30
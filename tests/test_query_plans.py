@@ -0,0 +1,78 @@
+import random
+import pytest
+from src.database import DatabaseHelper
+
+# About ten times the people in the committed export
+PEOPLE = 60000
+
+@pytest.fixture(scope="module")
+def big_db(tmp_path_factory):
+    db = DatabaseHelper(str(tmp_path_factory.mktemp("plans") / "big.db"), readers=1)
+    rng = random.Random(0)
+    db.add_individuals([{"id": str(i), "name": f"P{i}", "url": f"http://example.com/?i={i}"}
+                        for i in range(1, PEOPLE + 1)])
+    with db.conn:
+        db.conn.executemany(
+            "INSERT OR IGNORE INTO relationships (person_id, related_id, type_id)"
+            " VALUES (?, ?, (SELECT id FROM relationship_types WHERE name = ?))",
+            [(str(i), str(rng.randint(1, PEOPLE + PEOPLE // 10)), rel_type)
+             for i in range(1, PEOPLE + 1) for rel_type in ("father", "mother", "child")],
+        )
+        db.conn.executemany(
+            "INSERT INTO discovered_urls (id, url_template, state, failure_count)"
+            " VALUES (?, (SELECT id FROM url_templates WHERE template = 'http://example.com/?i={id}'), ?, ?)",
+            [(str(i), "done" if i <= PEOPLE else "queued", i % 15)
+             for i in range(1, PEOPLE + PEOPLE // 20)],
+        )
+    db.conn.execute("ANALYZE")
+    yield db
+    db.close()
+
+def query_plans(db, call):
+    """Run ``call`` and return the query plan of every statement it ran."""
+    statements = []
+    with db.reader() as conn:
+        conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        with db.reader() as conn:
+            conn.set_trace_callback(None)
+    plans = []
+    for sql in statements:
+        if sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            plans.append(" | ".join(row["detail"] for row in db.conn.execute("EXPLAIN QUERY PLAN " + sql)))
+    return plans
+
+def test_relationships_by_person_use_the_primary_key(big_db):
+    [plan] = query_plans(big_db, lambda: big_db.get_relationships("500"))
+    assert plan.startswith("SEARCH r USING PRIMARY KEY (person_id=?)")
+
+def test_max_id_reads_the_watermark(big_db):
+    [plan] = query_plans(big_db, big_db.get_max_id)
+    assert "SCAN" not in plan
+    assert big_db.get_max_id() == PEOPLE
+
+def test_max_id_watermark_follows_inserts(tmp_path):
+    db = DatabaseHelper(str(tmp_path / "watermark.db"))
+    db.add_individual({"id": "9", "name": "A"})
+    db.add_individuals([{"id": "12", "name": "B"}, {"id": "x99", "name": "C"}])
+    db.add_individual({"id": "10", "name": "D"})
+    assert db.get_max_id() == 12
+    db.close()
+
+def test_pending_urls_skip_finished_rows(big_db):
+    [plan] = query_plans(big_db, lambda: big_db.get_pending_urls(12))
+    assert "USING INDEX idx_discovered_pending" in plan
+    assert "SEARCH i USING COVERING INDEX sqlite_autoindex_individuals_1" in plan
+
+def test_undiscovered_relatives_walk_the_related_index(big_db):
+    [plan] = query_plans(big_db, lambda: big_db.get_undiscovered_relatives(1000))
+    assert "SCAN relationships USING COVERING INDEX idx_relationships_related" in plan
+    assert "SEARCH r2 USING COVERING INDEX idx_relationships_related (related_id=?)" in plan
+    assert "TEMP B-TREE" not in plan
+
+def test_frontier_count_uses_the_frontier_index(big_db):
+    [plan] = query_plans(big_db, lambda: big_db.count_queued(12))
+    assert "SEARCH d USING INDEX idx_discovered_" in plan
+    assert "SCAN d" not in plan
@@ -0,0 +1,110 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from src.rate_limiter import TokenBucket, CircuitBreaker, SharedTokenBucket, SharedCircuitBreaker, parse_retry_after
+from src.engine import ScraperEngine
+from src.database import DatabaseHelper
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_rate.db"
+    return DatabaseHelper(str(db_path))
+
+def test_token_bucket_allows_burst_then_spaces_requests():
+    with patch("src.rate_limiter.time.monotonic", return_value=100.0):
+        bucket = TokenBucket(rate=2.0, burst=3)
+        waits = [bucket.reserve() for _ in range(5)]
+
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    # Further callers queue up behind each other at 1/rate intervals
+    assert waits[3] == pytest.approx(0.5)
+    assert waits[4] == pytest.approx(1.0)
+
+def test_token_bucket_refills_over_time():
+    clock = [100.0]
+    with patch("src.rate_limiter.time.monotonic", side_effect=lambda: clock[0]):
+        bucket = TokenBucket(rate=1.0, burst=1)
+        assert bucket.reserve() == 0.0
+        clock[0] += 1.0
+        assert bucket.reserve() == 0.0
+
+def test_token_bucket_disabled_without_rate():
+    bucket = TokenBucket(rate=None)
+    assert not bucket.enabled
+    assert all(bucket.reserve() == 0.0 for _ in range(10))
+
+def test_circuit_breaker_pauses_until_deadline():
+    clock = [50.0]
+    with patch("src.rate_limiter.time.monotonic", side_effect=lambda: clock[0]), \
+         patch("src.rate_limiter.time.sleep") as mock_sleep:
+        breaker = CircuitBreaker()
+        assert breaker.wait() == 0
+        breaker.trip(10)
+        breaker.trip(3)  # A shorter pause never shortens an open breaker
+        assert breaker.is_open
+        assert breaker.wait() == 10
+        mock_sleep.assert_called_once_with(10)
+        clock[0] += 10
+        assert not breaker.is_open
+        assert breaker.trips == 2
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("garbage") is None
+    assert parse_retry_after(None) is None
+    assert parse_retry_after(MagicMock()) is None
+
+def test_engine_rate_defaults_to_global_delay(mock_db):
+    engine = ScraperEngine(mock_db, max_workers=3, delay=2.0)
+    assert engine.rate_limiter.rate == 0.5
+
+    engine = ScraperEngine(mock_db, max_workers=3, delay=2.0, rate=1.5, burst=3)
+    assert engine.rate_limiter.rate == 1.5
+    assert engine.rate_limiter.burst == 3
+
+def test_engine_honours_retry_after(mock_db):
+    with patch("requests.Session.get") as mock_get, patch("time.sleep") as mock_sleep:
+        mock_429 = MagicMock()
+        mock_429.status_code = 429
+        mock_429.headers = {"Retry-After": "60"}
+
+        mock_200 = MagicMock()
+        mock_200.status_code = 200
+        mock_200.text = '<div class="person"><div class="info"><h2>Later</h2></div></div>'
+
+        mock_get.side_effect = [mock_429, mock_200]
+
+        engine = ScraperEngine(mock_db, delay=0)
+        result = engine._scrape_one("http://example.com/?i=later1")
+
+        assert result is not None
+        assert engine.breaker.trips == 1
+        assert mock_sleep.call_count == 1
+        assert 59 <= mock_sleep.call_args[0][0] <= 60
+
+def test_shared_token_bucket_spans_connections(tmp_path):
+    db_path = str(tmp_path / "shared.db")
+    first, second = DatabaseHelper(db_path), DatabaseHelper(db_path)
+    with patch("src.database.time.time", return_value=1000.0):
+        a = SharedTokenBucket(first, rate=2.0, burst=2)
+        b = SharedTokenBucket(second, rate=2.0, burst=2)
+        waits = [a.reserve(), b.reserve(), a.reserve(), b.reserve()]
+
+    # Both processes draw from one bucket instead of getting a burst each
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.5)
+    assert waits[3] == pytest.approx(1.0)
+
+def test_shared_circuit_breaker_pauses_other_processes(tmp_path):
+    db_path = str(tmp_path / "shared.db")
+    tripped = SharedCircuitBreaker(DatabaseHelper(db_path))
+    other = SharedCircuitBreaker(DatabaseHelper(db_path))
+    assert not other.is_open
+    tripped.trip(30)
+    assert 29 < other.remaining() <= 30
+
+def test_engine_uses_shared_limits(mock_db):
+    engine = ScraperEngine(mock_db, delay=0.5, shared_limits=True)
+    assert isinstance(engine.rate_limiter, SharedTokenBucket)
+    assert isinstance(engine.breaker, SharedCircuitBreaker)
+    assert engine.rate_limiter.rate == 2.0
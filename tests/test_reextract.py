@@ -0,0 +1,74 @@
+import pytest
+from src.archive import PageArchive
+from src.database import DatabaseHelper
+from src.reextract import Reextractor
+from src.scraper import parse_page
+
+PAGE = ('<div class="person {gender}"><div class="info"><h2>{name}</h2></div></div>'
+        '<ul class="kids"><li><a href="?i={kid}">Kid</a></li></ul>')
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_reextract.db"
+    return DatabaseHelper(str(db_path))
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = PageArchive(str(tmp_path / "archive"), compression="gzip")
+    yield archive
+    archive.close()
+
+def archive_page(archive, person_id, fetched_at=1.0, **fields):
+    values = {"gender": "male", "name": f"Person {person_id}", "kid": "k1"}
+    values.update(fields)
+    archive.store(person_id, f"http://example.com/?i={person_id}", PAGE.format(**values), fetched_at=fetched_at)
+
+def test_reextract_adds_and_reports_changes(mock_db, archive):
+    archive_page(archive, "1")
+    archive_page(archive, "2")
+    archive_page(archive, "3")
+    archive.flush()
+    for person_id in ("1", "2"):
+        data, rels = parse_page(archive.latest(person_id).decode("utf-8"), f"http://example.com/?i={person_id}")
+        mock_db.add_individual(data)
+        mock_db.add_relationship(person_id, "k1", "child")
+    mock_db.conn.execute("UPDATE individuals SET name = 'Old name' WHERE id = '2'")
+    mock_db.conn.execute("UPDATE relationships SET related_id = 'stale' WHERE person_id = '2'")
+    mock_db.conn.commit()
+
+    report = Reextractor(mock_db, archive, workers=1).run()
+
+    assert report.pages == 3
+    assert report.added == ["3"]
+    assert report.changed == {"2": ["name", "relationships"]}
+    assert report.unchanged == 1
+    assert mock_db.get_individual("2")["name"] == "Person 2"
+    assert mock_db.get_relationships("2") == [{"person_id": "2", "related_id": "k1", "type": "child"}]
+    assert mock_db.get_individual("3")["gender"] == "M"
+
+def test_reextract_uses_newest_version(mock_db, archive):
+    archive_page(archive, "1", fetched_at=1.0, name="Old")
+    archive_page(archive, "1", fetched_at=2.0, name="New")
+    archive.flush()
+
+    Reextractor(mock_db, archive, workers=1, batch_size=1).run()
+
+    assert mock_db.get_individual("1")["name"] == "New"
+
+def test_reextract_dry_run_writes_nothing(mock_db, archive):
+    archive_page(archive, "1")
+    archive.store("bad", "http://example.com/?i=bad", b"")
+    archive.flush()
+
+    report = Reextractor(mock_db, archive, workers=1).run(dry_run=True)
+
+    assert report.added == ["1"]
+    assert report.failed == ["bad"]
+    assert mock_db.get_individual("1") is None
+
+def test_bulk_writes(mock_db):
+    mock_db.add_individuals([{"id": str(i), "name": f"P{i}"} for i in range(5)])
+    assert len(mock_db.get_individuals()) == 5
+    mock_db.replace_relationships(["0"], [{"person_id": "0", "related_id": "9", "type": "child", "url": "u9"}])
+    assert mock_db.get_all_relationships() == {"0": {("9", "child")}}
+    assert any(p["id"] == "9" for p in mock_db.get_pending_urls())
@@ -0,0 +1,78 @@
+import pytest
+from unittest.mock import patch
+from src.retry_scheduler import RetryScheduler, RetryLater
+from src.engine import ScraperEngine
+from src.database import DatabaseHelper
+from tests.helpers import make_response, person_page
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_retry_scheduler.db"
+    return DatabaseHelper(str(db_path))
+
+def test_scheduler_orders_by_due_time():
+    clock = [10.0]
+    with patch("src.retry_scheduler.time.monotonic", side_effect=lambda: clock[0]):
+        scheduler = RetryScheduler()
+        scheduler.schedule("late", "u-late", 1, 20)
+        scheduler.schedule("soon", "u-soon", 2, 5)
+        assert len(scheduler) == 2
+        assert scheduler.next_due_in() == 5
+        assert scheduler.pop_due() == []
+
+        clock[0] += 5
+        assert scheduler.pop_due() == [("soon", "u-soon", 2)]
+        assert scheduler.pop_next() == ("late", "u-late", 1)
+        assert scheduler.next_due_in() is None
+        assert scheduler.pop_next() is None
+
+def test_pop_due_honours_limit():
+    scheduler = RetryScheduler()
+    for i in range(3):
+        scheduler.schedule(f"p{i}", f"u{i}", 1, 0)
+    assert len(scheduler.pop_due(limit=2)) == 2
+    assert len(scheduler) == 1
+
+def test_retry_later_is_falsy():
+    assert not RetryLater(5, "Server error (503)")
+
+def test_failed_fetch_does_not_block_worker(mock_db):
+    mock_db.add_discovered_url("flaky", "http://example.com/?i=flaky")
+    mock_db.add_discovered_url("healthy", "http://example.com/?i=healthy")
+    responses = {
+        "flaky": [make_response(503), make_response(200, person_page("Flaky"))],
+        "healthy": [make_response(200, person_page("Healthy"))],
+    }
+    order = []
+
+    def fake_get(url, timeout=None):
+        person_id = url.split("i=")[1]
+        order.append(person_id)
+        return responses[person_id].pop(0)
+
+    engine = ScraperEngine(mock_db, delay=0, max_workers=1)
+    engine._enqueue("flaky", "http://example.com/?i=flaky")
+    engine._enqueue("healthy", "http://example.com/?i=healthy")
+
+    with patch("requests.Session.get", side_effect=fake_get), \
+         patch("src.engine.time.sleep"), patch("src.rate_limiter.time.sleep"):
+        count = engine._process_queue(limit=10)
+
+    assert count == 2
+    # The healthy page is fetched while the flaky one waits for its retry
+    assert order == ["flaky", "healthy", "flaky"]
+    assert mock_db.get_individual("flaky")["name"] == "Flaky"
+
+def test_failed_attempts_are_persisted(mock_db):
+    mock_db.add_discovered_url("down", "http://example.com/?i=down")
+    engine = ScraperEngine(mock_db, delay=0, max_workers=1)
+
+    with patch("requests.Session.get", return_value=make_response(500)) as mock_get, \
+         patch("time.sleep"):
+        engine.retry_failed(limit=5)
+
+    assert mock_get.call_count == engine.max_retries + 1
+    row = mock_db.conn.execute("SELECT failure_count FROM discovered_urls WHERE id = 'down'").fetchone()
+    assert row[0] == engine.max_retries + 1
+    # Still pending for a later run until max_failures is reached
+    assert any(p["id"] == "down" for p in mock_db.get_pending_urls(max_failures=engine.max_failures))
@@ -1,5 +1,6 @@
 import pytest
-from src.scraper import Scraper
+import os
+from src.scraper import Scraper, PageTooLarge
 
 @pytest.fixture
 def sample_html():
@@ -79,4 +80,78 @@ def test_extract_relationships(sample_html):
 def test_extract_relationships_empty():
     scraper = Scraper()
     rels = scraper.extract_relationships("<html><body></body></html>", person_id="111815")
-    assert rels == []
\ No newline at end of file
+    assert rels == []
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+BASE_URL = "https://baalhatanya.org.il/%d7%90%d7%99%d7%9c%d7%9f-%d7%94%d7%99%d7%97%d7%a1/"
+
+@pytest.mark.parametrize("fixture, person_id", [
+    ("person.html", "111815"),
+    ("person2.html", "111814"),
+    ("person3.html", "111822"),
+])
+def test_extract_page_matches_separate_extractors(fixture, person_id):
+    with open(os.path.join(FIXTURES, fixture), encoding="utf-8") as f:
+        html = f.read()
+    url = f"{BASE_URL}?i={person_id}"
+    scraper = Scraper()
+
+    expected_data = scraper.extract_biographical_data(html, url)
+    expected_rels = scraper.extract_relationships(html, person_id, base_url=url)
+    data, rels = scraper.extract_page(html, url)
+
+    assert data == expected_data
+    assert rels == expected_rels
+    assert rels
+
+def test_extract_page_gender_from_other_links():
+    html = """
+    <a href="?i=5" class="female">Someone</a>
+    <div class="person"><div class="info"><h2>Unknown <!-- note -->Name</h2></div></div>
+    <script>var x = 1;</script>
+    """
+    scraper = Scraper()
+    data, rels = scraper.extract_page(html, "http://example.com/?i=5")
+    assert data == scraper.extract_biographical_data(html, "http://example.com/?i=5")
+    assert data["gender"] == "F"
+    assert data["name"] == "UnknownName"
+    assert rels == []
+
+def test_extract_page_without_person_block():
+    scraper = Scraper()
+    data, rels = scraper.extract_page('<ul class="kids"><li><a href="?i=7">Kid</a></li></ul>', "http://example.com/?i=6")
+    assert data is None
+    assert rels == [{"person_id": "6", "related_id": "7", "type": "child", "url": "http://example.com/?i=7"}]
+
+def test_extract_page_empty_document():
+    scraper = Scraper()
+    assert scraper.extract_page("", "http://example.com/?i=6") == (None, [])
+
+def chunked(data, size=4096, consumed=None):
+    for start in range(0, len(data), size):
+        if consumed is not None:
+            consumed.append(start)
+        yield data[start:start + size]
+
+def test_extract_page_stream_stops_after_family_sections():
+    with open(os.path.join(FIXTURES, "person.html"), "rb") as f:
+        body = f.read()
+    url = f"{BASE_URL}?i=111815"
+    scraper = Scraper()
+    consumed = []
+
+    streamed = scraper.extract_page_stream(chunked(body, consumed=consumed), url)
+
+    assert streamed == scraper.extract_page(body.decode("utf-8"), url)
+    assert len(consumed) * 4096 < len(body)
+
+def test_extract_page_stream_non_utf8_charset():
+    html = '<div class="person male"><div class="info"><h2>ישראל</h2></div></div><ul class="kids"></ul>'
+    scraper = Scraper()
+    data, rels = scraper.extract_page_stream(chunked(html.encode("cp1255"), size=7), "http://example.com/?i=3", encoding="windows-1255")
+    assert data["name"] == "ישראל"
+
+def test_extract_page_stream_enforces_max_bytes():
+    scraper = Scraper()
+    with pytest.raises(PageTooLarge):
+        scraper.extract_page_stream(chunked(b"<html>" + b" " * 10000), "http://example.com/?i=3", max_bytes=5000)
@@ -0,0 +1,78 @@
+import pytest
+from unittest.mock import patch
+from src.seeds import canonical_url, read_seeds
+from src.engine import ScraperEngine
+from src.database import DatabaseHelper
+from tests.helpers import make_response, person_page
+
+BASE_URL = "http://example.com/tree/?i=1"
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_seeds.db"
+    return DatabaseHelper(str(db_path))
+
+def fake_get(requested, kids=None):
+    def get(url, timeout=None, **kwargs):
+        person_id = url.split("i=")[1]
+        requested.append(person_id)
+        return make_response(200, person_page(f"P{person_id}", (kids or {}).get(person_id, ())))
+    return get
+
+def test_canonical_url_normalizes_variants():
+    expected = ("7", "http://example.com/tree/?i=7")
+    assert canonical_url("http://EXAMPLE.com/tree/?i=7&utm_source=x#top") == expected
+    assert canonical_url("  http://example.com/tree//?i=7\n") == expected
+    assert canonical_url("7", base_url=BASE_URL) == expected
+    assert canonical_url("http://example.com/tree/?i=007") == expected
+    assert canonical_url("007", base_url=BASE_URL) == expected
+    assert canonical_url("7") is None
+    assert canonical_url("http://example.com/tree/") is None
+    assert canonical_url("# comment") is None
+
+def test_read_seeds_dedupes_in_order():
+    lines = ["http://example.com/tree/?i=2", "3", "http://example.com/tree/?i=2&x=1", "", "junk", "# note"]
+    seeds, invalid = read_seeds(lines, base_url=BASE_URL)
+    assert [person_id for person_id, _ in seeds] == ["2", "3"]
+    assert invalid == 1
+
+def test_get_existing_ids(mock_db):
+    mock_db.add_individual({"id": "1", "name": "One"})
+    mock_db.add_individual({"id": "3", "name": "Three"})
+    assert mock_db.get_existing_ids(["1", "2", "3", "1"]) == {"1", "3"}
+    assert mock_db.get_existing_ids([]) == set()
+
+def test_scrape_many_skips_stored_people(mock_db):
+    mock_db.add_individual({"id": "1", "name": "One", "url": "http://example.com/tree/?i=1"})
+    engine = ScraperEngine(mock_db, delay=0, max_workers=3)
+    seeds = [(str(i), f"http://example.com/tree/?i={i}") for i in range(1, 5)]
+    requested = []
+
+    with patch("requests.Session.get", side_effect=fake_get(requested, {"2": ["9"]})):
+        count = engine.scrape_many(seeds)
+
+    assert count == 3
+    assert sorted(requested) == ["2", "3", "4"]
+    # Relatives are recorded for a later crawl, not followed
+    assert any(p["id"] == "9" for p in mock_db.get_pending_urls())
+
+def test_scrape_many_force_refreshes_stored_people(mock_db):
+    mock_db.add_individual({"id": "1", "name": "Old", "url": "http://example.com/tree/?i=1"})
+    engine = ScraperEngine(mock_db, delay=0)
+    requested = []
+
+    with patch("requests.Session.get", side_effect=fake_get(requested)):
+        count = engine.scrape_many([("1", "http://example.com/tree/?i=1")], force=True)
+
+    assert count == 1
+    assert mock_db.get_individual("1")["name"] == "P1"
+
+def test_crawl_seeds_follows_links_from_every_seed(mock_db):
+    engine = ScraperEngine(mock_db, delay=0, max_workers=2)
+    seeds = [("1", "http://example.com/tree/?i=1"), ("5", "http://example.com/tree/?i=5")]
+    requested = []
+
+    with patch("requests.Session.get", side_effect=fake_get(requested, {"1": ["2"], "5": ["6"]})):
+        engine.crawl_seeds(seeds, limit=4)
+
+    assert sorted(requested) == ["1", "2", "5", "6"]
@@ -0,0 +1,107 @@
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from src.database import DatabaseHelper, PageResult, PageCheck, PageFailure
+from src.engine import ScraperEngine
+from src.freshness import content_hash, record_hash, relationships_hash
+from src.writer import PageWriter
+
+@pytest.fixture
+def mock_db(tmp_path):
+    db_path = tmp_path / "test_writer.db"
+    return DatabaseHelper(str(db_path))
+
+def page(person_id, kids=(), validators=None):
+    data = {"id": person_id, "name": f"P{person_id}", "url": f"http://example.com/?i={person_id}"}
+    rels = [{"person_id": person_id, "related_id": kid, "type": "child", "url": f"http://example.com/?i={kid}"}
+            for kid in kids]
+    return PageResult(data, rels, content_hash(data, rels), record_hash(data), relationships_hash(rels),
+                      validators, 0.0)
+
+def frontier_rows(db):
+    return {row["id"]: (row["state"], row["failure_count"])
+            for row in db.conn.execute("SELECT id, state, failure_count FROM discovered_urls")}
+
+def test_write_batch_applies_everything_in_one_transaction(mock_db):
+    for person_id in ("r", "gone"):
+        mock_db.queue_url(person_id, f"http://example.com/?i={person_id}", 12)
+    mock_db.conn.execute("UPDATE discovered_urls SET failure_count = 2 WHERE id = 'r'")
+    mock_db.conn.commit()
+    commits = []
+    mock_db.conn.set_trace_callback(lambda sql: commits.append(sql) if sql == "COMMIT" else None)
+
+    outcomes = mock_db.write_batch([
+        PageFailure("gone", final=False),
+        page("r", kids=["a", "b"], validators=('"v1"', None)),
+        PageFailure("gone", final=True),
+        PageCheck("r", 10.0),
+    ])
+
+    assert len(commits) == 1
+    assert outcomes == [(False, True)]
+    assert mock_db.get_individual("r")["name"] == "Pr"
+    assert {rel["related_id"] for rel in mock_db.get_relationships("r")} == {"a", "b"}
+    assert frontier_rows(mock_db) == {
+        "r": ("done", 0), "gone": ("failed", 2), "a": ("queued", 0), "b": ("queued", 0),
+    }
+    assert mock_db.get_validators("r")["etag"] == '"v1"'
+    assert mock_db.get_freshness("r")["last_scraped_at"] == 10.0
+
+def test_unchanged_page_writes_only_the_check(mock_db):
+    mock_db.write_batch([page("r", kids=["a"])])
+    assert mock_db.write_batch([page("r", kids=["a"])]) == [(False, False)]
+
+def test_writer_batches_by_size(mock_db):
+    writer = PageWriter(mock_db, batch_size=3, flush_interval=60)
+    for person_id in "abcde":
+        writer.submit(page(person_id))
+    writer.flush()
+
+    assert writer.batches == 2
+    assert writer.pending() == 0
+    assert set(mock_db.get_all_ids()) == set("abcde")
+    writer.close()
+
+def test_writer_flushes_after_interval(mock_db):
+    writer = PageWriter(mock_db, batch_size=100, flush_interval=0.05)
+    writer.submit(page("a"))
+    deadline = time.monotonic() + 5
+    while writer.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert mock_db.get_individual("a") is not None
+    writer.close()
+
+def test_close_writes_what_is_queued(mock_db):
+    counted = []
+    writer = PageWriter(mock_db, batch_size=100, flush_interval=60, on_page=lambda *outcome: counted.append(outcome))
+    writer.submit(page("a"))
+    writer.submit(page("b"))
+    writer.close()
+
+    assert set(mock_db.get_all_ids()) == {"a", "b"}
+    assert counted == [(False, True), (False, True)]
+
+def test_bad_item_does_not_lose_the_batch(mock_db, capsys):
+    writer = PageWriter(mock_db, batch_size=100, flush_interval=60)
+    writer.submit(page("a"))
+    writer.submit(object())
+    writer.submit(page("b"))
+    writer.close()
+
+    assert set(mock_db.get_all_ids()) == {"a", "b"}
+    assert "Error writing object" in capsys.readouterr().out
+
+def test_engine_writes_each_page_without_batching(mock_db):
+    engine = ScraperEngine(mock_db, delay=0, write_batch=1)
+    engine._enqueue("r", "http://example.com/?i=r")
+    response = MagicMock()
+    response.status_code = 200
+    response.headers = {}
+    response.text = '<div class="person"><div class="info"><h2>Root</h2></div></div>'
+
+    with patch("requests.Session.get", return_value=response):
+        assert engine._process_queue(limit=10) == 1
+
+    assert engine.writer.batches == 1
+    assert frontier_rows(mock_db)["r"] == ("done", 0)